@@ -4,8 +4,9 @@ Modern ChatGPT-style Interface
 """
 import streamlit as st
 import os
+import time
 from datetime import datetime
-from typing import List, Dict
+from typing import List, Dict, TYPE_CHECKING
 from config import (
     APP_TITLE,
     APP_SUBTITLE,
@@ -14,16 +15,22 @@ from config import (
     CHUNK_SIZE,
     TOP_K_RESULTS,
     SUGGESTED_PROMPTS,
-    OPENAI_API_KEY
-)
-from utils.rag_engine import RAGEngine
-from utils.document_processor import (
-    extract_text_from_file, 
-    chunk_documents, 
-    format_citations, 
-    load_documents_from_folder
+    OPENAI_API_KEY,
+    METRICS_PORT,
+    SHOW_TIMING_BREAKDOWN,
+    VECTOR_STORE_BACKEND,
+    PRELOAD_IN_BACKGROUND
 )
+# Imported first so that the imports below are timed when profiling startup
+from utils.startup import preload_in_background, report_startup, startup_step
+from utils.document_processor import format_citations
+from utils.folder_sync import SyncManifest
+from utils.ingestion_queue import IngestionQueue, ACTIVE_STATES
 from utils.export import export_to_csv, format_conversation_for_export
+from utils.telemetry import collect_spans, start_metrics_server
+
+if TYPE_CHECKING:
+    from utils.rag_engine import RAGEngine
 
 # Configuration de la page
 st.set_page_config(
@@ -210,13 +217,55 @@ def init_session_state():
         st.session_state.uploaded_files = []
     if 'show_upload' not in st.session_state:
         st.session_state.show_upload = False
+    if 'source_filter' not in st.session_state:
+        st.session_state.source_filter = []
+    if 'ingestion_jobs' not in st.session_state:
+        st.session_state.ingestion_jobs = []  # IDs of the jobs submitted by this session
+    if 'finished_jobs' not in st.session_state:
+        st.session_state.finished_jobs = set()
+    if 'show_timings' not in st.session_state:
+        st.session_state.show_timings = SHOW_TIMING_BREAKDOWN
+
+
+@st.cache_resource(show_spinner=False)
+def get_shared_rag_engine() -> "RAGEngine":
+    """
+    RAG engine shared by every session of this server process
+    
+    One vector store client and one pooled OpenAI HTTP client serve all
+    users; per-user state (messages, loaded documents, document filter)
+    stays in st.session_state. Created on first use (question, upload...),
+    so that pages render without loading openai or the vector store.
+    """
+    from utils.rag_engine import RAGEngine
+    
+    if METRICS_PORT:
+        start_metrics_server(METRICS_PORT)
+    with startup_step("rag_engine"):
+        return RAGEngine()
+
+
+@st.cache_resource(show_spinner=False)
+def start_background_preload() -> bool:
+    """Import the RAG engine's modules in the background, once per server process"""
+    modules = ["utils.rag_engine"]
+    if VECTOR_STORE_BACKEND == "chroma":
+        modules.append("chromadb")
+    preload_in_background(modules)
+    return True
+
+
+@st.cache_resource(show_spinner=False)
+def get_ingestion_queue() -> IngestionQueue:
+    """Background ingestion queue shared by every session of this server process"""
+    return IngestionQueue(get_shared_rag_engine())
 
 
 def initialize_rag():
-    """Initialize RAG engine if not already done"""
+    """Attach the shared RAG engine to this session"""
     if st.session_state.rag_engine is None:
         try:
-            st.session_state.rag_engine = RAGEngine()
+            st.session_state.rag_engine = get_shared_rag_engine()
         except Exception as e:
             st.error(f"❌ Error initializing RAG engine: {str(e)}")
             return False
@@ -254,35 +303,88 @@ def render_sidebar():
         if st.button("📁  Load from Data Folder", key="load_folder_btn"):
             if initialize_rag():
                 if load_documents_from_data_folder():
-                    st.success(f"Loaded {len(st.session_state.uploaded_files)} document(s)!")
                     st.rerun()
         
+        # Progression de l'indexation en arrière-plan
+        if st.session_state.ingestion_jobs:
+            jobs = get_ingestion_queue().jobs(st.session_state.ingestion_jobs)
+            active = any(job["status"] in ACTIVE_STATES for job in jobs)
+            st.fragment(render_ingestion_jobs, run_every=1.0 if active else None)()
+        
         st.markdown("---")
         
         # Informations sur les documents
         if st.session_state.documents_loaded:
             st.success(f"{len(st.session_state.uploaded_files)} document(s) loaded")
             
+            chunk_counts = {
+                document["source"]: document["chunks"]
+                for document in st.session_state.rag_engine.list_documents()
+            }
+            
             with st.expander("📚 Active Documents", expanded=True):
                 for idx, doc in enumerate(st.session_state.uploaded_files):
                     col1, col2 = st.columns([4, 1])
                     with col1:
                         st.write(f"📄 {doc}")
+                        st.caption(f"{chunk_counts.get(doc, 0)} chunks")
                     with col2:
                         if st.button("🗑️", key=f"del_{idx}", help="Remove this document"):
+                            # Supprime les chunks de l'index, pas seulement de la liste
+                            with st.session_state.rag_engine.ingest_lock:
+                                st.session_state.rag_engine.delete_document(doc)
+                                SyncManifest().forget_source(doc)
                             st.session_state.uploaded_files.remove(doc)
+                            if doc in st.session_state.source_filter:
+                                st.session_state.source_filter.remove(doc)
                             if len(st.session_state.uploaded_files) == 0:
-                                st.session_state.rag_engine.clear_collection()
                                 st.session_state.documents_loaded = False
                             st.rerun()
             
+            # Filtre de recherche par document
+            st.session_state.source_filter = st.multiselect(
+                "🎯 Search only in",
+                options=st.session_state.uploaded_files,
+                default=[
+                    doc for doc in st.session_state.source_filter
+                    if doc in st.session_state.uploaded_files
+                ],
+                help="Leave empty to search all documents"
+            )
+            
             if st.button("🗑️  Clear All Documents"):
-                st.session_state.rag_engine.clear_collection()
+                # L'index est partagé : tous les utilisateurs sont concernés
+                with st.session_state.rag_engine.ingest_lock:
+                    st.session_state.rag_engine.clear_collection()
+                    SyncManifest().clear()
                 st.session_state.documents_loaded = False
                 st.session_state.uploaded_files = []
+                st.session_state.source_filter = []
                 st.success("All documents cleared!")
                 st.rerun()
-        
+
+        # Statistiques des caches
+        if st.session_state.rag_engine is not None:
+            cache_labels = {
+                "embeddings": "Embedding cache",
+                "query_embeddings": "Query embedding cache",
+                "retrievals": "Retrieval cache",
+                "answers": "Answer cache"
+            }
+            for name, cache_stats in st.session_state.rag_engine.get_cache_stats().items():
+                if cache_stats["hits"] or cache_stats["misses"]:
+                    st.caption(
+                        f"⚡ {cache_labels[name]}: {cache_stats['hits']} hits / "
+                        f"{cache_stats['misses']} misses ({cache_stats['hit_rate']:.0%} hit rate)"
+                    )
+            mmr_stats = st.session_state.rag_engine.mmr_stats
+            if mmr_stats["calls"]:
+                st.caption(
+                    f"🔀 MMR: {mmr_stats['last_ms']:.1f} ms last query / "
+                    f"{mmr_stats['total_ms'] / mmr_stats['calls']:.1f} ms average"
+                )
+        st.toggle("⏱️ Timing breakdown in sources", key="show_timings")
+
         # Export
         if st.session_state.messages:
             st.markdown("---")
@@ -306,32 +408,19 @@ def render_sidebar():
 
 
 def process_uploaded_file(uploaded_file):
-    """Process an uploaded file (PDF, DOCX, TXT, MD)"""
+    """Queue an uploaded file (PDF, DOCX, TXT, MD) for background indexing"""
     try:
-        with st.spinner(f"Processing {uploaded_file.name}..."):
-            # Extract text from file
-            text = extract_text_from_file(uploaded_file, uploaded_file.name)
-            
-            # Chunk the document
-            chunks = chunk_documents(text, uploaded_file.name)
-            
-            # Add to vector store
-            st.session_state.rag_engine.add_documents(chunks)
-            
-            # Track loaded documents
-            if uploaded_file.name not in st.session_state.uploaded_files:
-                st.session_state.uploaded_files.append(uploaded_file.name)
-            
-            st.session_state.documents_loaded = True
-            
-            return True
+        job_id = get_ingestion_queue().submit_upload(uploaded_file.name, uploaded_file.getvalue())
+        if job_id not in st.session_state.ingestion_jobs:
+            st.session_state.ingestion_jobs.append(job_id)
+        return True
     except Exception as e:
         st.error(f"Error processing {uploaded_file.name}: {str(e)}")
         return False
 
 
 def load_documents_from_data_folder():
-    """Load all documents from the data/sample_documents folder"""
+    """Queue a sync of the data/sample_documents folder (only changed files are re-indexed)"""
     try:
         data_folder = os.path.join(os.path.dirname(__file__), "data", "sample_documents")
         
@@ -339,32 +428,75 @@ def load_documents_from_data_folder():
             st.warning("No data folder found. Create 'data/sample_documents' and add documents.")
             return False
         
-        documents = load_documents_from_folder(data_folder)
-        
-        if not documents:
-            st.info("No documents found in data/sample_documents folder.")
-            return False
-        
-        with st.spinner(f"Loading {len(documents)} document(s) from folder..."):
-            for doc in documents:
-                # Chunk the document
-                chunks = chunk_documents(doc['text'], doc['filename'])
-                
-                # Add to vector store
-                st.session_state.rag_engine.add_documents(chunks)
-                
-                # Track loaded documents
-                if doc['filename'] not in st.session_state.uploaded_files:
-                    st.session_state.uploaded_files.append(doc['filename'])
-            
-            st.session_state.documents_loaded = True
-            return True
+        job_id = get_ingestion_queue().submit_folder(data_folder)
+        if job_id not in st.session_state.ingestion_jobs:
+            st.session_state.ingestion_jobs.append(job_id)
+        return True
             
     except Exception as e:
         st.error(f"Error loading documents from folder: {str(e)}")
         return False
 
 
+def track_loaded_document(source: str):
+    """Add a document to this session's list of loaded documents"""
+    if source not in st.session_state.uploaded_files:
+        st.session_state.uploaded_files.append(source)
+    st.session_state.documents_loaded = initialize_rag()
+
+
+def render_ingestion_jobs():
+    """Show the progress of this session's ingestion jobs (polled while they run)"""
+    queue = get_ingestion_queue()
+    status_icons = {"queued": "⏳", "running": "⚙️", "done": "✅", "failed": "❌", "cancelled": "⛔"}
+    newly_finished = False
+    
+    st.markdown("**Indexing**")
+    for job in queue.jobs(st.session_state.ingestion_jobs):
+        finished = job["status"] not in ACTIVE_STATES
+        if finished and job["job_id"] not in st.session_state.finished_jobs:
+            st.session_state.finished_jobs.add(job["job_id"])
+            newly_finished = True
+            if job["status"] == "done":
+                if job["kind"] == "folder":
+                    # Les fichiers inchangés sont déjà indexés
+                    for filename in SyncManifest().sources():
+                        track_loaded_document(filename)
+                else:
+                    track_loaded_document(job["source"])
+        
+        if job["kind"] == "folder":
+            if not finished:
+                st.caption("📁 Scanning data folder...")
+            elif job["status"] == "failed":
+                st.caption(f"❌ Data folder: {job['error']}")
+            continue
+        
+        col1, col2 = st.columns([4, 1])
+        with col1:
+            st.caption(
+                f"{status_icons[job['status']]} {job['source']} · {job['pages']} pages · "
+                f"{job['chunks']} chunks · {job['embedded']} embedded"
+            )
+            if job["error"]:
+                st.caption(f"{job['error']}")
+        with col2:
+            if not finished:
+                if st.button("✖", key=f"cancel_{job['job_id']}", help="Cancel"):
+                    queue.cancel(job["job_id"])
+                    st.rerun(scope="fragment")
+            elif job["status"] in ("failed", "cancelled"):
+                if st.button("↻", key=f"retry_{job['job_id']}", help="Retry"):
+                    queue.retry(job["job_id"])
+                    st.session_state.finished_jobs.discard(job["job_id"])
+                    # Relance le polling
+                    st.rerun()
+    
+    if newly_finished:
+        # Met à jour la liste des documents et arrête le polling si tout est fini
+        st.rerun()
+
+
 def render_welcome_screen():
     """Render the welcome screen when no documents are uploaded"""
     # Titre principal
@@ -407,7 +539,7 @@ def render_welcome_screen():
                                 success_count += 1
                     
                     if success_count > 0:
-                        st.success(f"{success_count} document(s) processed successfully!")
+                        st.success(f"{success_count} document(s) queued for indexing!")
                         st.rerun()
     
     # Suggestions
@@ -438,6 +570,68 @@ def render_welcome_screen():
     """, unsafe_allow_html=True)
 
 
+def render_stream(pieces, placeholder) -> str:
+    """
+    Render streamed answer pieces incrementally
+    
+    Args:
+        pieces: Iterator of answer text pieces
+        placeholder: Streamlit placeholder to render into
+        
+    Returns:
+        Full answer text
+    """
+    parts = []
+    last_render = 0.0
+    
+    with st.spinner("Analyzing..."):
+        for piece in pieces:
+            parts.append(piece)
+            # Throttle re-renders, they cost more than the tokens arrive
+            now = time.monotonic()
+            if now - last_render > 0.05:
+                placeholder.markdown("".join(parts) + "▌")
+                last_render = now
+    
+    answer = "".join(parts)
+    placeholder.markdown(answer)
+    return answer
+
+
+def format_timing_breakdown(spans: List[Dict]) -> str:
+    """
+    Format the spans of one answer as a markdown table
+    
+    Args:
+        spans: Span records from collect_spans, in finish order
+        
+    Returns:
+        Markdown table (empty string if there are no spans)
+    """
+    if not spans:
+        return ""
+    
+    rows = ["| Stage | Time | Details |", "|---|---:|---|"]
+    for record in spans:
+        details = []
+        if record.get("items") is not None:
+            details.append(f"{record['items']} items")
+        if record.get("prompt_tokens") or record.get("completion_tokens"):
+            details.append(
+                f"{record.get('prompt_tokens', 0)} prompt / {record.get('completion_tokens', 0)} completion tokens"
+            )
+        if record.get("first_token_ms") is not None:
+            details.append(f"first token {record['first_token_ms']:.0f} ms")
+        if record.get("cache_hits"):
+            details.append("cache hit")
+        name = record["span"] if record.get("parent") is None else f"↳ {record['span']}"
+        rows.append(f"| {name} | {record['duration_ms']:.1f} ms | {', '.join(details)} |")
+    
+    total_ms = sum(record["duration_ms"] for record in spans if record.get("parent") is None)
+    rows.append(f"| **Total** | **{total_ms:.1f} ms** | |")
+    return "\n".join(rows)
+
+
 def render_chat_interface():
     """Render the chat interface - works with or without documents"""
     # Display chat history
@@ -449,6 +643,9 @@ def render_chat_interface():
             if message.get("sources"):
                 with st.expander("📚 Sources"):
                     st.markdown(message["sources"])
+                    if message.get("timings") and st.session_state.show_timings:
+                        st.markdown("**⏱️ Timing breakdown**")
+                        st.markdown(message["timings"])
     
     # Chat input
     if prompt := st.chat_input("Message RegIntel AI"):
@@ -464,58 +661,78 @@ def render_chat_interface():
         
         # Get response (RAG if documents loaded, otherwise general chat)
         with st.chat_message("assistant", avatar="🔷"):
-            with st.spinner("Analyzing..."):
-                try:
-                    if st.session_state.documents_loaded:
-                        # RAG mode with documents
-                        result = st.session_state.rag_engine.query(prompt)
+            try:
+                # Moteur chargé à la première question (OpenAI, base vectorielle)
+                if st.session_state.rag_engine is None:
+                    st.session_state.rag_engine = get_shared_rag_engine()
+                
+                if st.session_state.documents_loaded:
+                    # RAG mode with documents (spans collected for the timing breakdown)
+                    with collect_spans() as spans:
+                        with st.spinner("Searching documents..."):
+                            result = st.session_state.rag_engine.query_stream(
+                                prompt,
+                                sources=st.session_state.source_filter or None
+                            )
                         
-                        # Display answer
-                        st.markdown(result["answer"])
+                        # Placeholder for the answer, sources are shown before the first token
+                        answer_placeholder = st.empty()
                         
                         # Format and display citations
                         citations = format_citations(result["sources"])
                         
-                        if citations:
-                            with st.expander("📚 Sources"):
-                                st.markdown(citations)
-                        
-                        # Add to message history
-                        st.session_state.messages.append({
-                            "role": "assistant",
-                            "content": result["answer"],
-                            "sources": citations
-                        })
-                    else:
-                        # General chat mode without documents
-                        response = st.session_state.rag_engine.client.chat.completions.create(
-                            model=MODEL_NAME,
-                            messages=[
-                                {"role": "system", "content": "You are RegIntel AI, an expert compliance and regulatory assistant for banking. Help users understand regulations, compliance requirements, and best practices."},
-                                {"role": "user", "content": prompt}
-                            ],
-                            temperature=0.7
-                        )
-                        
-                        answer = response.choices[0].message.content
-                        
-                        # Display answer
-                        st.markdown(answer)
-                        st.info("💡 Upload documents for specific analysis with citations!")
+                        sources_expander = st.expander("📚 Sources") if citations else None
+                        if sources_expander is not None:
+                            sources_expander.markdown(citations)
                         
-                        # Add to message history
-                        st.session_state.messages.append({
-                            "role": "assistant",
-                            "content": answer
-                        })
+                        # Display answer as it streams
+                        answer = render_stream(result["answer_stream"], answer_placeholder)
+                    
+                    timings = format_timing_breakdown(spans)
+                    if sources_expander is not None and timings and st.session_state.show_timings:
+                        sources_expander.markdown("**⏱️ Timing breakdown**")
+                        sources_expander.markdown(timings)
+                    if result["cached"]:
+                        st.caption("⚡ Answer reused from a similar earlier question")
+                    
+                    # Add to message history
+                    st.session_state.messages.append({
+                        "role": "assistant",
+                        "content": answer,
+                        "sources": citations,
+                        "timings": timings
+                    })
+                else:
+                    # General chat mode without documents
+                    from utils.rag_engine import iter_completion_text
+                    
+                    stream = st.session_state.rag_engine.client.chat.completions.create(
+                        model=MODEL_NAME,
+                        messages=[
+                            {"role": "system", "content": "You are RegIntel AI, an expert compliance and regulatory assistant for banking. Help users understand regulations, compliance requirements, and best practices."},
+                            {"role": "user", "content": prompt}
+                        ],
+                        temperature=0.7,
+                        stream=True
+                    )
+                    
+                    # Display answer as it streams
+                    answer = render_stream(iter_completion_text(stream), st.empty())
+                    st.info("💡 Upload documents for specific analysis with citations!")
                     
-                except Exception as e:
-                    error_msg = f"❌ Error: {str(e)}"
-                    st.error(error_msg)
+                    # Add to message history
                     st.session_state.messages.append({
                         "role": "assistant",
-                        "content": error_msg
+                        "content": answer
                     })
+                
+            except Exception as e:
+                error_msg = f"❌ Error: {str(e)}"
+                st.error(error_msg)
+                st.session_state.messages.append({
+                    "role": "assistant",
+                    "content": error_msg
+                })
 
 
 def main():
@@ -524,12 +741,9 @@ def main():
     # Load custom CSS
     load_custom_css()
     
-    # Initialize session state
+    # Initialize session state (the RAG engine is attached on first use)
     init_session_state()
     
-    # Initialize RAG engine
-    initialize_rag()
-    
     # Render sidebar
     render_sidebar()
     
@@ -541,6 +755,10 @@ def main():
     # Always show chat interface if there are messages
     if st.session_state.messages or not st.session_state.get('show_upload', False):
         render_chat_interface()
+    
+    report_startup("first page rendered")
+    if PRELOAD_IN_BACKGROUND:
+        start_background_preload()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,337 @@
+"""
+RegIntel AI - Offline benchmarks
+
+Measures chunking, ingestion, retrieval and query latency on synthetic
+corpora built from data/sample_documents, with a local stand-in for the
+OpenAI API (no API key or spend needed):
+
+    python benchmark.py                                  # 1k, 10k and 100k chunks
+    python benchmark.py --sizes 1000,1000000 --backend numpy
+    python benchmark.py --completion-latency 800 --baseline benchmark_results/previous.json
+
+Results are written as JSON (benchmark_results/ by default) so that runs of
+different versions can be compared with --baseline.
+"""
+import argparse
+import json
+import os
+import platform
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from typing import List, Dict, Iterator
+import numpy as np
+from config import (
+    CHUNK_TOKENS,
+    CHUNKING_STRATEGY,
+    EMBEDDING_DIMENSIONS,
+    HYBRID_SEARCH,
+    MMR_ENABLED,
+    NUMPY_STORE_DTYPE,
+    NUMPY_STORE_QUANTIZATION,
+    TOP_K_RESULTS,
+    VECTOR_STORE_BACKEND
+)
+from utils.document_processor import chunk_documents, load_documents_from_folder
+from utils.fake_openai import FakeOpenAI
+from utils.rag_engine import RAGEngine
+from utils.vector_store import ChromaVectorStore, NumpyVectorStore
+
+DEFAULT_SIZES = "1000,10000,100000"
+SENTENCES_PER_DOCUMENT = 200  # Synthetic documents span several chunks, like real ones
+
+_SENTENCE_PATTERN = re.compile(r"(?<=[.!?])\s+|\n{2,}")
+
+
+def load_sentences(folder: str) -> List[str]:
+    """
+    Split the seed documents into sentences
+
+    Args:
+        folder: Folder of seed documents
+
+    Returns:
+        Distinct sentences of at least 5 words
+    """
+    sentences = []
+    for document in load_documents_from_folder(folder, workers=1):
+        for sentence in _SENTENCE_PATTERN.split(document["text"]):
+            sentence = " ".join(sentence.split())
+            if len(sentence.split()) >= 5:
+                sentences.append(sentence)
+    if not sentences:
+        raise ValueError(f"No text found in {folder}")
+    return list(dict.fromkeys(sentences))
+
+
+def iter_synthetic_chunks(sentences: List[str], n_chunks: int, seed: int, timings: Dict) -> Iterator[Dict]:
+    """
+    Yield chunks of synthetic documents made of shuffled seed sentences
+
+    Args:
+        sentences: Seed sentences
+        n_chunks: Number of chunks to yield
+        seed: Random seed (same seed, same corpus)
+        timings: Updated with the time spent in chunk_documents and counts
+
+    Yields:
+        Chunks, as produced by chunk_documents
+    """
+    rng = np.random.default_rng(seed)
+    produced = 0
+    document_idx = 0
+    while produced < n_chunks:
+        picks = rng.integers(0, len(sentences), SENTENCES_PER_DOCUMENT)
+        text = " ".join(sentences[idx] for idx in picks)
+        # Document-specific words keep chunks distinct across documents
+        text += f" Reference document {document_idx}, internal control {rng.integers(1_000_000)}."
+
+        start = time.perf_counter()
+        chunks = chunk_documents(text, f"synthetic_{document_idx:07d}.txt")
+        timings["chunking_s"] += time.perf_counter() - start
+        timings["documents"] += 1
+        document_idx += 1
+
+        for chunk in chunks[:n_chunks - produced]:
+            produced += 1
+            yield chunk
+
+
+def make_questions(sentences: List[str], n_questions: int, seed: int) -> List[str]:
+    """Distinct questions built from seed sentences"""
+    rng = np.random.default_rng(seed)
+    templates = [
+        "What does the regulation require regarding: {}?",
+        "Which obligations apply to: {}?",
+        "Summarise the requirements on: {}",
+        "Quelles exigences s'appliquent à : {} ?"
+    ]
+    questions = []
+    for idx in range(n_questions):
+        words = sentences[rng.integers(len(sentences))].split()[:16]
+        questions.append(f"[{idx}] " + templates[idx % len(templates)].format(" ".join(words)))
+    return questions
+
+
+def latency_summary(samples: List[float]) -> Dict[str, float]:
+    """
+    Summarise latencies
+
+    Args:
+        samples: Latencies in seconds
+
+    Returns:
+        Count, mean and p50/p95/p99 in milliseconds
+    """
+    values = np.asarray(samples, dtype=np.float64) * 1000
+    return {
+        "n": len(samples),
+        "mean_ms": round(float(values.mean()), 3),
+        "p50_ms": round(float(np.percentile(values, 50)), 3),
+        "p95_ms": round(float(np.percentile(values, 95)), 3),
+        "p99_ms": round(float(np.percentile(values, 99)), 3)
+    }
+
+
+def create_store(backend: str, directory: str):
+    if backend == "chroma":
+        return ChromaVectorStore(directory, "benchmark")
+    return NumpyVectorStore(directory)
+
+
+def run_size(args, sentences: List[str], n_chunks: int) -> Dict:
+    """
+    Benchmark one corpus size in a temporary index
+
+    Args:
+        args: Command line options
+        sentences: Seed sentences
+        n_chunks: Corpus size
+
+    Returns:
+        Results for this size
+    """
+    directory = tempfile.mkdtemp(prefix=f"regintel-bench-{n_chunks}-")
+    try:
+        client = FakeOpenAI(
+            dimensions=args.dimensions,
+            embedding_latency=args.embedding_latency / 1000,
+            completion_latency=args.completion_latency / 1000
+        )
+        rag_engine = RAGEngine(create_store(args.backend, directory), client=client)
+        # Measure the uncached path: every chunk and question is new
+        rag_engine.embedding_cache = None
+        rag_engine.answer_cache = None
+
+        # Ingestion (chunking time is measured inside the chunk generator)
+        timings = {"chunking_s": 0.0, "documents": 0}
+        start = time.perf_counter()
+        added = rag_engine.add_documents(iter_synthetic_chunks(sentences, n_chunks, args.seed, timings))
+        total_s = time.perf_counter() - start
+        ingest_s = max(total_s - timings["chunking_s"], 1e-9)
+        print(f"  ingested {added} chunks in {total_s:.1f}s")
+
+        questions = make_questions(sentences, 2 * args.queries + 1, args.seed + n_chunks)
+
+        # First retrieval builds lazy state (e.g. the BM25 index), reported apart
+        start = time.perf_counter()
+        rag_engine.retrieve(questions[0], n_results=args.top_k)
+        first_retrieve_ms = (time.perf_counter() - start) * 1000
+
+        retrieve_samples = []
+        for question in questions[1:args.queries + 1]:
+            start = time.perf_counter()
+            rag_engine.retrieve(question, n_results=args.top_k)
+            retrieve_samples.append(time.perf_counter() - start)
+
+        query_samples = []
+        for question in questions[args.queries + 1:]:
+            start = time.perf_counter()
+            rag_engine.query(question)
+            query_samples.append(time.perf_counter() - start)
+
+        result = {
+            "chunks": added,
+            "chunking": {
+                "documents": timings["documents"],
+                "seconds": round(timings["chunking_s"], 3),
+                "chunks_per_s": round(added / max(timings["chunking_s"], 1e-9), 1)
+            },
+            "ingestion": {
+                "seconds": round(ingest_s, 3),
+                "chunks_per_s": round(added / ingest_s, 1),
+                "embedding_requests": client.calls["embeddings"]
+            },
+            "first_retrieve_ms": round(first_retrieve_ms, 3),
+            "retrieve": latency_summary(retrieve_samples),
+            "query": latency_summary(query_samples)
+        }
+        if hasattr(rag_engine.store, "storage_stats"):
+            result["storage"] = rag_engine.store.storage_stats()
+        return result
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+def git_revision() -> str:
+    """Short commit hash of the working tree, if it is a git checkout"""
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except Exception:
+        return None
+
+
+def compare(results: List[Dict], baseline: Dict):
+    """Print the change of each headline metric against a previous run"""
+    previous = {entry["chunks"]: entry for entry in baseline.get("results", [])}
+    metrics = [
+        ("ingestion", "chunks_per_s", "chunks/s"),
+        ("retrieve", "p50_ms", "retrieve p50 ms"),
+        ("retrieve", "p99_ms", "retrieve p99 ms"),
+        ("query", "p50_ms", "query p50 ms"),
+        ("query", "p99_ms", "query p99 ms")
+    ]
+    print(f"Compared with {baseline.get('revision') or 'baseline'} ({baseline.get('timestamp', '?')}):")
+    for entry in results:
+        old = previous.get(entry["chunks"])
+        if old is None:
+            continue
+        changes = []
+        for section, key, label in metrics:
+            before, after = old[section][key], entry[section][key]
+            if before:
+                changes.append(f"{label} {before} -> {after} ({(after - before) / before * 100:+.0f}%)")
+        print(f"  {entry['chunks']:>8} chunks: " + ", ".join(changes))
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="benchmark.py", description="RegIntel AI offline benchmarks")
+    parser.add_argument("--sizes", default=DEFAULT_SIZES,
+                        help=f"comma-separated corpus sizes in chunks (default: {DEFAULT_SIZES})")
+    parser.add_argument("--backend", choices=["chroma", "numpy"], default=VECTOR_STORE_BACKEND,
+                        help=f"vector store (default: {VECTOR_STORE_BACKEND})")
+    parser.add_argument("--dimensions", type=int, default=EMBEDDING_DIMENSIONS or 1536,
+                        help="embedding size (default: EMBEDDING_DIMENSIONS or 1536)")
+    parser.add_argument("--queries", type=int, default=200, help="retrievals and queries timed per size")
+    parser.add_argument("-k", "--top-k", type=int, default=TOP_K_RESULTS, help="chunks retrieved")
+    parser.add_argument("--embedding-latency", type=float, default=0.0,
+                        help="simulated milliseconds per embeddings request")
+    parser.add_argument("--completion-latency", type=float, default=0.0,
+                        help="simulated milliseconds per chat completion")
+    parser.add_argument("--documents", default=os.path.join("data", "sample_documents"),
+                        help="seed documents (default: data/sample_documents)")
+    parser.add_argument("--seed", type=int, default=0, help="random seed of the synthetic corpora")
+    parser.add_argument("-o", "--output", help="JSON results file (default: benchmark_results/<date>.json)")
+    parser.add_argument("--baseline", help="previous JSON results to compare with")
+    return parser
+
+
+def main(argv=None) -> int:
+    args = build_parser().parse_args(argv)
+    sizes = [int(size) for size in args.sizes.split(",") if size.strip()]
+    sentences = load_sentences(args.documents)
+
+    report = {
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "revision": git_revision(),
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "numpy": np.__version__,
+            "cpus": os.cpu_count()
+        },
+        "settings": {
+            "backend": args.backend,
+            "dimensions": args.dimensions,
+            "dtype": NUMPY_STORE_DTYPE,
+            "quantization": NUMPY_STORE_QUANTIZATION,
+            "chunking": CHUNKING_STRATEGY,
+            "chunk_tokens": CHUNK_TOKENS,
+            "top_k": args.top_k,
+            "hybrid_search": HYBRID_SEARCH,
+            "mmr": MMR_ENABLED,
+            "embedding_latency_ms": args.embedding_latency,
+            "completion_latency_ms": args.completion_latency,
+            "seed": args.seed,
+            "seed_sentences": len(sentences)
+        },
+        "results": []
+    }
+
+    for n_chunks in sizes:
+        print(f"{n_chunks} chunks ({args.backend})")
+        result = run_size(args, sentences, n_chunks)
+        report["results"].append(result)
+        print(
+            f"  ingestion {result['ingestion']['chunks_per_s']:.0f} chunks/s, "
+            f"retrieve p50/p95/p99 {result['retrieve']['p50_ms']:.1f}/"
+            f"{result['retrieve']['p95_ms']:.1f}/{result['retrieve']['p99_ms']:.1f} ms, "
+            f"query p50/p95/p99 {result['query']['p50_ms']:.1f}/"
+            f"{result['query']['p95_ms']:.1f}/{result['query']['p99_ms']:.1f} ms"
+        )
+
+    output = args.output or os.path.join(
+        "benchmark_results", f"benchmark-{datetime.now().strftime('%Y%m%d-%H%M%S')}.json"
+    )
+    if os.path.dirname(output):
+        os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {output}")
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            compare(report["results"], json.load(f))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,257 @@
+"""
+RegIntel AI - Command-line interface
+
+Build and query the document index without Streamlit:
+
+    python cli.py ingest data/sample_documents --workers 8 --batch-size 1024
+    python cli.py query "What does GDPR Article 35 require?"
+    python cli.py batch checklist.jsonl -o results.csv --concurrency 8
+    python cli.py stats
+    python cli.py clear --yes
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from pathlib import Path
+from config import BATCH_CONCURRENCY, EXTRACTION_WORKERS, TOP_K_RESULTS
+# Imported first so that the imports below are timed when profiling startup
+from utils.startup import report_startup
+from utils.batch_runner import load_questions, run_batch, results_to_csv
+from utils.document_processor import chunk_documents, format_citations, iter_extracted_files
+from utils.folder_sync import SyncManifest, scan_folder, index_changed_file
+from utils.rag_engine import RAGEngine
+from utils.tokenizer import count_tokens_batch
+
+
+def create_engine(args) -> RAGEngine:
+    """Create a RAG engine with the batching options of the command line"""
+    rag_engine = RAGEngine()
+    if getattr(args, "batch_size", None):
+        rag_engine.index_batch_size = args.batch_size
+    if getattr(args, "embedding_batch_size", None):
+        rag_engine.embedding_batch_size = args.embedding_batch_size
+    if getattr(args, "embedding_workers", None):
+        rag_engine.embedding_workers = args.embedding_workers
+    return rag_engine
+
+
+def cmd_ingest(args) -> int:
+    """Index the new and changed documents of a folder"""
+    if not os.path.isdir(args.folder):
+        print(f"Folder not found: {args.folder}")
+        return 1
+
+    rag_engine = create_engine(args)
+    manifest = SyncManifest()
+
+    if args.force:
+        # Forget the folder's files so that every one of them is re-indexed
+        folder_prefix = str(Path(args.folder).resolve()) + os.sep
+        for path, entry in list(manifest.files.items()):
+            if path.startswith(folder_prefix):
+                rag_engine.delete_document(entry["source"])
+                del manifest.files[path]
+        manifest.save()
+
+    start = time.perf_counter()
+    report = {"added": [], "updated": [], "unchanged": [], "removed": [], "errors": []}
+    changed = scan_folder(args.folder, rag_engine, manifest, report)
+    print(f"{len(changed)} file(s) to index, {len(report['unchanged'])} unchanged, {len(report['removed'])} removed")
+
+    n_chunks = 0
+    n_tokens = 0
+    for path, text, error in iter_extracted_files(list(changed), args.workers):
+        source = changed[path][0]
+        if error is not None:
+            print(f"  ✗ {source}: {error}")
+            report["errors"].append(source)
+            continue
+
+        chunks = chunk_documents(text, source)
+        try:
+            updated = index_changed_file(path, chunks, changed[path], rag_engine, manifest)
+        except Exception as e:
+            print(f"  ✗ {source}: {str(e)}")
+            report["errors"].append(source)
+            continue
+
+        report["updated" if updated else "added"].append(source)
+        n_chunks += len(chunks)
+        n_tokens += sum(count_tokens_batch([chunk["text"] for chunk in chunks]))
+        print(f"  ✓ {source} ({len(chunks)} chunks)")
+
+    elapsed = time.perf_counter() - start
+    n_documents = len(report["added"]) + len(report["updated"])
+    print(
+        f"Indexed {n_documents} document(s), {n_chunks} chunks, {n_tokens} tokens "
+        f"in {elapsed:.1f}s"
+    )
+    if elapsed > 0:
+        print(
+            f"Throughput: {n_documents / elapsed:.2f} documents/s, "
+            f"{n_chunks / elapsed:.1f} chunks/s, {n_tokens / elapsed:.0f} tokens/s"
+        )
+    if report["errors"]:
+        print(f"Failed: {', '.join(report['errors'])}")
+        return 1
+    return 0
+
+
+def cmd_query(args) -> int:
+    """Answer a question from the indexed documents"""
+    rag_engine = create_engine(args)
+    if rag_engine.get_document_count() == 0:
+        print("The index is empty, run 'ingest' first.")
+        return 1
+
+    start = time.perf_counter()
+    chunks = rag_engine.retrieve(args.question, n_results=args.top_k, sources=args.sources or None)
+    answer = rag_engine.generate_answer(args.question, chunks)
+    elapsed = time.perf_counter() - start
+
+    if args.json:
+        print(json.dumps({
+            "question": args.question,
+            "answer": answer,
+            "sources": [
+                {"id": chunk["id"], "metadata": chunk["metadata"], "distance": chunk.get("distance")}
+                for chunk in chunks
+            ],
+            "latency_s": round(elapsed, 3)
+        }, ensure_ascii=False, indent=2))
+    else:
+        print(answer)
+        print()
+        print(format_citations(chunks))
+        print(f"({elapsed:.1f}s)")
+    return 0
+
+
+def cmd_batch(args) -> int:
+    """Answer every question of a JSONL or CSV file, resuming an interrupted run"""
+    if not os.path.exists(args.questions):
+        print(f"File not found: {args.questions}")
+        return 1
+    questions = load_questions(args.questions)
+    rag_engine = create_engine(args)
+    if rag_engine.get_document_count() == 0:
+        print("The index is empty, run 'ingest' first.")
+        return 1
+
+    checkpoint_path = args.checkpoint or args.output + ".checkpoint.jsonl"
+
+    def report(result, done, total):
+        status = f"error: {result['error']}" if result["error"] else f"{result['total_tokens']} tokens"
+        print(f"  [{done}/{total}] {result['id']} ({result['latency_s']:.1f}s, {status})")
+
+    start = time.perf_counter()
+    results = run_batch(
+        rag_engine, questions, checkpoint_path,
+        concurrency=args.concurrency, sources=args.sources or None, progress=report
+    )
+    elapsed = time.perf_counter() - start
+
+    with open(args.output, "w", encoding="utf-8", newline="") as f:
+        f.write(results_to_csv(results))
+
+    failed = [result["id"] for result in results if result["error"]]
+    print(
+        f"Answered {len(results) - len(failed)}/{len(results)} question(s) in {elapsed:.1f}s, "
+        f"{sum(result['total_tokens'] for result in results)} tokens -> {args.output}"
+    )
+    if failed:
+        print(f"Failed: {', '.join(failed)} (run again to retry)")
+        return 1
+    return 0
+
+
+def cmd_stats(args) -> int:
+    """Print the contents and size of the index"""
+    rag_engine = create_engine(args)
+    documents = rag_engine.list_documents()
+    print(f"{rag_engine.get_document_count()} chunks in {len(documents)} document(s)")
+    for document in documents:
+        print(f"  {document['chunks']:>7}  {document['source']}")
+
+    if hasattr(rag_engine.store, "storage_stats"):
+        storage = rag_engine.store.storage_stats()
+        print(
+            f"Vectors: {storage['dimensions']} dimensions, "
+            f"{storage['vector_bytes'] / 1e6:.1f} MB full precision, "
+            f"{storage['scanned_bytes'] / 1e6:.1f} MB scanned per query"
+        )
+    if rag_engine.embedding_cache is not None:
+        print(f"Embedding cache: {rag_engine.embedding_cache.stats()['entries']} entries")
+    return 0
+
+
+def cmd_clear(args) -> int:
+    """Delete every document from the index"""
+    if not args.yes:
+        reply = input("Delete every indexed document? [y/N] ")
+        if reply.strip().lower() not in ("y", "yes"):
+            print("Aborted.")
+            return 1
+    rag_engine = create_engine(args)
+    rag_engine.clear_collection()
+    SyncManifest().clear()
+    print("Index cleared.")
+    return 0
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="cli.py", description="RegIntel AI command-line interface")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    ingest = subparsers.add_parser("ingest", help="index the new and changed documents of a folder")
+    ingest.add_argument("folder", help="folder of PDF, DOCX, TXT and MD documents")
+    ingest.add_argument("--workers", type=int, default=EXTRACTION_WORKERS,
+                        help=f"extraction worker processes (default: {EXTRACTION_WORKERS})")
+    ingest.add_argument("--batch-size", type=int,
+                        help="chunks embedded and written per group (default: INDEX_BATCH_SIZE)")
+    ingest.add_argument("--embedding-batch-size", type=int,
+                        help="max inputs per embeddings request (default: EMBEDDING_BATCH_SIZE)")
+    ingest.add_argument("--embedding-workers", type=int,
+                        help="embeddings requests in flight (default: EMBEDDING_MAX_WORKERS)")
+    ingest.add_argument("--force", action="store_true", help="re-index unchanged files too")
+    ingest.set_defaults(handler=cmd_ingest)
+
+    query = subparsers.add_parser("query", help="answer a question from the indexed documents")
+    query.add_argument("question")
+    query.add_argument("-k", "--top-k", type=int, default=TOP_K_RESULTS, help="chunks to retrieve")
+    query.add_argument("--source", dest="sources", action="append",
+                       help="only search this document (repeatable)")
+    query.add_argument("--json", action="store_true", help="print the result as JSON")
+    query.set_defaults(handler=cmd_query)
+
+    batch = subparsers.add_parser("batch", help="answer a JSONL or CSV file of questions")
+    batch.add_argument("questions", help="JSONL or CSV file with a 'question' field (optional 'id', 'sources')")
+    batch.add_argument("-o", "--output", required=True, help="CSV file to write the answers to")
+    batch.add_argument("--concurrency", type=int, default=BATCH_CONCURRENCY,
+                       help=f"questions answered at once (default: {BATCH_CONCURRENCY})")
+    batch.add_argument("--checkpoint",
+                       help="JSONL file of finished questions (default: <output>.checkpoint.jsonl)")
+    batch.add_argument("--source", dest="sources", action="append",
+                       help="only search this document when a question has no sources (repeatable)")
+    batch.set_defaults(handler=cmd_batch)
+
+    stats = subparsers.add_parser("stats", help="show indexed documents and index size")
+    stats.set_defaults(handler=cmd_stats)
+
+    clear = subparsers.add_parser("clear", help="delete every indexed document")
+    clear.add_argument("--yes", action="store_true", help="do not ask for confirmation")
+    clear.set_defaults(handler=cmd_clear)
+
+    return parser
+
+
+def main(argv=None) -> int:
+    args = build_parser().parse_args(argv)
+    report_startup("arguments parsed")
+    return args.handler(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -11,15 +11,94 @@ load_dotenv()
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 MODEL_NAME = "gpt-4o-mini"  # Fast reasoning, bilingual
 EMBEDDING_MODEL = "text-embedding-3-small"  # Cheap and multilingual
+EMBEDDING_DIMENSIONS = None  # Shorten embeddings (e.g. 512), None for the full 1536
+OPENAI_MAX_CONNECTIONS = 32  # HTTP connection pool size per client
+
+# OpenAI Rate Limits (paced per process across every thread and coroutine; 0 = unlimited)
+# Set to the organisation's quota for each model (defaults: usage tier 1)
+CHAT_REQUESTS_PER_MINUTE = 500
+CHAT_TOKENS_PER_MINUTE = 200000
+EMBEDDING_REQUESTS_PER_MINUTE = 3000
+EMBEDDING_TOKENS_PER_MINUTE = 1000000
+OPENAI_MAX_RETRIES = 6  # Retries of a rate-limited, timed out or 5xx request
+OPENAI_BACKOFF_BASE = 1.0  # Seconds before the first retry, doubled on each retry
+OPENAI_BACKOFF_MAX = 60.0  # Max seconds between retries (unless Retry-After asks for more)
+OPENAI_BACKOFF_JITTER = 0.25  # Random extra delay, as a fraction of the backoff
+
+# Document Extraction
+EXTRACTION_WORKERS = os.cpu_count() or 1  # Worker processes for folder extraction (1 = serial)
 
 # Vector Store Configuration
+VECTOR_STORE_BACKEND = "chroma"  # "chroma" or "numpy" (memory-mapped, exact search)
 CHROMA_DB_DIR = "./chroma_db"
 COLLECTION_NAME = "regulatory_documents"
+NUMPY_STORE_DIR = "./vector_index"
+NUMPY_STORE_DTYPE = "float32"  # or "float16" to halve memory and disk
+# Compact codes searched first, then the best candidates rescored at full precision:
+# "none", "int8" (1 byte per dimension) or "binary" (1 bit per dimension)
+NUMPY_STORE_QUANTIZATION = "none"
+NUMPY_RESCORE_CANDIDATES = 10  # Candidates rescored, as a multiple of n_results
+SYNC_MANIFEST_PATH = "./chroma_db/sync_manifest.json"  # Files indexed by folder sync
 
 # RAG Configuration
-CHUNK_SIZE = 1000
+CHUNKING_STRATEGY = "tokens"  # "tokens" (boundary-aware) or "characters"
+CHUNK_TOKENS = 400  # Token budget per chunk ("tokens" strategy)
+CHUNK_OVERLAP_TOKENS = 40  # Included in CHUNK_TOKENS, capped at half a chunk
+CHUNK_SIZE = 1000  # Characters per chunk ("characters" strategy)
 CHUNK_OVERLAP = 200
 TOP_K_RESULTS = 5
+CONTEXT_MAX_TOKENS = 6000  # Budget for retrieved text in the answer prompt
+
+# Hybrid Search (BM25 keyword + vector, merged by reciprocal rank fusion)
+HYBRID_SEARCH = True
+HYBRID_CANDIDATES = 4  # Candidates taken from each ranking, as a multiple of n_results
+RRF_K = 60
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+# Diversification (maximal marginal relevance over the retrieved candidates)
+MMR_ENABLED = False
+MMR_LAMBDA = 0.7  # 1 = relevance only, 0 = diversity only
+MMR_CANDIDATES = 4  # Candidates fetched, as a multiple of n_results
+
+# Embedding Batching
+EMBEDDING_BATCH_SIZE = 256  # Max inputs per embeddings request (API limit: 2048)
+EMBEDDING_BATCH_TOKENS = 200000  # Max tokens per embeddings request (API limit: 300k)
+EMBEDDING_MAX_INPUT_TOKENS = 8191  # Max tokens for a single input
+EMBEDDING_MAX_WORKERS = 4  # Embedding requests in flight at once
+INDEX_BATCH_SIZE = 512  # Chunks embedded and written to the vector store per group
+
+# Embedding Cache
+EMBEDDING_CACHE_ENABLED = True
+EMBEDDING_CACHE_PATH = "./embedding_cache/embeddings.sqlite3"
+EMBEDDING_CACHE_MAX_ENTRIES = 100000  # ~600 MB with 1536-dimension float32 vectors
+
+# Query Path Caches (in-process LRU)
+QUERY_EMBEDDING_CACHE_SIZE = 2048
+RETRIEVAL_CACHE_SIZE = 1024
+
+# Semantic Answer Cache
+ANSWER_CACHE_ENABLED = True
+ANSWER_CACHE_SIMILARITY = 0.9  # Min cosine similarity between questions (same chunks also required)
+ANSWER_CACHE_TTL_SECONDS = 3600
+ANSWER_CACHE_MAX_ENTRIES = 1000
+
+# Telemetry (per-stage spans: wall time, item counts, tokens, cache hits)
+TELEMETRY_ENABLED = True
+TELEMETRY_LOG_PATH = "./telemetry/spans.jsonl"  # One JSON line per span (None = stderr)
+TELEMETRY_LOG_MAX_BYTES = 50 * 1024 * 1024  # Span log size before it is rotated (spans.jsonl.1, ...)
+TELEMETRY_LOG_BACKUPS = 5  # Rotated span logs kept
+METRICS_FILE_PATH = "./telemetry/metrics.prom"  # Prometheus text format (None = no file)
+METRICS_FILE_INTERVAL = 10  # Min seconds between rewrites of the metrics file
+METRICS_PORT = None  # Also serve http://<host>:<port>/metrics (e.g. 9464), None = off
+SHOW_TIMING_BREAKDOWN = False  # Default of the per-answer timing breakdown toggle
+
+# Startup
+STARTUP_PROFILE = os.getenv("REGINTEL_PROFILE_STARTUP", "").lower() in ("1", "true", "yes")  # Print import and init times
+PRELOAD_IN_BACKGROUND = True  # Import the OpenAI and vector store modules after the first page render
+
+# Batch Question Answering
+BATCH_CONCURRENCY = 4  # Questions answered at once
 
 # UI Configuration
 APP_TITLE = "RegIntel AI"
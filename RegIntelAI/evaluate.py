@@ -0,0 +1,317 @@
+"""
+RegIntel AI - Retrieval evaluation and parameter sweep
+
+Scores retrieval against a golden set of (question, source, evidence) pairs
+over data/sample_documents, for every combination of chunking and retrieval
+parameters:
+
+    python evaluate.py                                     # default grid, offline
+    python evaluate.py --chunk-sizes 200,400,800 --overlaps 0,40 --top-k 3,5,10
+    python evaluate.py --strategy characters --chunk-sizes 500,1000,2000 --overlaps 100,200
+    python evaluate.py --openai --min-recall 0.9           # real embeddings (API cost)
+
+A chunk is relevant to a question when it comes from the expected source
+and contains the evidence passage (or either half of it, when the passage
+straddles two chunks). Offline runs use hash-based embeddings, which only
+capture shared words: use --openai for numbers that reflect production.
+"""
+import argparse
+import itertools
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+from datetime import datetime
+from typing import List, Dict, Optional
+from config import (
+    CHUNKING_STRATEGY,
+    CHUNK_TOKENS,
+    CHUNK_OVERLAP_TOKENS,
+    CHUNK_SIZE,
+    CHUNK_OVERLAP,
+    EMBEDDING_DIMENSIONS,
+    TOP_K_RESULTS,
+    MMR_LAMBDA
+)
+from benchmark import git_revision, latency_summary
+from utils.context_builder import build_context
+from utils.document_processor import chunk_documents, get_text_splitter, load_documents_from_folder
+from utils.fake_openai import FakeOpenAI
+from utils.rag_engine import RAGEngine
+from utils.tokenizer import count_tokens, count_tokens_batch
+from utils.vector_store import NumpyVectorStore
+
+
+def _normalise(text: str) -> str:
+    return " ".join(text.lower().split())
+
+
+def load_golden_set(path: str) -> List[Dict]:
+    """
+    Read a golden set
+
+    Args:
+        path: JSONL file, one {"id", "question", "source", "evidence"} object
+            per line ("evidence" optional: any chunk of the source is relevant)
+
+    Returns:
+        Golden questions, with normalised evidence and its two halves
+    """
+    golden = []
+    with open(path, "r", encoding="utf-8") as f:
+        for position, line in enumerate(f, start=1):
+            if not line.strip():
+                continue
+            item = json.loads(line)
+            evidence = _normalise(item.get("evidence", ""))
+            words = evidence.split()
+            half = len(words) // 2
+            halves = [" ".join(words[:half]), " ".join(words[half:])] if half >= 3 else []
+            golden.append({
+                "id": item.get("id") or f"q{position}",
+                "question": item["question"],
+                "source": item["source"],
+                "evidence": evidence,
+                "evidence_halves": halves
+            })
+    return golden
+
+
+def is_relevant(chunk: Dict, item: Dict) -> bool:
+    """Whether a retrieved chunk answers a golden question"""
+    if chunk["metadata"].get("source") != item["source"]:
+        return False
+    if not item["evidence"]:
+        return True
+    text = _normalise(chunk["text"])
+    return item["evidence"] in text or any(half in text for half in item["evidence_halves"])
+
+
+def first_relevant_rank(chunks: List[Dict], item: Dict) -> Optional[int]:
+    """1-based rank of the first relevant chunk, None if none was retrieved"""
+    for rank, chunk in enumerate(chunks, start=1):
+        if is_relevant(chunk, item):
+            return rank
+    return None
+
+
+def _parse_list(value: str, cast=int) -> List:
+    return [cast(part) for part in value.split(",") if part.strip()]
+
+
+def _parse_mmr(value: str) -> List[Optional[float]]:
+    return [None if part.strip().lower() in ("none", "off") else float(part) for part in value.split(",") if part.strip()]
+
+
+def build_index(args, documents: List[Dict], strategy: str, chunk_size: int, chunk_overlap: int, directory: str):
+    """
+    Chunk and index the documents with one chunking configuration
+
+    Returns:
+        (engine, index statistics)
+    """
+    splitter = get_text_splitter(strategy, chunk_size, chunk_overlap)
+    chunks = [
+        chunk
+        for document in documents
+        for chunk in chunk_documents(document["text"], document["filename"], splitter)
+    ]
+
+    if args.openai:
+        rag_engine = RAGEngine(NumpyVectorStore(directory))
+    else:
+        rag_engine = RAGEngine(NumpyVectorStore(directory), client=FakeOpenAI(dimensions=args.dimensions))
+        rag_engine.embedding_cache = None
+    rag_engine.answer_cache = None
+
+    start = time.perf_counter()
+    rag_engine.add_documents(chunks)
+    index_s = time.perf_counter() - start
+
+    texts = [chunk["text"] for chunk in chunks]
+    token_counts = count_tokens_batch(texts)
+    storage = rag_engine.store.storage_stats()
+    text_bytes = sum(len(text.encode("utf-8")) for text in texts)
+    return rag_engine, {
+        "chunks": len(chunks),
+        "embedding_tokens": sum(token_counts),
+        "mean_chunk_tokens": round(sum(token_counts) / max(len(chunks), 1), 1),
+        "index_bytes": storage["vector_bytes"] + text_bytes,
+        "index_s": round(index_s, 3)
+    }
+
+
+def evaluate_retrieval(rag_engine, golden: List[Dict], embeddings: List, top_k: int, mmr_lambda) -> Dict:
+    """
+    Score retrieval with one retrieval configuration
+
+    Latency covers the search only (vector + keyword ranking, MMR), as the
+    question embeddings are computed beforehand. Context tokens are those of
+    the prompt context built from the retrieved chunks (merged, deduplicated
+    and capped at CONTEXT_MAX_TOKENS, as sent to the model).
+
+    Returns:
+        Quality, prompt size and latency metrics
+    """
+    rag_engine.mmr_lambda = mmr_lambda
+    hits = 0
+    reciprocal_ranks = 0.0
+    context_tokens = 0
+    latencies = []
+    missed = []
+
+    for item, embedding in zip(golden, embeddings):
+        start = time.perf_counter()
+        chunks = rag_engine.retrieve(item["question"], n_results=top_k, query_embedding=embedding)
+        latencies.append(time.perf_counter() - start)
+
+        rank = first_relevant_rank(chunks, item)
+        if rank is None:
+            missed.append(item["id"])
+        else:
+            hits += 1
+            reciprocal_ranks += 1 / rank
+        context_tokens += count_tokens(build_context(chunks))
+
+    latency = latency_summary(latencies)
+    return {
+        "recall_at_k": round(hits / len(golden), 4),
+        "mrr": round(reciprocal_ranks / len(golden), 4),
+        "mean_context_tokens": round(context_tokens / len(golden), 1),
+        "retrieve_p50_ms": latency["p50_ms"],
+        "retrieve_p95_ms": latency["p95_ms"],
+        "missed": missed
+    }
+
+
+def recommend(rows: List[Dict], min_recall: float, rank_by: str) -> Optional[Dict]:
+    """Best configuration meeting the recall bar, by the chosen cost"""
+    keys = {
+        "latency": lambda row: (row["retrieve_p50_ms"], row["mean_context_tokens"]),
+        "context_tokens": lambda row: (row["mean_context_tokens"], row["retrieve_p50_ms"]),
+        "index_size": lambda row: (row["index_bytes"], row["retrieve_p50_ms"])
+    }
+    eligible = [row for row in rows if row["recall_at_k"] >= min_recall]
+    if not eligible:
+        return None
+    return min(eligible, key=lambda row: (keys[rank_by](row), -row["mrr"]))
+
+
+def build_parser() -> argparse.ArgumentParser:
+    tokens = CHUNKING_STRATEGY == "tokens"
+    default_sizes = f"{(CHUNK_TOKENS if tokens else CHUNK_SIZE) // 2},{CHUNK_TOKENS if tokens else CHUNK_SIZE},{(CHUNK_TOKENS if tokens else CHUNK_SIZE) * 2}"
+    default_overlaps = f"0,{CHUNK_OVERLAP_TOKENS if tokens else CHUNK_OVERLAP}"
+
+    parser = argparse.ArgumentParser(prog="evaluate.py", description="RegIntel AI retrieval evaluation")
+    parser.add_argument("--golden", default=os.path.join("data", "golden_set.jsonl"),
+                        help="golden set (default: data/golden_set.jsonl)")
+    parser.add_argument("--documents", default=os.path.join("data", "sample_documents"),
+                        help="documents the golden set refers to (default: data/sample_documents)")
+    parser.add_argument("--strategy", default=CHUNKING_STRATEGY, choices=["tokens", "characters"],
+                        help=f"chunking strategy (default: {CHUNKING_STRATEGY})")
+    parser.add_argument("--chunk-sizes", default=default_sizes,
+                        help=f"comma-separated chunk sizes, in tokens or characters (default: {default_sizes})")
+    parser.add_argument("--overlaps", default=default_overlaps,
+                        help=f"comma-separated chunk overlaps (default: {default_overlaps})")
+    parser.add_argument("--top-k", default=f"3,{TOP_K_RESULTS},10",
+                        help=f"comma-separated numbers of chunks retrieved (default: 3,{TOP_K_RESULTS},10)")
+    parser.add_argument("--mmr", default=f"none,{MMR_LAMBDA}",
+                        help=f"comma-separated MMR lambdas, 'none' for no MMR (default: none,{MMR_LAMBDA})")
+    parser.add_argument("--openai", action="store_true",
+                        help="embed with the OpenAI API instead of the offline hash embeddings")
+    parser.add_argument("--dimensions", type=int, default=EMBEDDING_DIMENSIONS or 1536,
+                        help="offline embedding size (default: EMBEDDING_DIMENSIONS or 1536)")
+    parser.add_argument("--min-recall", type=float, default=0.9,
+                        help="recall@k a recommended configuration must reach (default: 0.9)")
+    parser.add_argument("--rank-by", default="latency", choices=["latency", "context_tokens", "index_size"],
+                        help="cost minimised among configurations meeting --min-recall (default: latency)")
+    parser.add_argument("-o", "--output", help="JSON results file (default: eval_results/<date>.json)")
+    return parser
+
+
+def main(argv=None) -> int:
+    args = build_parser().parse_args(argv)
+    golden = load_golden_set(args.golden)
+    documents = load_documents_from_folder(args.documents, workers=1)
+    # Sources may be missing from a checkout (PDFs are not committed): their questions are skipped
+    missing_sources = {item["source"] for item in golden} - {document["filename"] for document in documents}
+    skipped = [item["id"] for item in golden if item["source"] in missing_sources]
+    golden = [item for item in golden if item["source"] not in missing_sources]
+    if missing_sources:
+        print(
+            f"Warning: golden set sources not found in {args.documents}: {', '.join(sorted(missing_sources))} "
+            f"({len(skipped)} questions skipped)"
+        )
+    if not golden:
+        print("No golden set question to evaluate")
+        return 1
+
+    rows = []
+    for chunk_size, chunk_overlap in itertools.product(_parse_list(args.chunk_sizes), _parse_list(args.overlaps)):
+        if chunk_overlap >= chunk_size:
+            continue
+        directory = tempfile.mkdtemp(prefix="regintel-eval-")
+        try:
+            rag_engine, index = build_index(args, documents, args.strategy, chunk_size, chunk_overlap, directory)
+            embeddings = [rag_engine.get_query_embedding(item["question"]) for item in golden]
+
+            for top_k, mmr_lambda in itertools.product(_parse_list(args.top_k), _parse_mmr(args.mmr)):
+                row = {
+                    "strategy": args.strategy,
+                    "chunk_size": chunk_size,
+                    "chunk_overlap": chunk_overlap,
+                    "top_k": top_k,
+                    "mmr_lambda": mmr_lambda,
+                    **index,
+                    **evaluate_retrieval(rag_engine, golden, embeddings, top_k, mmr_lambda)
+                }
+                rows.append(row)
+                print(
+                    f"size={chunk_size:<5} overlap={chunk_overlap:<4} k={top_k:<3} "
+                    f"mmr={'-' if mmr_lambda is None else mmr_lambda:<4} "
+                    f"recall@k={row['recall_at_k']:.2f} MRR={row['mrr']:.2f} "
+                    f"chunks={row['chunks']:<5} index={row['index_bytes'] / 1e6:.1f}MB "
+                    f"embed_tokens={row['embedding_tokens']:<7} context_tokens={row['mean_context_tokens']:<7.0f} "
+                    f"p50={row['retrieve_p50_ms']:.1f}ms"
+                )
+        finally:
+            shutil.rmtree(directory, ignore_errors=True)
+
+    best = recommend(rows, args.min_recall, args.rank_by)
+    if best is None:
+        top = max(rows, key=lambda row: (row["recall_at_k"], row["mrr"]), default=None)
+        print(f"No configuration reaches recall@k >= {args.min_recall}" + (
+            f" (best: {top['recall_at_k']:.2f} with chunk_size={top['chunk_size']} "
+            f"overlap={top['chunk_overlap']} top_k={top['top_k']} mmr={top['mmr_lambda']})" if top else ""
+        ))
+    else:
+        print(
+            f"Recommended (recall@k >= {args.min_recall}, lowest {args.rank_by}): "
+            f"{best['strategy']} chunk_size={best['chunk_size']} overlap={best['chunk_overlap']} "
+            f"top_k={best['top_k']} mmr={best['mmr_lambda']}"
+        )
+
+    output = args.output or os.path.join("eval_results", f"eval-{datetime.now().strftime('%Y%m%d-%H%M%S')}.json")
+    if os.path.dirname(output):
+        os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump({
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "revision": git_revision(),
+            "golden_set": args.golden,
+            "questions": len(golden),
+            "skipped_questions": skipped,
+            "embeddings": "openai" if args.openai else f"offline hash ({args.dimensions} dimensions)",
+            "min_recall": args.min_recall,
+            "rank_by": args.rank_by,
+            "recommended": best,
+            "results": rows
+        }, f, indent=2)
+    print(f"Results written to {output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,162 @@
+"""
+Semantic answer cache for RegIntel AI
+"""
+import threading
+import time
+from typing import List, Dict, Optional
+import numpy as np
+from config import (
+    ANSWER_CACHE_SIMILARITY,
+    ANSWER_CACHE_TTL_SECONDS,
+    ANSWER_CACHE_MAX_ENTRIES
+)
+
+
+class SemanticAnswerCache:
+    """
+    In-memory cache of answers to past questions, matched by embedding similarity
+
+    A cached answer is reused for a new question when the questions'
+    embeddings are similar enough AND retrieval returned exactly the same
+    chunks, so the answer was generated from the same evidence.
+    """
+
+    def __init__(
+        self,
+        similarity: float = ANSWER_CACHE_SIMILARITY,
+        ttl_seconds: float = ANSWER_CACHE_TTL_SECONDS,
+        max_entries: int = ANSWER_CACHE_MAX_ENTRIES
+    ):
+        """
+        Create an empty cache
+
+        Args:
+            similarity: Minimum cosine similarity between questions
+            ttl_seconds: Lifetime of an entry
+            max_entries: Maximum number of entries before evicting the least recently used
+        """
+        self.similarity = similarity
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._vectors = None  # (n, dim) matrix of normalised question embeddings
+        self._entries: List[Dict] = []
+
+    @staticmethod
+    def _normalise(embedding: List[float]) -> np.ndarray:
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _drop(self, keep: np.ndarray):
+        """Keep only the entries where keep is True (caller holds the lock)"""
+        self._entries = [entry for entry, kept in zip(self._entries, keep) if kept]
+        self._vectors = self._vectors[keep] if self._entries else None
+
+    def lookup(self, question_embedding: List[float], chunk_ids: List[str]) -> Optional[Dict]:
+        """
+        Find a cached answer for a question
+
+        Args:
+            question_embedding: Embedding of the new question
+            chunk_ids: IDs of the chunks retrieved for the new question
+
+        Returns:
+            Cached entry (question, answer, sources...) or None
+        """
+        query = self._normalise(question_embedding)
+        chunk_key = frozenset(chunk_ids)
+        now = time.time()
+
+        with self._lock:
+            if self._entries:
+                # Drop expired entries
+                expired = np.array([now - entry["created"] > self.ttl_seconds for entry in self._entries])
+                if expired.any():
+                    self._drop(~expired)
+
+            if self._entries and self._vectors.shape[1] == query.shape[0]:
+                scores = self._vectors @ query
+                for idx in np.argsort(-scores):
+                    if scores[idx] < self.similarity:
+                        break
+                    entry = self._entries[idx]
+                    if entry["chunk_key"] == chunk_key:
+                        entry["last_used"] = now
+                        self.hits += 1
+                        return entry
+
+            self.misses += 1
+            return None
+
+    def store(
+        self,
+        question: str,
+        question_embedding: List[float],
+        chunk_ids: List[str],
+        answer: str,
+        sources: List[Dict]
+    ):
+        """
+        Cache the answer to a question
+
+        Args:
+            question: Question text
+            question_embedding: Embedding of the question
+            chunk_ids: IDs of the chunks the answer was generated from
+            answer: Generated answer
+            sources: Retrieved chunks returned with the answer
+        """
+        vector = self._normalise(question_embedding)
+        now = time.time()
+        entry = {
+            "question": question,
+            "chunk_key": frozenset(chunk_ids),
+            "answer": answer,
+            "sources": sources,
+            "created": now,
+            "last_used": now
+        }
+
+        with self._lock:
+            if self._entries and self._vectors.shape[1] != vector.shape[0]:
+                # Embedding model changed, previous entries are not comparable
+                self._entries = []
+                self._vectors = None
+
+            if len(self._entries) >= self.max_entries:
+                # Evict the least recently used entries
+                keep = np.ones(len(self._entries), dtype=bool)
+                by_use = np.argsort([e["last_used"] for e in self._entries])
+                keep[by_use[:len(self._entries) - self.max_entries + 1]] = False
+                self._drop(keep)
+
+            self._entries.append(entry)
+            if self._vectors is None:
+                self._vectors = vector[np.newaxis, :]
+            else:
+                self._vectors = np.vstack([self._vectors, vector])
+
+    def clear(self):
+        """Remove every entry (e.g. when the document collection changes)"""
+        with self._lock:
+            self._entries = []
+            self._vectors = None
+
+    def stats(self) -> Dict[str, float]:
+        """
+        Get cache counters
+
+        Returns:
+            Dictionary with hits, misses, hit rate and number of entries
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "entries": len(self._entries)
+            }
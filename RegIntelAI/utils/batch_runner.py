@@ -0,0 +1,240 @@
+"""
+Batch question answering for RegIntel AI (e.g. compliance checklists)
+"""
+import csv
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import List, Dict, Callable, Optional
+from config import BATCH_CONCURRENCY
+from utils.document_processor import format_citations
+from utils.export import export_to_csv
+
+# Columns added to the chat export format, as {header: message key}
+RESULT_COLUMNS = {
+    "Question ID": "question_id",
+    "Latency (s)": "latency_s",
+    "Prompt Tokens": "prompt_tokens",
+    "Completion Tokens": "completion_tokens",
+    "Total Tokens": "total_tokens",
+    "Cached": "cached",
+    "Error": "error"
+}
+
+
+def _parse_sources(value) -> Optional[List[str]]:
+    """Document filter of a question: a list, or a ';'-separated string"""
+    if not value:
+        return None
+    if isinstance(value, str):
+        value = value.split(";")
+    sources = [source.strip() for source in value if source and source.strip()]
+    return sources or None
+
+
+def load_questions(path: str) -> List[Dict]:
+    """
+    Read a question file
+
+    JSONL: one {"question": ..., "id": ..., "sources": [...]} object per line.
+    CSV: a "question" column, with optional "id" and "sources" (';'-separated)
+    columns. Questions without an ID are numbered q1, q2, ... by position.
+
+    Args:
+        path: .jsonl or .csv file
+
+    Returns:
+        List of {"id", "question", "sources"} dictionaries, in file order
+    """
+    if path.lower().endswith(".csv"):
+        with open(path, "r", encoding="utf-8-sig", newline="") as f:
+            rows = [
+                {(key or "").strip().lower(): value for key, value in row.items()}
+                for row in csv.DictReader(f)
+            ]
+    else:
+        with open(path, "r", encoding="utf-8") as f:
+            rows = [json.loads(line) for line in f if line.strip()]
+
+    questions = []
+    seen_ids = set()
+    for position, row in enumerate(rows, start=1):
+        question = (row.get("question") or "").strip()
+        if not question:
+            continue
+        question_id = str(row.get("id") or "").strip() or f"q{position}"
+        if question_id in seen_ids:
+            raise ValueError(f"Duplicate question ID in {path}: {question_id}")
+        seen_ids.add(question_id)
+        questions.append({
+            "id": question_id,
+            "question": question,
+            "sources": _parse_sources(row.get("sources"))
+        })
+    return questions
+
+
+def load_checkpoint(checkpoint_path: str) -> Dict[str, Dict]:
+    """
+    Read the results recorded by a previous run
+
+    Args:
+        checkpoint_path: JSONL checkpoint file
+
+    Returns:
+        Latest result per question ID (empty if there is no checkpoint)
+    """
+    results = {}
+    if not os.path.exists(checkpoint_path):
+        return results
+    with open(checkpoint_path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                result = json.loads(line)
+            except json.JSONDecodeError:
+                # Line cut short by an interrupted run
+                continue
+            results[result["id"]] = result
+    return results
+
+
+def answer_question(rag_engine, question: Dict, sources: Optional[List[str]] = None) -> Dict:
+    """
+    Answer one question, recording latency, token usage and any error
+
+    Args:
+        rag_engine: RAGEngine to query
+        question: {"id", "question", "sources"} dictionary
+        sources: Document filter used when the question has none
+
+    Returns:
+        Result dictionary (JSON-serialisable)
+    """
+    start = time.perf_counter()
+    result = {"id": question["id"], "question": question["question"]}
+    try:
+        response = rag_engine.query(question["question"], sources=question.get("sources") or sources)
+        result.update({
+            "answer": response["answer"],
+            "citations": format_citations(response["sources"]),
+            "cached": response["cached"],
+            **response["usage"],
+            "error": None
+        })
+    except Exception as e:
+        result.update({
+            "answer": "",
+            "citations": "",
+            "cached": False,
+            "prompt_tokens": 0,
+            "completion_tokens": 0,
+            "total_tokens": 0,
+            "error": str(e)
+        })
+    result["latency_s"] = round(time.perf_counter() - start, 3)
+    result["timestamp"] = datetime.now().strftime("%H:%M:%S")
+    return result
+
+
+def run_batch(
+    rag_engine,
+    questions: List[Dict],
+    checkpoint_path: str,
+    concurrency: int = BATCH_CONCURRENCY,
+    sources: Optional[List[str]] = None,
+    progress: Optional[Callable[[Dict, int, int], None]] = None
+) -> List[Dict]:
+    """
+    Answer questions concurrently, resuming from a checkpoint
+
+    Each result is appended to the checkpoint as soon as it is known, so an
+    interrupted run only repeats the questions that were in flight. Questions
+    already answered (same ID and text) are skipped; failed ones are retried.
+
+    Args:
+        rag_engine: RAGEngine to query
+        questions: Questions from load_questions
+        checkpoint_path: JSONL file recording each result
+        concurrency: Questions answered at once
+        sources: Document filter for questions that have none
+        progress: Called with (result, done, total) after each question
+
+    Returns:
+        Results in question order
+    """
+    results = {
+        question_id: result
+        for question_id, result in load_checkpoint(checkpoint_path).items()
+        if result.get("error") is None
+    }
+    pending = [
+        question for question in questions
+        if results.get(question["id"], {}).get("question") != question["question"]
+    ]
+    total = len(questions)
+    done = [total - len(pending)]
+    lock = threading.Lock()
+
+    checkpoint_dir = os.path.dirname(checkpoint_path)
+    if checkpoint_dir:
+        os.makedirs(checkpoint_dir, exist_ok=True)
+
+    with open(checkpoint_path, "a", encoding="utf-8") as checkpoint:
+        def run_one(question: Dict):
+            result = answer_question(rag_engine, question, sources)
+            with lock:
+                checkpoint.write(json.dumps(result, ensure_ascii=False) + "\n")
+                checkpoint.flush()
+                results[question["id"]] = result
+                done[0] += 1
+                if progress:
+                    progress(result, done[0], total)
+
+        executor = ThreadPoolExecutor(max_workers=max(1, concurrency))
+        try:
+            futures = [executor.submit(run_one, question) for question in pending]
+            for future in futures:
+                future.result()
+        finally:
+            # On interrupt, drop queued questions but record the ones in flight
+            executor.shutdown(wait=True, cancel_futures=True)
+
+    return [results[question["id"]] for question in questions]
+
+
+def results_to_csv(results: List[Dict]) -> str:
+    """
+    Export batch results in the chat CSV format, one question/answer pair
+    per question, with latency and token usage columns
+
+    Args:
+        results: Results from run_batch
+
+    Returns:
+        CSV content as string
+    """
+    messages = []
+    for result in results:
+        messages.append({
+            "role": "user",
+            "content": result["question"],
+            "timestamp": result.get("timestamp", ""),
+            "question_id": result["id"]
+        })
+        messages.append({
+            "role": "assistant",
+            "content": result["answer"],
+            "timestamp": result.get("timestamp", ""),
+            "sources": result["citations"],
+            "question_id": result["id"],
+            "latency_s": result["latency_s"],
+            "prompt_tokens": result["prompt_tokens"],
+            "completion_tokens": result["completion_tokens"],
+            "total_tokens": result["total_tokens"],
+            "cached": result["cached"],
+            "error": result["error"] or ""
+        })
+    return export_to_csv(messages, RESULT_COLUMNS)
@@ -0,0 +1,163 @@
+"""
+In-process BM25 keyword index for RegIntel AI
+"""
+import heapq
+import math
+import re
+import threading
+from collections import Counter
+from typing import List, Dict, Iterable, Optional, Tuple
+from config import BM25_K1, BM25_B
+
+# Words, plus regulatory identifiers kept whole: "35(7)", "EBA/GL/2020/06", "2016/679"
+TOKEN_PATTERN = re.compile(r"\w+(?:[./\-]\w+|\(\w+\))*")
+WORD_PATTERN = re.compile(r"\w+")
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Split text into lowercase index terms
+
+    Compound identifiers are indexed both whole and by their parts, so
+    "Article 35(7)" matches queries for "35(7)" as well as "article 35".
+
+    Args:
+        text: Text to tokenize
+
+    Returns:
+        List of terms
+    """
+    terms = []
+    for match in TOKEN_PATTERN.finditer(text.lower()):
+        term = match.group()
+        terms.append(term)
+        parts = WORD_PATTERN.findall(term)
+        if len(parts) > 1:
+            terms.extend(parts)
+    return terms
+
+
+def reciprocal_rank_fusion(rankings: List[List[str]], k: int = 60) -> List[Tuple[str, float]]:
+    """
+    Merge several rankings of IDs with reciprocal rank fusion
+
+    Args:
+        rankings: Lists of IDs, best first
+        k: RRF constant (higher values flatten the contribution of top ranks)
+
+    Returns:
+        (id, fused score) pairs, best first
+    """
+    scores = {}
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking):
+            scores[doc_id] = scores.get(doc_id, 0.0) + 1.0 / (k + rank + 1)
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)
+
+
+class BM25Index:
+    """Inverted index with BM25 scoring, kept in sync with the vector store"""
+
+    def __init__(self, k1: float = BM25_K1, b: float = BM25_B):
+        """
+        Create an empty index
+
+        Args:
+            k1: Term frequency saturation
+            b: Document length normalisation
+        """
+        self.k1 = k1
+        self.b = b
+        self._postings: Dict[str, Dict[str, int]] = {}
+        self._doc_terms: Dict[str, List[str]] = {}
+        self._doc_lengths: Dict[str, int] = {}
+        self._doc_sources: Dict[str, str] = {}
+        self._total_length = 0
+        self._lock = threading.RLock()
+
+    def __len__(self) -> int:
+        return len(self._doc_lengths)
+
+    def add(self, ids: List[str], texts: List[str], metadatas: List[Dict]):
+        """
+        Index (or re-index) chunks
+
+        Args:
+            ids: Chunk IDs
+            texts: Chunk texts
+            metadatas: Chunk metadata (the "source" is kept for deletes)
+        """
+        with self._lock:
+            self.remove(ids)
+            for doc_id, text, metadata in zip(ids, texts, metadatas):
+                term_counts = Counter(tokenize(text))
+                for term, count in term_counts.items():
+                    self._postings.setdefault(term, {})[doc_id] = count
+                length = sum(term_counts.values())
+                self._doc_terms[doc_id] = list(term_counts)
+                self._doc_lengths[doc_id] = length
+                self._doc_sources[doc_id] = metadata.get("source", "")
+                self._total_length += length
+
+    def remove(self, ids: Iterable[str]):
+        """Remove chunks by ID (unknown IDs are ignored)"""
+        with self._lock:
+            for doc_id in ids:
+                if doc_id not in self._doc_lengths:
+                    continue
+                for term in self._doc_terms.pop(doc_id):
+                    postings = self._postings[term]
+                    del postings[doc_id]
+                    if not postings:
+                        del self._postings[term]
+                self._total_length -= self._doc_lengths.pop(doc_id)
+                del self._doc_sources[doc_id]
+
+    def remove_source(self, source: str):
+        """Remove every chunk of a document"""
+        with self._lock:
+            self.remove([
+                doc_id for doc_id, doc_source in self._doc_sources.items() if doc_source == source
+            ])
+
+    def clear(self):
+        """Remove every chunk"""
+        with self._lock:
+            self._postings = {}
+            self._doc_terms = {}
+            self._doc_lengths = {}
+            self._doc_sources = {}
+            self._total_length = 0
+
+    def search(self, query: str, n_results: int, sources: Optional[List[str]] = None) -> List[Tuple[str, float]]:
+        """
+        Rank chunks for a query
+
+        Args:
+            query: Search query
+            n_results: Number of results to return
+            sources: Only rank chunks of these documents (all documents if None)
+
+        Returns:
+            (id, BM25 score) pairs, best first
+        """
+        with self._lock:
+            n_docs = len(self._doc_lengths)
+            if n_docs == 0:
+                return []
+            avg_length = self._total_length / n_docs
+            allowed = set(sources) if sources is not None else None
+
+            scores = {}
+            for term in set(tokenize(query)):
+                postings = self._postings.get(term)
+                if not postings:
+                    continue
+                idf = math.log(1 + (n_docs - len(postings) + 0.5) / (len(postings) + 0.5))
+                for doc_id, tf in postings.items():
+                    if allowed is not None and self._doc_sources[doc_id] not in allowed:
+                        continue
+                    norm = self.k1 * (1 - self.b + self.b * self._doc_lengths[doc_id] / avg_length)
+                    scores[doc_id] = scores.get(doc_id, 0.0) + idf * tf * (self.k1 + 1) / (tf + norm)
+
+        return heapq.nlargest(n_results, scores.items(), key=lambda item: item[1])
@@ -0,0 +1,160 @@
+"""
+Context assembly for RegIntel AI answers
+"""
+import re
+from typing import List, Dict, Optional
+from config import CONTEXT_MAX_TOKENS
+from utils.tokenizer import count_tokens, truncate_tokens
+
+# Separator between spans in the prompt
+SPAN_SEPARATOR = "\n\n---\n\n"
+
+# Shortest suffix/prefix match treated as chunk overlap rather than coincidence
+MIN_OVERLAP_CHARS = 20
+
+
+def _normalise(text: str) -> str:
+    return re.sub(r"\s+", " ", text).strip()
+
+
+def merge_overlapping(left: str, right: str) -> str:
+    """
+    Join two consecutive chunks, keeping the text they share only once
+
+    Args:
+        left: Earlier chunk
+        right: Next chunk, which may start with the end of left
+
+    Returns:
+        Merged text
+    """
+    probe = right[:MIN_OVERLAP_CHARS]
+    if len(probe) == MIN_OVERLAP_CHARS:
+        # Longest suffix of left that is a prefix of right
+        start = left.find(probe)
+        while start != -1:
+            if right.startswith(left[start:]):
+                return left + right[len(left) - start:]
+            start = left.find(probe, start + 1)
+    # No overlap found (e.g. stripped whitespace), keep both texts
+    return left.rstrip() + "\n" + right.lstrip()
+
+
+def _chunk_label(chunk_ids: List[int]) -> str:
+    if not chunk_ids:
+        return ""
+    if len(chunk_ids) == 1:
+        return f" (Chunk {chunk_ids[0] + 1})"
+    return f" (Chunks {chunk_ids[0] + 1}-{chunk_ids[-1] + 1})"
+
+
+def format_span(span: Dict) -> str:
+    """Format a span with its source header, as it appears in the prompt"""
+    return f"Source: {span['source']}{_chunk_label(span['chunk_ids'])}\n{span['text']}"
+
+
+def merge_chunks(chunks: List[Dict]) -> List[Dict]:
+    """
+    Merge retrieved chunks into spans of contiguous text
+
+    Chunks of the same source with consecutive chunk IDs become one span
+    whose overlapping text appears once. Chunks whose text is repeated in
+    a more relevant span (e.g. the same page in two files) are dropped.
+
+    Args:
+        chunks: Retrieved chunks, most relevant first
+
+    Returns:
+        Spans ({"source", "chunk_ids", "text", "rank"}), most relevant first,
+        where rank is the best position of the span's chunks in the input
+    """
+    # Group by source, remembering each chunk's relevance rank
+    by_source: Dict[str, List] = {}
+    singles = []
+    for rank, chunk in enumerate(chunks):
+        metadata = chunk.get("metadata", {})
+        source = metadata.get("source", "Unknown")
+        chunk_id = metadata.get("chunk_id")
+        if isinstance(chunk_id, int):
+            by_source.setdefault(source, []).append((chunk_id, rank, chunk["text"]))
+        else:
+            singles.append({"source": source, "chunk_ids": [], "text": chunk["text"], "rank": rank})
+
+    spans = singles
+    for source, members in by_source.items():
+        members.sort()
+        span = None
+        for chunk_id, rank, text in members:
+            if span is not None and chunk_id == span["chunk_ids"][-1]:
+                # Same chunk retrieved twice
+                span["rank"] = min(span["rank"], rank)
+                continue
+            if span is not None and chunk_id == span["chunk_ids"][-1] + 1:
+                span["text"] = merge_overlapping(span["text"], text)
+                span["chunk_ids"].append(chunk_id)
+                span["rank"] = min(span["rank"], rank)
+                continue
+            span = {"source": source, "chunk_ids": [chunk_id], "text": text, "rank": rank}
+            spans.append(span)
+
+    spans.sort(key=lambda span: span["rank"])
+
+    # Drop spans whose text is already contained in a more relevant span
+    unique = []
+    seen = []
+    for span in spans:
+        normalised = _normalise(span["text"])
+        if not normalised or any(normalised in other for other in seen):
+            continue
+        seen.append(normalised)
+        unique.append(span)
+    return unique
+
+
+def assemble_context(chunks: List[Dict], max_tokens: Optional[int] = CONTEXT_MAX_TOKENS) -> List[Dict]:
+    """
+    Select the spans that fit in the prompt's context budget
+
+    Spans are packed in relevance order; one that does not fit is skipped
+    so smaller, less relevant spans can still use the remaining budget. If
+    even the most relevant span is too long, it is truncated.
+
+    Args:
+        chunks: Retrieved chunks, most relevant first
+        max_tokens: Token budget for the formatted context (None for no limit)
+
+    Returns:
+        Selected spans, most relevant first
+    """
+    spans = merge_chunks(chunks)
+    if max_tokens is None:
+        return spans
+
+    separator_tokens = count_tokens(SPAN_SEPARATOR)
+    selected = []
+    used = 0
+    for span in spans:
+        cost = count_tokens(format_span(span)) + (separator_tokens if selected else 0)
+        if used + cost <= max_tokens:
+            selected.append(span)
+            used += cost
+        elif not selected:
+            header_tokens = count_tokens(format_span(dict(span, text="")))
+            span = dict(span, text=truncate_tokens(span["text"], max(max_tokens - header_tokens, 0)))
+            selected.append(span)
+            used = max_tokens
+    return selected
+
+
+def build_context(chunks: List[Dict], max_tokens: Optional[int] = CONTEXT_MAX_TOKENS) -> str:
+    """
+    Build the context section of a RAG prompt
+
+    Args:
+        chunks: Retrieved chunks, most relevant first
+        max_tokens: Token budget for the context (None for no limit)
+
+    Returns:
+        Context text with a source header per span
+    """
+    return SPAN_SEPARATOR.join(format_span(span) for span in assemble_context(chunks, max_tokens))
@@ -1,17 +1,35 @@
 """
 Document processing utilities for RegIntelAI
 """
+import codecs
+import multiprocessing
 import os
-from typing import List, Dict, BinaryIO
-from pypdf import PdfReader
+import re
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from typing import List, Dict, BinaryIO, Iterable, Iterator, Optional, Tuple
 from pathlib import Path
-from config import CHUNK_SIZE, CHUNK_OVERLAP
+from config import (
+    CHUNK_SIZE,
+    CHUNK_OVERLAP,
+    CHUNKING_STRATEGY,
+    CHUNK_TOKENS,
+    CHUNK_OVERLAP_TOKENS,
+    EXTRACTION_WORKERS
+)
+from utils.telemetry import span, timed_iter
+from utils.tokenizer import count_tokens, split_tokens, tail_tokens
+
+SUPPORTED_EXTENSIONS = ['.pdf', '.txt', '.md', '.docx']
+
+# Read size for streaming plain text files
+TEXT_BLOCK_SIZE = 64 * 1024
 
 # Classe simple de text splitter pour remplacer langchain
 class RecursiveCharacterTextSplitter:
     def __init__(self, chunk_size: int, chunk_overlap: int):
         self.chunk_size = chunk_size
-        self.chunk_overlap = chunk_overlap
+        # An overlap >= chunk size would never advance, cap it at half a chunk
+        self.chunk_overlap = min(chunk_overlap, chunk_size // 2)
     
     def split_text(self, text: str) -> list:
         """Split text into chunks"""
@@ -26,29 +44,249 @@ class RecursiveCharacterTextSplitter:
             start = end - self.chunk_overlap
         
         return chunks
+    
+    def split_stream(self, segments: Iterable[str]) -> Iterator[str]:
+        """
+        Split a stream of text segments (pages, paragraphs...) into chunks
+        
+        Produces the same chunks as split_text on the concatenated text, but
+        only keeps about one chunk of text in memory. The overlap carries
+        across segment boundaries.
+        """
+        step = self.chunk_size - self.chunk_overlap
+        buffer = ""
+        pos = 0
+        
+        for segment in segments:
+            if not segment:
+                continue
+            buffer = buffer[pos:] + segment
+            pos = 0
+            # Emit chunks while a full chunk (and a bit more) is buffered
+            while len(buffer) - pos > self.chunk_size:
+                yield buffer[pos:pos + self.chunk_size]
+                pos += step
+        
+        buffer = buffer[pos:]
+        start = 0
+        while start < len(buffer):
+            yield buffer[start:start + self.chunk_size]
+            start += step
 
 
-def extract_text_from_pdf(pdf_file) -> str:
+class TokenTextSplitter:
     """
-    Extract text from uploaded PDF file
+    Token-budgeted text splitter that prefers structural boundaries
+    
+    Text is split on the highest-level boundary available (headings, page
+    markers, articles, paragraphs, lines, sentences, words) and the pieces
+    are packed greedily up to the token budget. The overlap is the tail of
+    the previous chunk, so each chunk stays within chunk_size tokens.
+    """
+    
+    # Boundaries, from most to least preferred. Split points are zero-width
+    # so that every piece keeps its text and pieces join back losslessly.
+    SEPARATORS = [
+        re.compile(r"(?=\n#{1,6} )"),  # Markdown headings
+        re.compile(r"(?=\n\n--- Page \d+ ---)"),  # PDF page markers
+        re.compile(r"(?=\n(?:Article|ARTICLE|Art\.|Section|SECTION|Chapter|CHAPTER|Chapitre|Titre|TITLE) [0-9IVXLC]+)"),
+        re.compile(r"(?<=\n\n)(?=\S)"),  # Paragraphs
+        re.compile(r"(?<=\n)(?=\S)"),  # Lines
+        re.compile(r"(?<=[.!?;:])(?=\s)"),  # Sentences
+        re.compile(r"(?<=\S)(?=\s)"),  # Words
+    ]
+    
+    # Characters buffered before splitting a stream (~ tokens * 4 characters)
+    STREAM_WINDOW_CHUNKS = 16
+    
+    def __init__(self, chunk_size: int, chunk_overlap: int):
+        self.chunk_size = max(1, chunk_size)
+        # An overlap >= chunk size would leave no room for new text, cap it at half a chunk
+        self.chunk_overlap = max(0, min(chunk_overlap, self.chunk_size // 2))
+        self.content_budget = self.chunk_size - self.chunk_overlap
+    
+    def _split_pieces(self, text: str, level: int) -> List[Tuple[str, int]]:
+        """Split text into (piece, tokens) pairs that each fit the content budget"""
+        n_tokens = count_tokens(text)
+        if n_tokens <= self.content_budget:
+            return [(text, n_tokens)]
+        
+        if level >= len(self.SEPARATORS):
+            return [(piece, count_tokens(piece)) for piece in split_tokens(text, self.content_budget)]
+        
+        parts = [part for part in self.SEPARATORS[level].split(text) if part]
+        if len(parts) <= 1:
+            return self._split_pieces(text, level + 1)
+        
+        pieces = []
+        for part in parts:
+            pieces.extend(self._split_pieces(part, level + 1))
+        return self._pack(pieces)
+    
+    def _pack(self, pieces: List[Tuple[str, int]]) -> List[Tuple[str, int]]:
+        """Greedily merge consecutive pieces up to the content budget"""
+        packed = []
+        current = []
+        current_tokens = 0
+        
+        for piece, n_tokens in pieces:
+            if current and current_tokens + n_tokens > self.content_budget:
+                packed.append(("".join(current), current_tokens))
+                current = []
+                current_tokens = 0
+            current.append(piece)
+            current_tokens += n_tokens
+        
+        if current:
+            packed.append(("".join(current), current_tokens))
+        return packed
+    
+    def _split_content(self, text: str) -> List[str]:
+        """Split text into chunks of new content (without overlap)"""
+        return [piece for piece, _ in self._split_pieces(text, 0)]
+    
+    def _add_overlap(self, contents: Iterable[str]) -> Iterator[str]:
+        """Prefix each chunk with the tail of the previous one"""
+        previous = None
+        for content in contents:
+            if not content.strip():
+                continue
+            if previous is not None and self.chunk_overlap:
+                overlap = tail_tokens(previous, self.chunk_overlap)
+                # Start the overlap on a word boundary
+                match = re.search(r"\s", overlap)
+                if match and len(overlap) < len(previous):
+                    overlap = overlap[match.end():]
+                yield overlap + content
+            else:
+                yield content
+            previous = content
+    
+    def split_text(self, text: str) -> list:
+        """Split text into chunks"""
+        return list(self._add_overlap(self._split_content(text)))
+    
+    def split_stream(self, segments: Iterable[str]) -> Iterator[str]:
+        """
+        Split a stream of text segments (pages, paragraphs...) into chunks
+        
+        Buffers a window of a few chunks, emits every chunk but the last one
+        (which may continue in the next segment) and carries it forward.
+        """
+        window_chars = self.chunk_size * 4 * self.STREAM_WINDOW_CHUNKS
+        parts = []
+        buffered = 0
+        
+        def contents() -> Iterator[str]:
+            nonlocal parts, buffered
+            for segment in segments:
+                if not segment:
+                    continue
+                parts.append(segment)
+                buffered += len(segment)
+                if buffered < window_chars:
+                    continue
+                
+                chunks = self._split_content("".join(parts))
+                yield from chunks[:-1]
+                parts = [chunks[-1]] if chunks else []
+                buffered = len(parts[0]) if parts else 0
+            
+            if parts:
+                yield from self._split_content("".join(parts))
+        
+        return self._add_overlap(contents())
+
+
+def get_text_splitter(
+    strategy: str = CHUNKING_STRATEGY,
+    chunk_size: int = None,
+    chunk_overlap: int = None
+):
+    """
+    Build the configured text splitter
     
     Args:
-        pdf_file: Streamlit uploaded file object or file path
+        strategy: "tokens" (token-aware, boundary-respecting) or "characters"
+        chunk_size: Chunk size in tokens or characters (config default if None)
+        chunk_overlap: Overlap in tokens or characters (config default if None)
         
     Returns:
-        Extracted text as string
+        Text splitter with split_text and split_stream methods
+    """
+    if strategy == "tokens":
+        return TokenTextSplitter(
+            chunk_size=CHUNK_TOKENS if chunk_size is None else chunk_size,
+            chunk_overlap=CHUNK_OVERLAP_TOKENS if chunk_overlap is None else chunk_overlap
+        )
+    elif strategy == "characters":
+        return RecursiveCharacterTextSplitter(
+            chunk_size=CHUNK_SIZE if chunk_size is None else chunk_size,
+            chunk_overlap=CHUNK_OVERLAP if chunk_overlap is None else chunk_overlap
+        )
+    else:
+        raise Exception(f"Unknown chunking strategy: {strategy}")
+
+
+def iter_pdf_pages(pdf_file) -> Iterator[str]:
+    """
+    Lazily extract text from a PDF file, one page at a time
+    
+    Args:
+        pdf_file: Streamlit uploaded file object or file path
+        
+    Yields:
+        Text of each page, prefixed with a page marker
     """
     try:
+        # Imported on first use: pypdf is only needed when a PDF is parsed
+        from pypdf import PdfReader
         pdf_reader = PdfReader(pdf_file)
-        text = ""
         for page_num, page in enumerate(pdf_reader.pages):
             page_text = page.extract_text()
-            text += f"\n\n--- Page {page_num + 1} ---\n\n{page_text}"
-        return text
+            yield f"\n\n--- Page {page_num + 1} ---\n\n{page_text}"
     except Exception as e:
         raise Exception(f"Error extracting text from PDF: {str(e)}")
 
 
+def extract_text_from_pdf(pdf_file) -> str:
+    """
+    Extract text from uploaded PDF file
+    
+    Args:
+        pdf_file: Streamlit uploaded file object or file path
+        
+    Returns:
+        Extracted text as string
+    """
+    return "".join(iter_pdf_pages(pdf_file))
+
+
+def iter_txt_blocks(txt_file) -> Iterator[str]:
+    """
+    Lazily read a TXT file in blocks
+    
+    Args:
+        txt_file: Streamlit uploaded file object or file path
+        
+    Yields:
+        Successive blocks of text
+    """
+    try:
+        if isinstance(txt_file, str):
+            with open(txt_file, 'r', encoding='utf-8') as f:
+                for block in iter(lambda: f.read(TEXT_BLOCK_SIZE), ''):
+                    yield block
+        else:
+            # Incremental decoder so multi-byte characters split across blocks decode correctly
+            decoder = codecs.getincrementaldecoder('utf-8')()
+            for raw_block in iter(lambda: txt_file.read(TEXT_BLOCK_SIZE), b''):
+                yield decoder.decode(raw_block)
+            yield decoder.decode(b'', final=True)
+    except Exception as e:
+        raise Exception(f"Error extracting text from TXT: {str(e)}")
+
+
 def extract_text_from_txt(txt_file) -> str:
     """
     Extract text from TXT file
@@ -69,44 +307,52 @@ def extract_text_from_txt(txt_file) -> str:
         raise Exception(f"Error extracting text from TXT: {str(e)}")
 
 
-def extract_text_from_docx(docx_file) -> str:
+def iter_docx_paragraphs(docx_file) -> Iterator[str]:
     """
-    Extract text from DOCX file
+    Lazily extract text from a DOCX file, one paragraph at a time
     
     Args:
         docx_file: Streamlit uploaded file object or file path
         
-    Returns:
-        Extracted text as string
+    Yields:
+        Text of each paragraph, followed by a newline
     """
     try:
         from docx import Document
-        if isinstance(docx_file, str):
-            doc = Document(docx_file)
-        else:
-            doc = Document(docx_file)
+        doc = Document(docx_file)
         
-        text = ""
         for para in doc.paragraphs:
-            text += para.text + "\n"
-        return text
+            yield para.text + "\n"
     except ImportError:
         raise Exception("python-docx not installed. Run: pip install python-docx")
     except Exception as e:
         raise Exception(f"Error extracting text from DOCX: {str(e)}")
 
 
-def extract_text_from_file(file, filename: str = None) -> str:
+def extract_text_from_docx(docx_file) -> str:
     """
-    Extract text from any supported file format
+    Extract text from DOCX file
     
     Args:
-        file: File object or path
-        filename: Name of the file (to determine type)
+        docx_file: Streamlit uploaded file object or file path
         
     Returns:
         Extracted text as string
     """
+    return "".join(iter_docx_paragraphs(docx_file))
+
+
+def iter_text_segments(file, filename: str = None) -> Iterator[str]:
+    """
+    Lazily extract text from any supported file format
+    
+    Args:
+        file: File object or path
+        filename: Name of the file (to determine type)
+        
+    Yields:
+        Text segments (PDF pages, DOCX paragraphs or TXT/MD blocks)
+    """
     if filename is None:
         if isinstance(file, str):
             filename = file
@@ -116,21 +362,121 @@ def extract_text_from_file(file, filename: str = None) -> str:
     ext = Path(filename).suffix.lower()
     
     if ext == '.pdf':
-        return extract_text_from_pdf(file)
+        segments = iter_pdf_pages(file)
     elif ext == '.txt' or ext == '.md':
-        return extract_text_from_txt(file)
+        segments = iter_txt_blocks(file)
     elif ext == '.docx':
-        return extract_text_from_docx(file)
+        segments = iter_docx_paragraphs(file)
     else:
         raise Exception(f"Unsupported file format: {ext}")
+    
+    return timed_iter("extract", segments, file=Path(filename).name, format=ext.lstrip('.'))
+
+
+def extract_text_from_file(file, filename: str = None) -> str:
+    """
+    Extract text from any supported file format
+    
+    Args:
+        file: File object or path
+        filename: Name of the file (to determine type)
+        
+    Returns:
+        Extracted text as string
+    """
+    if filename is None:
+        if isinstance(file, str):
+            filename = file
+        else:
+            filename = getattr(file, 'name', '')
+    
+    ext = Path(filename).suffix.lower()
+    
+    with span("extract", file=Path(filename).name, format=ext.lstrip('.')) as current:
+        if ext == '.pdf':
+            text = extract_text_from_pdf(file)
+        elif ext == '.txt' or ext == '.md':
+            text = extract_text_from_txt(file)
+        elif ext == '.docx':
+            text = extract_text_from_docx(file)
+        else:
+            raise Exception(f"Unsupported file format: {ext}")
+        current.set(chars=len(text))
+    
+    return text
+
+
+def _extract_file_worker(path: str) -> Tuple[str, Optional[str], Optional[str]]:
+    """Extract one file, returning the error message instead of raising"""
+    try:
+        return path, extract_text_from_file(path), None
+    except Exception as e:
+        return path, None, str(e)
 
 
-def load_documents_from_folder(folder_path: str) -> List[Dict[str, str]]:
+def iter_extracted_files(
+    paths: List[str],
+    workers: int = EXTRACTION_WORKERS
+) -> Iterator[Tuple[str, Optional[str], Optional[str]]]:
+    """
+    Extract text from many files, in parallel worker processes
+    
+    Results are yielded as soon as each file finishes (not in input order).
+    A failing file only produces an error for that file.
+    
+    Args:
+        paths: File paths to extract
+        workers: Number of worker processes (1 extracts in this process)
+        
+    Yields:
+        (path, text, error) tuples, with text None when error is set
+    """
+    if workers <= 1 or len(paths) <= 1:
+        for path in paths:
+            yield _extract_file_worker(path)
+        return
+    
+    pending_paths = iter(paths)
+    max_in_flight = workers * 2
+    
+    # Spawned rather than forked: callers run in threaded servers (the ingestion
+    # queue), and a forked worker would inherit locks held by other threads
+    with ProcessPoolExecutor(
+        max_workers=min(workers, len(paths)),
+        mp_context=multiprocessing.get_context("spawn")
+    ) as executor:
+        in_flight = {}
+        
+        def submit_next() -> bool:
+            path = next(pending_paths, None)
+            if path is None:
+                return False
+            in_flight[executor.submit(_extract_file_worker, path)] = path
+            return True
+        
+        # Keep a bounded number of files in flight so finished texts do not pile up
+        while len(in_flight) < max_in_flight and submit_next():
+            pass
+        
+        while in_flight:
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                path = in_flight.pop(future)
+                try:
+                    yield future.result()
+                except Exception as e:
+                    # Worker process died (e.g. crashed on a malformed PDF)
+                    yield path, None, str(e)
+                submit_next()
+
+
+def load_documents_from_folder(folder_path: str, workers: int = EXTRACTION_WORKERS) -> List[Dict[str, str]]:
     """
     Load all documents from a folder
     
     Args:
         folder_path: Path to folder containing documents
+        workers: Number of extraction worker processes
         
     Returns:
         List of documents with text and metadata
@@ -141,40 +487,43 @@ def load_documents_from_folder(folder_path: str) -> List[Dict[str, str]]:
     if not folder.exists():
         raise Exception(f"Folder not found: {folder_path}")
     
-    supported_extensions = ['.pdf', '.txt', '.md', '.docx']
+    paths = [
+        str(file_path) for file_path in folder.glob('**/*')
+        if file_path.is_file() and file_path.suffix.lower() in SUPPORTED_EXTENSIONS
+    ]
     
-    for file_path in folder.glob('**/*'):
-        if file_path.is_file() and file_path.suffix.lower() in supported_extensions:
-            try:
-                text = extract_text_from_file(str(file_path))
-                documents.append({
-                    'text': text,
-                    'filename': file_path.name,
-                    'path': str(file_path)
-                })
-            except Exception as e:
-                print(f"Error loading {file_path.name}: {str(e)}")
+    for path, text, error in iter_extracted_files(paths, workers):
+        file_path = Path(path)
+        if error is not None:
+            print(f"Error loading {file_path.name}: {error}")
+            continue
+        documents.append({
+            'text': text,
+            'filename': file_path.name,
+            'path': path
+        })
     
     return documents
 
 
-def chunk_documents(text: str, filename: str) -> List[Dict[str, str]]:
+def chunk_documents(text: str, filename: str, text_splitter=None) -> List[Dict[str, str]]:
     """
     Split document text into chunks with metadata
     
     Args:
         text: Document text to chunk
         filename: Name of the source file
+        text_splitter: Splitter to use (the configured one if None)
         
     Returns:
         List of chunks with metadata
     """
-    text_splitter = RecursiveCharacterTextSplitter(
-        chunk_size=CHUNK_SIZE,
-        chunk_overlap=CHUNK_OVERLAP
-    )
+    if text_splitter is None:
+        text_splitter = get_text_splitter()
     
-    chunks = text_splitter.split_text(text)
+    with span("chunk", file=filename, chars=len(text)) as current:
+        chunks = text_splitter.split_text(text)
+        current.set(items=len(chunks))
     
     # Add metadata to each chunk
     chunked_docs = []
@@ -191,6 +540,33 @@ def chunk_documents(text: str, filename: str) -> List[Dict[str, str]]:
     return chunked_docs
 
 
+def iter_chunk_documents(segments: Iterable[str], filename: str) -> Iterator[Dict[str, str]]:
+    """
+    Lazily split a stream of text segments into chunks with metadata
+    
+    Unlike chunk_documents, the total number of chunks is not known while
+    streaming, so the metadata has no "total_chunks" field.
+    
+    Args:
+        segments: Text segments, e.g. from iter_text_segments
+        filename: Name of the source file
+        
+    Yields:
+        Chunks with metadata
+    """
+    text_splitter = get_text_splitter()
+    chunks = timed_iter("chunk", text_splitter.split_stream(segments), file=filename)
+    
+    for idx, chunk in enumerate(chunks):
+        yield {
+            "text": chunk,
+            "metadata": {
+                "source": filename,
+                "chunk_id": idx
+            }
+        }
+
+
 def format_citations(chunks: List[Dict]) -> str:
     """
     Format retrieved chunks as citations
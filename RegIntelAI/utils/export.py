@@ -7,21 +7,24 @@ from typing import List, Dict
 from io import StringIO
 
 
-def export_to_csv(chat_history: List[Dict]) -> str:
+def export_to_csv(chat_history: List[Dict], extra_columns: Dict[str, str] = None) -> str:
     """
     Export chat history to CSV format
     
     Args:
         chat_history: List of chat messages
+        extra_columns: Additional columns, as {header: message key}, appended
+            after the standard ones (empty when a message lacks the key)
         
     Returns:
         CSV content as string
     """
     output = StringIO()
     writer = csv.writer(output)
+    extra_columns = extra_columns or {}
     
     # Write header
-    writer.writerow(["Timestamp", "Role", "Message", "Sources"])
+    writer.writerow(["Timestamp", "Role", "Message", "Sources"] + list(extra_columns))
     
     # Write chat history
     for message in chat_history:
@@ -30,7 +33,9 @@ def export_to_csv(chat_history: List[Dict]) -> str:
         content = message.get("content", "")
         sources = message.get("sources", "")
         
-        writer.writerow([timestamp, role, content, sources])
+        extra = [message.get(key, "") for key in extra_columns.values()]
+        
+        writer.writerow([timestamp, role, content, sources] + extra)
     
     return output.getvalue()
 
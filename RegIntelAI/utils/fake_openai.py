@@ -0,0 +1,197 @@
+"""
+Offline stand-in for the OpenAI client, for benchmarks and evaluations
+
+Embeddings are deterministic feature-hashed bags of words, so texts sharing
+words get similar vectors (keyword-level retrieval quality, at no API cost).
+Completions are canned answers. Both can simulate API latency.
+"""
+import asyncio
+import hashlib
+import re
+import threading
+import time
+from types import SimpleNamespace
+from typing import List, Dict
+import numpy as np
+
+_WORD_PATTERN = re.compile(r"\w+")
+
+# Cap on memoised word buckets (the cache is cleared when it is reached)
+MAX_CACHED_WORDS = 1_000_000
+
+
+class HashEmbedder:
+    """Feature-hashing text embedder: each word adds +-1 to one hashed dimension"""
+
+    def __init__(self, dimensions: int = 1536):
+        """
+        Create an embedder
+
+        Args:
+            dimensions: Vector size
+        """
+        self.dimensions = dimensions
+        self._buckets: Dict[str, tuple] = {}
+
+    def _bucket(self, word: str) -> tuple:
+        bucket = self._buckets.get(word)
+        if bucket is None:
+            value = int.from_bytes(hashlib.blake2b(word.encode("utf-8"), digest_size=8).digest(), "little")
+            bucket = (value % self.dimensions, 1.0 if value >> 63 else -1.0)
+            if len(self._buckets) >= MAX_CACHED_WORDS:
+                self._buckets.clear()
+            self._buckets[word] = bucket
+        return bucket
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        """
+        Embed texts
+
+        Args:
+            texts: Texts to embed
+
+        Returns:
+            Unit-length float32 vectors, one row per text
+        """
+        rows, columns, signs = [], [], []
+        for row, text in enumerate(texts):
+            words = _WORD_PATTERN.findall(text.lower()) or [text]
+            for word in words:
+                column, sign = self._bucket(word)
+                rows.append(row)
+                columns.append(column)
+                signs.append(sign)
+
+        matrix = np.zeros((len(texts), self.dimensions), dtype=np.float32)
+        np.add.at(matrix, (np.asarray(rows, dtype=np.int64), np.asarray(columns, dtype=np.int64)),
+                  np.asarray(signs, dtype=np.float32))
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        # Words whose hashes cancel out leave a zero vector: use a fixed unit vector then
+        matrix[norms[:, 0] == 0, 0] = 1.0
+        norms[norms == 0] = 1.0
+        return matrix / norms
+
+
+class _FakeBackend:
+    """Responses shared by the sync and async stand-ins"""
+
+    def __init__(self, dimensions: int, embedding_latency: float, completion_latency: float, answer_words: int):
+        self.embedder = HashEmbedder(dimensions)
+        self.embedding_latency = embedding_latency
+        self.completion_latency = completion_latency
+        self.answer_words = answer_words
+        self.calls = {"embeddings": 0, "completions": 0}
+        self._lock = threading.Lock()
+
+    def _count(self, kind: str):
+        with self._lock:
+            self.calls[kind] += 1
+
+    def embedding_response(self, params: Dict):
+        self._count("embeddings")
+        inputs = params["input"]
+        if isinstance(inputs, str):
+            inputs = [inputs]
+        embedder = self.embedder
+        if params.get("dimensions") and params["dimensions"] != embedder.dimensions:
+            embedder = HashEmbedder(params["dimensions"])
+        vectors = embedder.embed(inputs)
+        n_tokens = sum(len(text) // 4 + 1 for text in inputs)
+        return SimpleNamespace(
+            data=[SimpleNamespace(embedding=vector.tolist(), index=idx) for idx, vector in enumerate(vectors)],
+            usage=SimpleNamespace(prompt_tokens=n_tokens, total_tokens=n_tokens)
+        )
+
+    def answer_text(self, params: Dict) -> str:
+        prompt_tail = params["messages"][-1]["content"][-60:]
+        filler = " ".join(["evidence"] * max(0, self.answer_words - 12))
+        return f"Canned answer (offline client) for: ...{prompt_tail} {filler}".strip()
+
+    def usage(self, params: Dict, answer: str) -> SimpleNamespace:
+        prompt_tokens = sum(len(message.get("content") or "") // 4 + 1 for message in params["messages"])
+        completion_tokens = len(answer.split())
+        return SimpleNamespace(
+            prompt_tokens=prompt_tokens,
+            completion_tokens=completion_tokens,
+            total_tokens=prompt_tokens + completion_tokens
+        )
+
+    def completion_response(self, params: Dict):
+        self._count("completions")
+        answer = self.answer_text(params)
+        return SimpleNamespace(
+            choices=[SimpleNamespace(message=SimpleNamespace(content=answer))],
+            usage=self.usage(params, answer)
+        )
+
+    def completion_events(self, params: Dict) -> List:
+        self._count("completions")
+        answer = self.answer_text(params)
+        events = [
+            SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=word + " "))], usage=None)
+            for word in answer.split()
+        ]
+        if (params.get("stream_options") or {}).get("include_usage"):
+            events.append(SimpleNamespace(choices=[], usage=self.usage(params, answer)))
+        return events
+
+
+class FakeOpenAI:
+    """
+    Offline, deterministic stand-in for OpenAI, with the same
+    `embeddings.create` and `chat.completions.create` calls
+    """
+
+    def __init__(
+        self,
+        dimensions: int = 1536,
+        embedding_latency: float = 0.0,
+        completion_latency: float = 0.0,
+        answer_words: int = 150
+    ):
+        """
+        Create a stand-in client
+
+        Args:
+            dimensions: Embedding size (unless a request asks for another)
+            embedding_latency: Seconds each embeddings request takes
+            completion_latency: Seconds each chat completion takes (before the first token)
+            answer_words: Length of the canned answers
+        """
+        self._backend = _FakeBackend(dimensions, embedding_latency, completion_latency, answer_words)
+        self.embeddings = SimpleNamespace(create=self._create_embeddings)
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create_completion))
+
+    @property
+    def calls(self) -> Dict[str, int]:
+        """Number of requests made, by endpoint"""
+        return dict(self._backend.calls)
+
+    def _create_embeddings(self, **params):
+        time.sleep(self._backend.embedding_latency)
+        return self._backend.embedding_response(params)
+
+    def _create_completion(self, **params):
+        time.sleep(self._backend.completion_latency)
+        if params.get("stream"):
+            return iter(self._backend.completion_events(params))
+        return self._backend.completion_response(params)
+
+
+class AsyncFakeOpenAI(FakeOpenAI):
+    """Async counterpart of FakeOpenAI"""
+
+    async def _create_embeddings(self, **params):
+        await asyncio.sleep(self._backend.embedding_latency)
+        return self._backend.embedding_response(params)
+
+    async def _create_completion(self, **params):
+        await asyncio.sleep(self._backend.completion_latency)
+        if params.get("stream"):
+            events = self._backend.completion_events(params)
+
+            async def stream():
+                for event in events:
+                    yield event
+            return stream()
+        return self._backend.completion_response(params)
@@ -0,0 +1,190 @@
+"""
+Incremental folder synchronisation for RegIntel AI
+"""
+import hashlib
+import json
+import os
+from pathlib import Path
+from typing import List, Dict, Callable, Iterable, Tuple
+from config import SYNC_MANIFEST_PATH
+from utils.document_processor import SUPPORTED_EXTENSIONS
+
+
+class SyncManifest:
+    """JSON manifest of indexed files (content hash, mtime and size per path)"""
+
+    def __init__(self, path: str = SYNC_MANIFEST_PATH):
+        """
+        Load the manifest from disk if it exists
+
+        Args:
+            path: Manifest file path
+        """
+        self.path = path
+        self.files: Dict[str, Dict] = {}
+        if os.path.exists(path):
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    self.files = json.load(f).get("files", {})
+            except (OSError, ValueError) as e:
+                print(f"Ignoring unreadable sync manifest {path}: {e}")
+
+    def save(self):
+        """Write the manifest atomically"""
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({"files": self.files}, f, indent=1)
+        os.replace(tmp_path, self.path)
+
+    def sources(self) -> List[str]:
+        """Get the document names of every indexed file"""
+        return sorted({entry["source"] for entry in self.files.values()})
+
+    def forget_source(self, source: str):
+        """Drop every file indexed under a document name so the next sync re-indexes it"""
+        self.files = {
+            path: entry for path, entry in self.files.items() if entry["source"] != source
+        }
+        self.save()
+
+    def clear(self):
+        """Forget every indexed file"""
+        self.files = {}
+        self.save()
+
+
+def file_content_hash(path: str) -> str:
+    """
+    Hash file content without loading the whole file in memory
+
+    Args:
+        path: File path
+
+    Returns:
+        SHA-256 hex digest
+    """
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def scan_folder(folder_path: str, rag_engine, manifest: SyncManifest, report: Dict[str, List[str]]) -> Dict:
+    """
+    Find the files of a folder that need indexing, and drop removed files
+
+    Files whose size and mtime match the manifest are skipped without being
+    read. Files with a new mtime are hashed, and only returned if their
+    content changed. Chunks of files that disappeared from the folder are
+    deleted. A file's document name (source) is its path relative to the
+    folder, so files with the same name in different subfolders are
+    separate documents.
+
+    Args:
+        folder_path: Path to folder containing documents
+        rag_engine: RAGEngine to update
+        manifest: Manifest of previously indexed files
+        report: Sync report, updated with unchanged, removed and unreadable files
+
+    Returns:
+        Dictionary of changed file paths to (source, content hash, stat)
+    """
+    folder = Path(folder_path)
+    if not folder.exists():
+        raise Exception(f"Folder not found: {folder_path}")
+
+    folder_prefix = str(folder.resolve()) + os.sep
+
+    current_files = {
+        str(file_path.resolve()): file_path
+        for file_path in folder.glob('**/*')
+        if file_path.is_file() and file_path.suffix.lower() in SUPPORTED_EXTENSIONS
+    }
+
+    # Remove files that are no longer in the folder
+    for path in list(manifest.files):
+        if path.startswith(folder_prefix) and path not in current_files:
+            entry = manifest.files.pop(path)
+            rag_engine.delete_document(entry["source"])
+            report["removed"].append(entry["source"])
+    if report["removed"]:
+        manifest.save()
+
+    # Find new and changed files
+    changed = {}
+    for path, file_path in sorted(current_files.items()):
+        source = file_path.relative_to(folder).as_posix()
+        stat = file_path.stat()
+        entry = manifest.files.get(path)
+
+        if entry and entry["mtime"] == stat.st_mtime and entry["size"] == stat.st_size:
+            report["unchanged"].append(entry["source"])
+            continue
+
+        try:
+            content_hash = file_content_hash(path)
+        except OSError as e:
+            print(f"Error reading {source}: {str(e)}")
+            report["errors"].append(source)
+            continue
+
+        if entry and entry["hash"] == content_hash:
+            # Touched but not modified
+            entry["mtime"] = stat.st_mtime
+            entry["size"] = stat.st_size
+            report["unchanged"].append(entry["source"])
+            continue
+
+        changed[path] = (source, content_hash, stat)
+    manifest.save()
+
+    return changed
+
+
+def index_changed_file(
+    path: str,
+    chunks: Iterable[Dict],
+    change: Tuple,
+    rag_engine,
+    manifest: SyncManifest,
+    progress: Callable[[int], None] = None
+) -> bool:
+    """
+    Index a file found by scan_folder, replacing its previous version
+
+    The previous version is only removed once the new one is indexed (see
+    RAGEngine.replace_document); if indexing fails, the manifest keeps the
+    previous entry so the next sync tries again.
+
+    Args:
+        path: Resolved file path
+        chunks: Chunks of the file, e.g. from iter_chunk_documents
+        change: (source, content hash, stat) from scan_folder
+        rag_engine: RAGEngine to update
+        manifest: Manifest to record the file in
+        progress: Passed to add_documents
+
+    Returns:
+        True if the file was indexed before (updated), False if it is new
+    """
+    source, content_hash, stat = change
+    entry = manifest.files.get(path)
+    n_chunks = rag_engine.replace_document(source, chunks, progress=progress)
+    if entry and entry["source"] != source:
+        # Indexed under another name before (older manifests used the file name)
+        rag_engine.delete_document(entry["source"])
+
+    manifest.files[path] = {
+        "source": source,
+        "hash": content_hash,
+        "mtime": stat.st_mtime,
+        "size": stat.st_size,
+        "chunks": n_chunks
+    }
+    # Save after each file so an interrupted sync keeps its progress
+    manifest.save()
+    return entry is not None
+
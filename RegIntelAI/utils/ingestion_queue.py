@@ -0,0 +1,357 @@
+"""
+Background document ingestion queue for RegIntel AI
+"""
+import hashlib
+import io
+import itertools
+import threading
+import time
+from collections import deque
+from typing import List, Dict, Iterable, Iterator, Optional
+from config import SYNC_MANIFEST_PATH, EXTRACTION_WORKERS
+from utils.document_processor import iter_extracted_files, iter_text_segments, iter_chunk_documents
+from utils.folder_sync import SyncManifest, scan_folder, index_changed_file
+
+# Job states
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+CANCELLED = "cancelled"
+
+ACTIVE_STATES = (QUEUED, RUNNING)
+
+
+class IngestionCancelled(Exception):
+    """Raised inside a running job when it is cancelled"""
+
+
+class IngestionJob:
+    """
+    One unit of ingestion work and its progress
+
+    Kinds:
+    - "upload": bytes of an uploaded file, replacing any previous version
+    - "file": a folder file found changed by scan_folder, recorded in the sync manifest
+      and in the report of its folder job
+    - "folder": a folder scan, which queues one "file" job per changed file
+      (and, with several extraction workers, extracts and indexes them itself)
+    """
+
+    def __init__(self, job_id: str, kind: str, source: str, content_hash: str = None, **payload):
+        self.job_id = job_id
+        self.kind = kind
+        self.source = source
+        self.content_hash = content_hash
+        self.payload = payload
+        self.status = QUEUED
+        self.attempts = 0
+        self.error = None
+        self.created = time.time()
+        self.finished = None
+        self.children: List[str] = []
+        self.cancel_event = threading.Event()
+        self._reset_progress()
+
+    def _reset_progress(self):
+        self.pages = 0  # Text segments read (PDF pages, DOCX paragraphs, TXT blocks)
+        self.chunks = 0
+        self.embedded = 0
+        self.report = None
+
+    def snapshot(self) -> Dict:
+        """Copy of the job's state, safe to read from another thread"""
+        return {
+            "job_id": self.job_id,
+            "kind": self.kind,
+            "source": self.source,
+            "status": self.status,
+            "pages": self.pages,
+            "chunks": self.chunks,
+            "embedded": self.embedded,
+            "attempts": self.attempts,
+            "error": self.error,
+            "children": list(self.children),
+            "report": {key: list(sources) for key, sources in self.report.items()} if self.report else None
+        }
+
+
+class IngestionQueue:
+    """
+    FIFO of ingestion jobs run by one background worker thread
+
+    Jobs outlive the Streamlit script run that submitted them, so reruns
+    and navigation no longer interrupt indexing. Submitting work that is
+    already queued or running (same document, same content) returns the
+    existing job instead of queuing it twice.
+    """
+
+    def __init__(self, rag_engine, manifest_path: str = SYNC_MANIFEST_PATH):
+        """
+        Create an idle queue
+
+        Args:
+            rag_engine: RAGEngine the documents are indexed into
+            manifest_path: Sync manifest updated by folder jobs
+        """
+        self.rag_engine = rag_engine
+        self.manifest_path = manifest_path
+        self._jobs: Dict[str, IngestionJob] = {}
+        self._pending = deque()
+        self._ids = itertools.count(1)
+        self._cond = threading.Condition()
+        self._worker = None
+
+    def submit_upload(self, filename: str, data: bytes) -> str:
+        """
+        Queue an uploaded file
+
+        Args:
+            filename: Document name (the "source" of its chunks)
+            data: File content
+
+        Returns:
+            Job ID
+        """
+        content_hash = hashlib.sha256(data).hexdigest()
+        return self._submit("upload", filename, content_hash, data=data)
+
+    def submit_folder(self, folder_path: str) -> str:
+        """
+        Queue a folder sync (only new and changed files are indexed)
+
+        Args:
+            folder_path: Folder containing documents
+
+        Returns:
+            Job ID
+        """
+        return self._submit("folder", folder_path, None, folder=folder_path)
+
+    def _submit(self, kind: str, source: str, content_hash: Optional[str], **payload) -> str:
+        # Folder files are identified by path: files in different folders may share a name
+        key = payload.get("path", source)
+        with self._cond:
+            for job in self._jobs.values():
+                if job.kind != kind or job.payload.get("path", job.source) != key or job.status not in ACTIVE_STATES:
+                    continue
+                if job.content_hash == content_hash:
+                    return job.job_id
+                if job.status == QUEUED:
+                    # Newer content for a document that has not started yet
+                    job.content_hash = content_hash
+                    job.payload = payload
+                    return job.job_id
+
+            job = IngestionJob(f"job-{next(self._ids)}", kind, source, content_hash, **payload)
+            self._jobs[job.job_id] = job
+            self._pending.append(job)
+            self._ensure_worker()
+            self._cond.notify()
+            return job.job_id
+
+    def cancel(self, job_id: str) -> bool:
+        """
+        Cancel a queued or running job (a running job stops at its next page
+        or batch), along with the jobs it spawned
+
+        Returns:
+            True if the job was active
+        """
+        with self._cond:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return False
+            for child_id in job.children:
+                self.cancel(child_id)
+            if job.status not in ACTIVE_STATES:
+                return False
+            job.cancel_event.set()
+            if job.status == QUEUED:
+                self._pending.remove(job)
+                job.status = CANCELLED
+                job.finished = time.time()
+            return True
+
+    def retry(self, job_id: str) -> bool:
+        """
+        Queue a failed or cancelled job again
+
+        Returns:
+            True if the job was queued
+        """
+        with self._cond:
+            job = self._jobs.get(job_id)
+            if job is None or job.status not in (FAILED, CANCELLED):
+                return False
+            job.status = QUEUED
+            job.error = None
+            job.finished = None
+            job.cancel_event.clear()
+            job._reset_progress()
+            self._pending.append(job)
+            self._ensure_worker()
+            self._cond.notify()
+            return True
+
+    def retry_failed(self) -> List[str]:
+        """Queue every failed job again, returning their IDs"""
+        with self._cond:
+            failed = [job.job_id for job in self._jobs.values() if job.status == FAILED]
+        return [job_id for job_id in failed if self.retry(job_id)]
+
+    def jobs(self, job_ids: Iterable[str] = None) -> List[Dict]:
+        """
+        Get job snapshots, in submission order
+
+        Args:
+            job_ids: Jobs to include, with the jobs they spawned (all jobs if None)
+
+        Returns:
+            List of job snapshots
+        """
+        with self._cond:
+            if job_ids is None:
+                selected = list(self._jobs)
+            else:
+                selected = []
+                stack = list(job_ids)
+                while stack:
+                    job_id = stack.pop()
+                    if job_id in self._jobs and job_id not in selected:
+                        selected.append(job_id)
+                        stack.extend(self._jobs[job_id].children)
+            order = {job_id: idx for idx, job_id in enumerate(self._jobs)}
+            return [self._jobs[job_id].snapshot() for job_id in sorted(selected, key=order.get)]
+
+    def clear_finished(self):
+        """Forget jobs that are no longer queued or running"""
+        with self._cond:
+            self._jobs = {
+                job_id: job for job_id, job in self._jobs.items() if job.status in ACTIVE_STATES
+            }
+
+    def _ensure_worker(self):
+        """Start the worker thread if needed (caller holds the lock)"""
+        if self._worker is None or not self._worker.is_alive():
+            self._worker = threading.Thread(target=self._run, name="ingestion-worker", daemon=True)
+            self._worker.start()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._pending:
+                    self._cond.wait()
+                job = self._pending.popleft()
+                job.status = RUNNING
+                job.attempts += 1
+            self._execute(job)
+
+    def _claim(self, job_id: str) -> Optional[IngestionJob]:
+        """Take a queued job off the queue to run it now (None if it is not queued)"""
+        with self._cond:
+            job = self._jobs.get(job_id)
+            if job is None or job.status != QUEUED:
+                return None
+            self._pending.remove(job)
+            job.status = RUNNING
+            job.attempts += 1
+            return job
+
+    def _execute(self, job: IngestionJob, segments: Iterable[str] = None):
+        """
+        Run a job and record its outcome
+
+        Args:
+            job: Running job
+            segments: Text already extracted from the job's file, if any
+        """
+        try:
+            with self.rag_engine.ingest_lock:
+                if job.kind == "folder":
+                    self._run_folder(job)
+                else:
+                    self._run_file(job, segments)
+            status, error = DONE, None
+        except IngestionCancelled:
+            status, error = CANCELLED, None
+        except Exception as e:
+            print(f"Error ingesting {job.source}: {str(e)}")
+            status, error = FAILED, str(e)
+
+        with self._cond:
+            job.status = status
+            job.error = error
+            job.finished = time.time()
+            if status == DONE:
+                # Uploaded bytes are only kept for retries
+                job.payload.pop("data", None)
+
+    def _count_segments(self, job: IngestionJob, segments: Iterable[str]) -> Iterator[str]:
+        for segment in segments:
+            if job.cancel_event.is_set():
+                raise IngestionCancelled()
+            job.pages += 1
+            yield segment
+
+    def _count_chunks(self, job: IngestionJob, chunks: Iterable[Dict]) -> Iterator[Dict]:
+        for chunk in chunks:
+            job.chunks += 1
+            yield chunk
+
+    def _progress(self, job: IngestionJob):
+        def report(embedded: int):
+            job.embedded = embedded
+            if job.cancel_event.is_set():
+                raise IngestionCancelled()
+        return report
+
+    def _job_chunks(self, job: IngestionJob, segments: Iterable[str]) -> Iterator[Dict]:
+        return self._count_chunks(job, iter_chunk_documents(self._count_segments(job, segments), job.source))
+
+    def _run_file(self, job: IngestionJob, segments: Iterable[str] = None):
+        if job.kind == "upload":
+            segments = iter_text_segments(io.BytesIO(job.payload["data"]), job.source)
+            # The previous version stays searchable until the new one is indexed
+            self.rag_engine.replace_document(
+                job.source, self._job_chunks(job, segments), progress=self._progress(job)
+            )
+        else:
+            path = job.payload["path"]
+            if segments is None:
+                segments = iter_text_segments(path)
+            chunks = self._job_chunks(job, segments)
+            updated = index_changed_file(
+                path, chunks, job.payload["change"], self.rag_engine,
+                SyncManifest(self.manifest_path), progress=self._progress(job)
+            )
+            with self._cond:
+                # Report of the folder sync that queued the file
+                job.payload["report"]["updated" if updated else "added"].append(job.source)
+
+    def _run_folder(self, job: IngestionJob):
+        manifest = SyncManifest(self.manifest_path)
+        report = {"added": [], "updated": [], "unchanged": [], "removed": [], "errors": []}
+        changed = scan_folder(job.payload["folder"], self.rag_engine, manifest, report)
+        job.report = report
+
+        child_ids = {}
+        for path, change in changed.items():
+            source, content_hash, _ = change
+            child_id = self._submit("file", source, content_hash, path=path, change=change, report=report)
+            child_ids[path] = child_id
+            with self._cond:
+                if child_id not in job.children:
+                    job.children.append(child_id)
+
+        if EXTRACTION_WORKERS <= 1 or len(child_ids) <= 1:
+            # The worker streams each file page by page when it reaches its job
+            return
+        # Extract the files in parallel worker processes, indexing each one as
+        # it finishes (files that fail here are retried by their own job)
+        for path, text, error in iter_extracted_files(list(child_ids), EXTRACTION_WORKERS):
+            if job.cancel_event.is_set():
+                raise IngestionCancelled()
+            child = self._claim(child_ids[path]) if error is None else None
+            if child is not None:
+                self._execute(child, [text])
@@ -0,0 +1,60 @@
+"""
+Maximal marginal relevance (MMR) diversification for RegIntel AI
+"""
+from typing import List
+import numpy as np
+
+
+def _normalise_rows(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    return matrix / np.where(norms == 0, 1, norms)
+
+
+def mmr_select(
+    query_embedding: List[float],
+    candidate_embeddings: List[List[float]],
+    k: int,
+    lambda_mult: float = 0.5
+) -> List[int]:
+    """
+    Pick k diverse candidates by maximal marginal relevance
+
+    Each step picks the candidate maximising
+    lambda * sim(query, c) - (1 - lambda) * max sim(c, already picked).
+    The similarities are computed once as matrices; each step only updates
+    the running "max similarity to the picked set" vector.
+
+    Args:
+        query_embedding: Query vector
+        candidate_embeddings: Candidate vectors, in relevance order
+        k: Number of candidates to pick
+        lambda_mult: 1 ranks by relevance only, 0 by diversity only
+
+    Returns:
+        Indices of the picked candidates, in pick order
+    """
+    candidates = np.asarray(candidate_embeddings, dtype=np.float32)
+    n_candidates = len(candidates)
+    k = min(k, n_candidates)
+    if k <= 0:
+        return []
+
+    candidates = _normalise_rows(candidates)
+    query = _normalise_rows(np.asarray(query_embedding, dtype=np.float32))
+    relevance = candidates @ query
+    similarity = candidates @ candidates.T
+
+    selected = []
+    max_similarity = np.full(n_candidates, -np.inf, dtype=np.float32)
+    available = np.ones(n_candidates, dtype=bool)
+    for _ in range(k):
+        if selected:
+            scores = lambda_mult * relevance - (1 - lambda_mult) * max_similarity
+        else:
+            scores = relevance.copy()
+        scores[~available] = -np.inf
+        best = int(np.argmax(scores))
+        selected.append(best)
+        available[best] = False
+        max_similarity = np.maximum(max_similarity, similarity[best])
+    return selected
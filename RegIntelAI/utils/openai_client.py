@@ -0,0 +1,360 @@
+"""
+Rate-limited OpenAI client for RegIntel AI
+
+Every embeddings and chat completions request goes through a process-wide
+rate limiter (requests per minute and tokens per minute) and is retried with
+exponential backoff when the API is rate limited or temporarily unavailable.
+"""
+import asyncio
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from types import SimpleNamespace
+from typing import Dict, Callable, Optional
+import openai
+from config import (
+    CHAT_REQUESTS_PER_MINUTE,
+    CHAT_TOKENS_PER_MINUTE,
+    EMBEDDING_REQUESTS_PER_MINUTE,
+    EMBEDDING_TOKENS_PER_MINUTE,
+    OPENAI_MAX_RETRIES,
+    OPENAI_BACKOFF_BASE,
+    OPENAI_BACKOFF_MAX,
+    OPENAI_BACKOFF_JITTER
+)
+from utils.tokenizer import count_tokens, count_tokens_batch
+
+# Tokens counted per chat message on top of its content (role and separators)
+MESSAGE_OVERHEAD_TOKENS = 4
+
+
+class TokenBucket:
+    """
+    Token bucket refilled continuously at `per_minute` units per minute
+
+    Callers reserve units up front and then wait the returned delay. The level
+    may go negative: later callers then wait for the earlier reservations to
+    be refilled too, so waiting callers are served in reservation order.
+    """
+
+    def __init__(self, per_minute: float):
+        """
+        Create a full bucket
+
+        Args:
+            per_minute: Capacity, refilled over one minute
+        """
+        self.capacity = float(per_minute)
+        self.rate = self.capacity / 60.0
+        self.level = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self, amount: float) -> float:
+        """
+        Take units from the bucket
+
+        Args:
+            amount: Units needed (capped at the capacity, so any request can pass)
+
+        Returns:
+            Seconds to wait before using them
+        """
+        with self._lock:
+            self._refill()
+            self.level -= min(amount, self.capacity)
+            return max(0.0, -self.level / self.rate)
+
+    def refund(self, amount: float):
+        """Give back units that were reserved but not used (negative to charge more)"""
+        with self._lock:
+            self._refill()
+            self.level = min(self.capacity, self.level + amount)
+
+
+class RateLimiter:
+    """Requests-per-minute and tokens-per-minute limits of one API quota"""
+
+    def __init__(self, requests_per_minute: float, tokens_per_minute: float):
+        """
+        Create a rate limiter
+
+        Args:
+            requests_per_minute: Request quota (0 = unlimited)
+            tokens_per_minute: Token quota (0 = unlimited)
+        """
+        self.requests = TokenBucket(requests_per_minute) if requests_per_minute else None
+        self.tokens = TokenBucket(tokens_per_minute) if tokens_per_minute else None
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+        self.stats = {"requests": 0, "retries": 0, "rate_limited": 0, "wait_s": 0.0}
+
+    def reserve(self, tokens: int) -> float:
+        """
+        Reserve one request and its tokens
+
+        Args:
+            tokens: Estimated tokens of the request
+
+        Returns:
+            Seconds to wait before sending it
+        """
+        wait = 0.0
+        if self.requests is not None:
+            wait = max(wait, self.requests.reserve(1))
+        if self.tokens is not None:
+            wait = max(wait, self.tokens.reserve(tokens))
+        with self._lock:
+            wait = max(wait, self._paused_until - time.monotonic())
+            self.stats["requests"] += 1
+            self.stats["wait_s"] += wait
+        return wait
+
+    def settle(self, reserved: int, used: Optional[int]):
+        """Correct a reservation with the tokens the API reports as used"""
+        if self.tokens is not None and used is not None:
+            self.tokens.refund(reserved - used)
+
+    def record_retry(self, pause: float = 0.0):
+        """
+        Count a retried request
+
+        Args:
+            pause: Seconds to hold every request of this quota (after a 429)
+        """
+        with self._lock:
+            self.stats["retries"] += 1
+            if pause:
+                self._paused_until = max(self._paused_until, time.monotonic() + pause)
+                self.stats["rate_limited"] += 1
+
+
+_limiters: Dict[str, RateLimiter] = {}
+_limiters_lock = threading.Lock()
+
+
+def get_rate_limiter(name: str) -> RateLimiter:
+    """
+    Get the process-wide rate limiter of an endpoint
+
+    Args:
+        name: "chat" or "embeddings"
+
+    Returns:
+        RateLimiter shared by every client of the process
+    """
+    with _limiters_lock:
+        if name not in _limiters:
+            if name == "chat":
+                _limiters[name] = RateLimiter(CHAT_REQUESTS_PER_MINUTE, CHAT_TOKENS_PER_MINUTE)
+            elif name == "embeddings":
+                _limiters[name] = RateLimiter(EMBEDDING_REQUESTS_PER_MINUTE, EMBEDDING_TOKENS_PER_MINUTE)
+            else:
+                raise ValueError(f"Unknown rate limiter: {name}")
+        return _limiters[name]
+
+
+def estimate_embedding_tokens(params: Dict) -> int:
+    """Tokens an embeddings request counts against the quota"""
+    inputs = params.get("input", [])
+    if isinstance(inputs, str):
+        inputs = [inputs]
+    return sum(count_tokens_batch(list(inputs)))
+
+
+def estimate_chat_tokens(params: Dict) -> int:
+    """
+    Tokens a chat completion counts against the quota: the prompt, plus
+    max_tokens for the completion (as the API does when admitting a request)
+    """
+    prompt_tokens = sum(
+        count_tokens(message.get("content") or "") + MESSAGE_OVERHEAD_TOKENS
+        for message in params.get("messages", [])
+    )
+    return prompt_tokens + (params.get("max_tokens") or 0)
+
+
+def _used_tokens(response) -> Optional[int]:
+    """Tokens the API reports for a response (None for streams)"""
+    usage = getattr(response, "usage", None)
+    return getattr(usage, "total_tokens", None)
+
+
+def _with_stream_usage(params: Dict) -> Dict:
+    """Ask streamed completions to report their usage (in a last, choice-less event)"""
+    if not params.get("stream"):
+        return params
+    return {**params, "stream_options": {**(params.get("stream_options") or {}), "include_usage": True}}
+
+
+def _retry_after(error: Exception) -> Optional[float]:
+    """Seconds the API asked to wait (Retry-After headers), if any"""
+    response = getattr(error, "response", None)
+    if response is None:
+        return None
+    headers = response.headers
+    try:
+        if headers.get("retry-after-ms"):
+            return float(headers["retry-after-ms"]) / 1000
+        if headers.get("retry-after"):
+            value = headers["retry-after"]
+            try:
+                return float(value)
+            except ValueError:
+                return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        pass
+    return None
+
+
+def _is_retryable(error: Exception) -> bool:
+    if isinstance(error, openai.RateLimitError):
+        # An exhausted billing quota does not recover by waiting
+        return getattr(error, "code", None) != "insufficient_quota"
+    if isinstance(error, openai.APIConnectionError):
+        # Includes timeouts
+        return True
+    if isinstance(error, openai.APIStatusError):
+        return error.status_code in (408, 409) or error.status_code >= 500
+    return False
+
+
+def retry_delay(error: Exception, attempt: int) -> float:
+    """
+    Backoff before retrying a failed request
+
+    Exponential (OPENAI_BACKOFF_BASE * 2^attempt, capped at OPENAI_BACKOFF_MAX),
+    never shorter than the API's Retry-After, plus random jitter so that
+    clients throttled together do not retry together.
+
+    Args:
+        error: Error raised by the request
+        attempt: Number of retries already made
+
+    Returns:
+        Seconds to wait
+    """
+    delay = min(OPENAI_BACKOFF_MAX, OPENAI_BACKOFF_BASE * 2 ** attempt)
+    retry_after = _retry_after(error)
+    if retry_after is not None:
+        delay = max(delay, retry_after) if attempt else retry_after
+    return delay * (1 + random.uniform(0, OPENAI_BACKOFF_JITTER))
+
+
+def _handle_failure(error: Exception, attempt: int, limiter: RateLimiter) -> float:
+    """
+    Decide how to recover from a failed request
+
+    Returns:
+        Seconds to wait before retrying (the error is raised again if it
+        cannot be retried)
+    """
+    if attempt >= OPENAI_MAX_RETRIES or not _is_retryable(error):
+        raise error
+    delay = retry_delay(error, attempt)
+    # The quota is shared: after a 429, hold the other threads and coroutines too
+    limiter.record_retry(pause=delay if isinstance(error, openai.RateLimitError) else 0.0)
+    return delay
+
+
+class _RateLimitedCreate:
+    """create() of one endpoint, paced and retried"""
+
+    def __init__(self, create: Callable, limiter: RateLimiter, estimate: Callable[[Dict], int]):
+        self._create = create
+        self._limiter = limiter
+        self._estimate = estimate
+
+    def create(self, **params):
+        params = _with_stream_usage(params)
+        tokens = self._estimate(params)
+        attempt = 0
+        while True:
+            time.sleep(self._limiter.reserve(tokens))
+            try:
+                response = self._create(**params)
+            except Exception as e:
+                # A failed request is not counted by the API: give its tokens back
+                self._limiter.settle(tokens, 0)
+                time.sleep(_handle_failure(e, attempt, self._limiter))
+                attempt += 1
+                continue
+            if params.get("stream"):
+                return self._settled_stream(response, tokens)
+            self._limiter.settle(tokens, _used_tokens(response))
+            return response
+
+    def _settled_stream(self, stream, tokens: int):
+        """Pass a stream through, settling the reservation with the usage of its last event"""
+        used = None
+        try:
+            for event in stream:
+                used = _used_tokens(event) or used
+                yield event
+        finally:
+            self._limiter.settle(tokens, used)
+
+
+class _AsyncRateLimitedCreate(_RateLimitedCreate):
+    """Async create() of one endpoint, paced and retried"""
+
+    async def create(self, **params):
+        params = _with_stream_usage(params)
+        tokens = self._estimate(params)
+        attempt = 0
+        while True:
+            await asyncio.sleep(self._limiter.reserve(tokens))
+            try:
+                response = await self._create(**params)
+            except Exception as e:
+                # A failed request is not counted by the API: give its tokens back
+                self._limiter.settle(tokens, 0)
+                await asyncio.sleep(_handle_failure(e, attempt, self._limiter))
+                attempt += 1
+                continue
+            if params.get("stream"):
+                return self._settled_stream(response, tokens)
+            self._limiter.settle(tokens, _used_tokens(response))
+            return response
+
+    async def _settled_stream(self, stream, tokens: int):
+        """Pass a stream through, settling the reservation with the usage of its last event"""
+        used = None
+        try:
+            async for event in stream:
+                used = _used_tokens(event) or used
+                yield event
+        finally:
+            self._limiter.settle(tokens, used)
+
+
+class RateLimitedOpenAI:
+    """
+    Wraps an OpenAI or AsyncOpenAI client, exposing the same
+    `embeddings.create` and `chat.completions.create` calls
+
+    The wrapped client should be created with max_retries=0, since retries
+    are handled here with the shared limiter.
+    """
+
+    def __init__(self, client):
+        """
+        Wrap a client
+
+        Args:
+            client: OpenAI or AsyncOpenAI client
+        """
+        self.raw_client = client
+        create_class = _AsyncRateLimitedCreate if isinstance(client, openai.AsyncOpenAI) else _RateLimitedCreate
+        self.embeddings = create_class(
+            client.embeddings.create, get_rate_limiter("embeddings"), estimate_embedding_tokens
+        )
+        self.chat = SimpleNamespace(completions=create_class(
+            client.chat.completions.create, get_rate_limiter("chat"), estimate_chat_tokens
+        ))
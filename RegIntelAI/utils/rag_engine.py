@@ -1,41 +1,195 @@
 """
 RAG (Retrieval-Augmented Generation) engine for RegIntel AI
 """
-from typing import List, Dict
-import chromadb
-from chromadb.config import Settings
-from openai import OpenAI
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+from typing import List, Dict, Callable, Iterable, Iterator, Optional, Tuple
+import httpx
+from openai import OpenAI, AsyncOpenAI
 from config import (
     OPENAI_API_KEY,
     MODEL_NAME,
     EMBEDDING_MODEL,
-    CHROMA_DB_DIR,
-    COLLECTION_NAME,
-    TOP_K_RESULTS
+    EMBEDDING_DIMENSIONS,
+    TOP_K_RESULTS,
+    EMBEDDING_BATCH_SIZE,
+    EMBEDDING_BATCH_TOKENS,
+    EMBEDDING_MAX_INPUT_TOKENS,
+    EMBEDDING_MAX_WORKERS,
+    INDEX_BATCH_SIZE,
+    EMBEDDING_CACHE_ENABLED,
+    OPENAI_MAX_CONNECTIONS,
+    ANSWER_CACHE_ENABLED,
+    QUERY_EMBEDDING_CACHE_SIZE,
+    RETRIEVAL_CACHE_SIZE,
+    HYBRID_SEARCH,
+    HYBRID_CANDIDATES,
+    RRF_K,
+    MMR_ENABLED,
+    MMR_LAMBDA,
+    MMR_CANDIDATES
 )
+from utils.answer_cache import SemanticAnswerCache
+from utils.bm25 import BM25Index, reciprocal_rank_fusion
+from utils.context_builder import build_context
+from utils.embedding_cache import EmbeddingCache
+from utils.lru_cache import LRUCache
+from utils.mmr import mmr_select
+from utils.openai_client import RateLimitedOpenAI
+from utils.startup import startup_step
+from utils.telemetry import Span, span
+from utils.vector_store import VectorStore, create_vector_store
+from utils.tokenizer import count_tokens_batch, truncate_tokens
+
+# System prompt for compliance analysis
+SYSTEM_PROMPT = """You are RegIntel AI, an expert regulatory compliance assistant for HexaBank.
+
+Your role is to:
+- Analyze regulatory documents (EU AI Act, EBA guidelines, ECB regulations, GDPR, etc.)
+- Perform gap analyses between regulations and internal policies
+- Extract key compliance requirements
+- Provide traceable, evidence-based answers with citations
+
+Always:
+- Ground your answers in the provided context
+- Reference specific sources and sections
+- Be precise and actionable
+- Highlight compliance gaps or risks
+- Use a professional, clear tone
+- Respond in the same language as the query (French or English)"""
+
+
+def iter_completion_text(stream) -> Iterator[str]:
+    """Yield the text deltas of a streamed chat completion"""
+    for event in stream:
+        if event.choices and event.choices[0].delta.content:
+            yield event.choices[0].delta.content
+
+
+def embedding_request_params() -> Dict:
+    """Model (and shortened dimensions, if configured) for embeddings requests"""
+    params = {"model": EMBEDDING_MODEL}
+    if EMBEDDING_DIMENSIONS:
+        params["dimensions"] = EMBEDDING_DIMENSIONS
+    return params
+
+
+def completion_usage(response) -> Dict[str, int]:
+    """Token usage of a chat completion (zeros if the API did not report it)"""
+    usage = getattr(response, "usage", None)
+    return {
+        "prompt_tokens": getattr(usage, "prompt_tokens", 0) or 0,
+        "completion_tokens": getattr(usage, "completion_tokens", 0) or 0,
+        "total_tokens": getattr(usage, "total_tokens", 0) or 0
+    }
+
+
+def _http_pool_settings() -> Dict:
+    """Connection limits and timeouts shared by the sync and async HTTP clients"""
+    return {
+        "limits": httpx.Limits(
+            max_connections=OPENAI_MAX_CONNECTIONS,
+            max_keepalive_connections=OPENAI_MAX_CONNECTIONS
+        ),
+        "timeout": httpx.Timeout(60.0, connect=10.0)
+    }
+
+
+def _chunk_store_id(metadata: Dict) -> str:
+    """Vector store ID of a chunk (deterministic, so re-indexing overwrites it)"""
+    return f"{metadata['source']}_chunk_{metadata['chunk_id']}"
+
+
+def _sources_key(sources: Optional[List[str]]):
+    """Hashable, order-independent form of a document filter"""
+    return None if sources is None else tuple(sorted(set(sources)))
+
+
+def _iter_groups(items: Iterable, size: int) -> Iterator[List]:
+    """Yield successive lists of at most size items"""
+    iterator = iter(items)
+    while True:
+        group = list(islice(iterator, size))
+        if not group:
+            return
+        yield group
 
 
 class RAGEngine:
-    """RAG Engine using ChromaDB and OpenAI"""
+    """RAG Engine using a vector store (ChromaDB by default) and OpenAI"""
     
-    def __init__(self):
-        """Initialize RAG engine with vector store and LLM"""
-        self.client = OpenAI(api_key=OPENAI_API_KEY)
+    def __init__(self, vector_store: VectorStore = None, client=None, async_client=None):
+        """
+        Initialize RAG engine with vector store and LLM
         
-        # Initialize ChromaDB
-        self.chroma_client = chromadb.PersistentClient(
-            path=CHROMA_DB_DIR,
-            settings=Settings(anonymized_telemetry=False)
-        )
+        Args:
+            vector_store: Vector store to use (VECTOR_STORE_BACKEND if None)
+            client: OpenAI-compatible client (rate-limited OpenAI client if None),
+                e.g. the offline stand-in used by the benchmarks
+            async_client: Async counterpart of client
+        """
+        # One pooled HTTP client, safe to share between threads (and sessions),
+        # paced and retried by the process-wide rate limiters
+        self.client = client if client is not None else RateLimitedOpenAI(OpenAI(
+            api_key=OPENAI_API_KEY,
+            max_retries=0,
+            http_client=httpx.Client(**_http_pool_settings())
+        ))
+        # Created on first use of the async API (see async_client)
+        self._async_client = async_client
         
-        # Get or create collection
-        try:
-            self.collection = self.chroma_client.get_collection(name=COLLECTION_NAME)
-        except:
-            self.collection = self.chroma_client.create_collection(
-                name=COLLECTION_NAME,
-                metadata={"description": "Regulatory documents for compliance analysis"}
-            )
+        # Batching and concurrency of ingestion (tunable per engine, e.g. by the CLI)
+        self.index_batch_size = INDEX_BATCH_SIZE
+        self.embedding_batch_size = EMBEDDING_BATCH_SIZE
+        self.embedding_workers = EMBEDDING_MAX_WORKERS
+        
+        # Persistent embedding cache shared by ingestion and retrieval
+        self.embedding_cache = EmbeddingCache() if EMBEDDING_CACHE_ENABLED else None
+        
+        # Answers to past questions, reused for near-duplicate questions
+        self.answer_cache = SemanticAnswerCache() if ANSWER_CACHE_ENABLED else None
+        
+        # In-process query path caches: query embeddings, and retrieval results
+        # keyed by (query, n_results, corpus_generation)
+        self.query_embedding_cache = LRUCache(QUERY_EMBEDDING_CACHE_SIZE)
+        self.retrieval_cache = LRUCache(RETRIEVAL_CACHE_SIZE)
+        
+        # Incremented whenever the collection changes
+        self.corpus_generation = 0
+        # Store version seen last, to notice writes by other processes (e.g. CLI ingests)
+        self._store_version = None
+        # (store version, documents) from the last list_documents()
+        self._documents = None
+        self._state_lock = threading.Lock()
+        
+        # Held by callers that check then change the indexed documents
+        # (e.g. folder sync), since the engine may be shared across sessions
+        self.ingest_lock = threading.RLock()
+        
+        # Keyword index for hybrid search, built from the collection on first use
+        self._bm25 = None
+        self._bm25_lock = threading.Lock()
+        
+        # MMR trade-off between relevance and diversity (None disables it)
+        self.mmr_lambda = MMR_LAMBDA if MMR_ENABLED else None
+        self.mmr_stats = {"calls": 0, "total_ms": 0.0, "last_ms": None}
+        
+        # Vector store, opened on first use (chromadb is slow to import and open)
+        self._store = vector_store
+        self._store_lock = threading.Lock()
+    
+    @property
+    def store(self) -> VectorStore:
+        """Vector store (VECTOR_STORE_BACKEND, created on first access if none was given)"""
+        if self._store is None:
+            with self._store_lock:
+                if self._store is None:
+                    with startup_step("vector_store"):
+                        self._store = create_vector_store()
+        return self._store
     
     def get_embedding(self, text: str) -> List[float]:
         """
@@ -47,113 +201,347 @@ class RAGEngine:
         Returns:
             Embedding vector
         """
-        response = self.client.embeddings.create(
-            model=EMBEDDING_MODEL,
-            input=text
-        )
-        return response.data[0].embedding
+        return self.get_embeddings([text])[0]
     
-    def add_documents(self, chunks: List[Dict[str, any]]):
+    def get_query_embedding(self, query: str) -> List[float]:
         """
-        Add document chunks to vector store
+        Embedding of a query, from the in-process LRU when it was seen recently
         
         Args:
-            chunks: List of document chunks with metadata
+            query: Query text
+            
+        Returns:
+            Embedding vector
         """
-        documents = []
-        metadatas = []
-        ids = []
-        embeddings = []
+        with span("query_embedding") as current:
+            embedding = self.query_embedding_cache.get(query)
+            current.set(cache_hits=int(embedding is not None))
+            if embedding is None:
+                embedding = self.get_embedding(query)
+                self.query_embedding_cache.put(query, embedding)
+        return embedding
+    
+    def _plan_embedding_batches(self, texts: List[str]) -> List[List[str]]:
+        """
+        Split texts into batches that respect the embeddings API input limits
+        
+        Args:
+            texts: Texts to embed
+            
+        Returns:
+            List of batches, in the original text order
+        """
+        batches = []
+        current = []
+        current_tokens = 0
         
-        for chunk in chunks:
-            text = chunk["text"]
-            metadata = chunk["metadata"]
+        for text, n_tokens in zip(texts, count_tokens_batch(texts)):
+            if n_tokens > EMBEDDING_MAX_INPUT_TOKENS:
+                text = truncate_tokens(text, EMBEDDING_MAX_INPUT_TOKENS)
+                n_tokens = EMBEDDING_MAX_INPUT_TOKENS
             
-            # Generate unique ID
-            doc_id = f"{metadata['source']}_chunk_{metadata['chunk_id']}"
+            if current and (
+                len(current) >= self.embedding_batch_size
+                or current_tokens + n_tokens > EMBEDDING_BATCH_TOKENS
+            ):
+                batches.append(current)
+                current = []
+                current_tokens = 0
             
-            # Get embedding
-            embedding = self.get_embedding(text)
+            current.append(text)
+            current_tokens += n_tokens
+        
+        if current:
+            batches.append(current)
+        
+        return batches
+    
+    def _embed_batch(self, texts: List[str]) -> List[List[float]]:
+        """Embed one batch of texts in a single API call"""
+        with span("embedding_request", items=len(texts), requests=1) as current:
+            response = self.client.embeddings.create(
+                input=texts,
+                **embedding_request_params()
+            )
+            current.set(prompt_tokens=getattr(getattr(response, "usage", None), "prompt_tokens", 0) or 0)
+        # The API may return items out of order, sort them by input index
+        return [item.embedding for item in sorted(response.data, key=lambda item: item.index)]
+    
+    def get_embeddings(self, texts: List[str]) -> List[List[float]]:
+        """
+        Generate embeddings for many texts with batched, concurrent requests
+        
+        Args:
+            texts: Texts to embed
             
-            documents.append(text)
-            metadatas.append(metadata)
-            ids.append(doc_id)
-            embeddings.append(embedding)
+        Returns:
+            Embedding vectors, in the same order as texts
+        """
+        if not texts:
+            return []
         
-        # Add to collection
-        self.collection.add(
-            documents=documents,
-            metadatas=metadatas,
-            ids=ids,
-            embeddings=embeddings
-        )
+        with span("embed", items=len(texts)) as current:
+            embeddings, missing_texts = self._lookup_cached_embeddings(texts)
+            current.set(cache_hits=len(texts) - len(missing_texts), cache_misses=len(missing_texts))
+            if missing_texts:
+                new_embeddings = self._embed_uncached(missing_texts)
+                self._fill_missing_embeddings(texts, embeddings, missing_texts, new_embeddings)
+        
+        return embeddings
     
-    def retrieve(self, query: str, n_results: int = TOP_K_RESULTS) -> List[Dict]:
+    def _lookup_cached_embeddings(self, texts: List[str]):
+        """
+        Look texts up in the embedding cache
+        
+        Returns:
+            (embeddings with None for misses, distinct texts to embed)
+        """
+        if self.embedding_cache is None:
+            return [None] * len(texts), list(dict.fromkeys(texts))
+        
+        embeddings = self.embedding_cache.get_many(texts)
+        # Embed each distinct missing text once
+        missing_texts = list(dict.fromkeys(
+            text for text, embedding in zip(texts, embeddings) if embedding is None
+        ))
+        return embeddings, missing_texts
+    
+    def _fill_missing_embeddings(
+        self,
+        texts: List[str],
+        embeddings: List,
+        missing_texts: List[str],
+        new_embeddings: List[List[float]]
+    ):
+        """Cache newly computed embeddings and fill them in, in place"""
+        if self.embedding_cache is not None:
+            self.embedding_cache.put_many(missing_texts, new_embeddings)
+        
+        by_text = dict(zip(missing_texts, new_embeddings))
+        for idx, embedding in enumerate(embeddings):
+            if embedding is None:
+                embeddings[idx] = by_text[texts[idx]]
+    
+    def _embed_uncached(self, texts: List[str]) -> List[List[float]]:
+        """Embed texts through the API with batched, concurrent requests"""
+        batches = self._plan_embedding_batches(texts)
+        if len(batches) == 1:
+            return self._embed_batch(batches[0])
+        
+        embeddings = []
+        with ThreadPoolExecutor(max_workers=min(self.embedding_workers, len(batches))) as executor:
+            # map() keeps at most max_workers batches in flight and preserves order
+            for batch_embeddings in executor.map(self._embed_batch, batches):
+                embeddings.extend(batch_embeddings)
+        return embeddings
+    
+    def add_documents(
+        self,
+        chunks: Iterable[Dict[str, any]],
+        progress: Callable[[int], None] = None
+    ) -> int:
+        """
+        Add document chunks to vector store
+        
+        Chunks are embedded and written in groups of index_batch_size so that
+        memory stays flat on very large documents.
+        
+        Args:
+            chunks: List (or any iterable) of document chunks with metadata
+            progress: Called with the total number of chunks written after each group
+            
+        Returns:
+            Number of chunks added
+        """
+        added = 0
+        
+        with span("index") as current:
+            for group in _iter_groups(chunks, self.index_batch_size):
+                embeddings = self.get_embeddings([chunk["text"] for chunk in group])
+                self._write_group(group, embeddings)
+                added += len(group)
+                current.set(items=added)
+                if progress is not None:
+                    progress(added)
+        
+        return added
+    
+    def _write_group(self, group: List[Dict[str, any]], embeddings: List[List[float]]):
+        """Write a group of embedded chunks to the collection (and the keyword index)"""
+        documents = [chunk["text"] for chunk in group]
+        metadatas = [chunk["metadata"] for chunk in group]
+        
+        # Generate unique IDs
+        ids = [_chunk_store_id(metadata) for metadata in metadatas]
+        
+        # Upsert so that re-adding a document never fails on duplicate IDs
+        with span("store_write", items=len(ids)):
+            versions = self.store.upsert(ids, documents, metadatas, embeddings)
+        
+        # Read once: the index may be dropped for a rebuild meanwhile
+        bm25 = self._bm25
+        if bm25 is not None:
+            with span("bm25_add", items=len(ids)):
+                bm25.add(ids, documents, metadatas)
+        self._mark_corpus_changed(versions)
+    
+    def retrieve(
+        self,
+        query: str,
+        n_results: int = TOP_K_RESULTS,
+        query_embedding: List[float] = None,
+        sources: Optional[List[str]] = None
+    ) -> List[Dict]:
         """
         Retrieve relevant chunks for a query
         
         Args:
             query: Search query
             n_results: Number of results to retrieve
+            query_embedding: Embedding of the query, if already computed
+            sources: Only search these documents (all documents if None)
             
         Returns:
             List of retrieved chunks with metadata
         """
-        # Get query embedding
-        query_embedding = self.get_embedding(query)
+        with span("retrieve", n_results=n_results) as current:
+            self._check_store_version()
+            # Results are only reused for the same state of the collection
+            cache_key = (query, n_results, _sources_key(sources), self.mmr_lambda, self.corpus_generation)
+            cached = self.retrieval_cache.get(cache_key)
+            current.set(cache_hits=int(cached is not None))
+            if cached is not None:
+                return list(cached)
+            
+            # Get query embedding
+            if query_embedding is None:
+                query_embedding = self.get_query_embedding(query)
+            
+            retrieved_chunks = self._search(query, query_embedding, n_results, sources)
+            self.retrieval_cache.put(cache_key, retrieved_chunks)
+            current.set(items=len(retrieved_chunks))
+        return list(retrieved_chunks)
+    
+    def _search(
+        self,
+        query: str,
+        query_embedding: List[float],
+        n_results: int,
+        sources: Optional[List[str]] = None
+    ) -> List[Dict]:
+        """
+        Search the collection, then diversify the results if MMR is enabled
+        
+        With MMR, MMR_CANDIDATES times more chunks are ranked, and n_results
+        of them are picked by maximal marginal relevance (relevance being the
+        embedding similarity to the query, also for hybrid candidates).
+        """
+        if self.mmr_lambda is None:
+            return self._rank(query, query_embedding, n_results, sources=sources)
         
-        # Query vector store
-        results = self.collection.query(
-            query_embeddings=[query_embedding],
-            n_results=n_results
+        candidates = self._rank(
+            query, query_embedding, n_results * MMR_CANDIDATES, include_embeddings=True, sources=sources
         )
+        return self._diversify(query_embedding, candidates, n_results)
+    
+    def _diversify(self, query_embedding: List[float], candidates: List[Dict], n_results: int) -> List[Dict]:
+        """Pick n_results diverse candidates by MMR, recording the time taken"""
+        start = time.perf_counter()
+        with span("mmr", items=len(candidates)):
+            picked = mmr_select(
+                query_embedding,
+                [chunk.pop("embedding") for chunk in candidates],
+                n_results,
+                self.mmr_lambda
+            )
+        elapsed_ms = (time.perf_counter() - start) * 1000
         
-        # Format results
-        retrieved_chunks = []
-        if results["documents"] and len(results["documents"]) > 0:
-            for idx in range(len(results["documents"][0])):
-                retrieved_chunks.append({
-                    "text": results["documents"][0][idx],
-                    "metadata": results["metadatas"][0][idx],
-                    "distance": results["distances"][0][idx] if "distances" in results else None
-                })
+        with self._state_lock:
+            self.mmr_stats["calls"] += 1
+            self.mmr_stats["total_ms"] += elapsed_ms
+            self.mmr_stats["last_ms"] = elapsed_ms
+        return [candidates[idx] for idx in picked]
+    
+    def _rank(
+        self,
+        query: str,
+        query_embedding: List[float],
+        n_results: int,
+        include_embeddings: bool = False,
+        sources: Optional[List[str]] = None
+    ) -> List[Dict]:
+        """
+        Rank the collection (or the chunks of sources) by vector or hybrid
+        (vector + BM25) search
+        
+        In hybrid mode, HYBRID_CANDIDATES times more candidates are taken
+        from each ranking and merged by reciprocal rank fusion.
+        """
+        if not HYBRID_SEARCH:
+            with span("vector_search", n_results=n_results) as current:
+                vector_chunks = self.store.query(
+                    query_embedding, n_results, include_embeddings=include_embeddings, sources=sources
+                )
+                current.set(items=len(vector_chunks))
+            return vector_chunks
+        
+        n_candidates = n_results * HYBRID_CANDIDATES
+        with span("vector_search", n_results=n_candidates) as current:
+            vector_chunks = self.store.query(
+                query_embedding, n_candidates, include_embeddings=include_embeddings, sources=sources
+            )
+            current.set(items=len(vector_chunks))
+        bm25 = self._get_bm25()
+        with span("bm25_search", n_results=n_candidates) as current:
+            keyword_hits = bm25.search(query, n_candidates, sources=sources)
+            current.set(items=len(keyword_hits))
+        
+        fused = reciprocal_rank_fusion(
+            [[chunk["id"] for chunk in vector_chunks], [doc_id for doc_id, _ in keyword_hits]],
+            k=RRF_K
+        )[:n_results]
+        
+        # Fetch the keyword-only hits from the vector store
+        chunks_by_id = {chunk["id"]: chunk for chunk in vector_chunks}
+        missing_ids = [doc_id for doc_id, _ in fused if doc_id not in chunks_by_id]
+        if missing_ids:
+            with span("store_get", items=len(missing_ids)):
+                for chunk in self.store.get(missing_ids, include_embeddings=include_embeddings):
+                    chunks_by_id[chunk["id"]] = {**chunk, "distance": None}
         
+        retrieved_chunks = []
+        for doc_id, score in fused:
+            if doc_id in chunks_by_id:
+                retrieved_chunks.append({**chunks_by_id[doc_id], "score": score})
         return retrieved_chunks
     
-    def generate_answer(self, query: str, context_chunks: List[Dict]) -> str:
+    def _get_bm25(self) -> BM25Index:
+        """Get the keyword index, building it from the collection the first time"""
+        if self._bm25 is None:
+            with self._bm25_lock:
+                if self._bm25 is None:
+                    with span("bm25_build") as current:
+                        index = BM25Index()
+                        for ids, documents, metadatas in self.store.iter_pages(self.index_batch_size):
+                            index.add(ids, documents, metadatas)
+                            current.add(items=len(ids))
+                    self._bm25 = index
+        return self._bm25
+    
+    def _build_messages(self, query: str, context_chunks: List[Dict]) -> List[Dict[str, str]]:
         """
-        Generate answer using LLM with retrieved context
+        Build the chat messages for a RAG answer
         
         Args:
             query: User query
             context_chunks: Retrieved context chunks
             
         Returns:
-            Generated answer
+            System and user messages
         """
-        # Build context from retrieved chunks
-        context = "\n\n---\n\n".join([
-            f"Source: {chunk['metadata']['source']} (Chunk {chunk['metadata']['chunk_id'] + 1})\n{chunk['text']}"
-            for chunk in context_chunks
-        ])
+        # Merge adjacent chunks and fit them in the token budget
+        context = build_context(context_chunks)
         
-        # System prompt for compliance analysis
-        system_prompt = """You are RegIntel AI, an expert regulatory compliance assistant for HexaBank.
-
-Your role is to:
-- Analyze regulatory documents (EU AI Act, EBA guidelines, ECB regulations, GDPR, etc.)
-- Perform gap analyses between regulations and internal policies
-- Extract key compliance requirements
-- Provide traceable, evidence-based answers with citations
-
-Always:
-- Ground your answers in the provided context
-- Reference specific sources and sections
-- Be precise and actionable
-- Highlight compliance gaps or risks
-- Use a professional, clear tone
-- Respond in the same language as the query (French or English)"""
-
         user_prompt = f"""Based on the following regulatory documents:
 
 {context}
@@ -164,54 +552,539 @@ Question: {query}
 
 Provide a detailed, evidence-based answer. Include specific references to the source documents."""
 
-        # Generate response
-        response = self.client.chat.completions.create(
-            model=MODEL_NAME,
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": user_prompt}
-            ],
-            temperature=0.3,  # Lower temperature for factual responses
-            max_tokens=1500
-        )
+        return [
+            {"role": "system", "content": SYSTEM_PROMPT},
+            {"role": "user", "content": user_prompt}
+        ]
+    
+    def _answer_request(self, query: str, context_chunks: List[Dict]) -> Dict[str, any]:
+        """Chat completion parameters for a RAG answer"""
+        return {
+            "model": MODEL_NAME,
+            "messages": self._build_messages(query, context_chunks),
+            "temperature": 0.3,  # Lower temperature for factual responses
+            "max_tokens": 1500
+        }
+    
+    def generate_answer(self, query: str, context_chunks: List[Dict]) -> str:
+        """
+        Generate answer using LLM with retrieved context
         
-        return response.choices[0].message.content
+        Args:
+            query: User query
+            context_chunks: Retrieved context chunks
+            
+        Returns:
+            Generated answer
+        """
+        return self._complete_answer(query, context_chunks)[0]
+    
+    def _complete_answer(self, query: str, context_chunks: List[Dict]):
+        """Generate an answer, returning (answer, token usage)"""
+        with span("completion", requests=1) as current:
+            response = self.client.chat.completions.create(
+                **self._answer_request(query, context_chunks)
+            )
+            usage = completion_usage(response)
+            current.set(prompt_tokens=usage["prompt_tokens"], completion_tokens=usage["completion_tokens"])
+        
+        return response.choices[0].message.content, usage
+    
+    def stream_answer(self, query: str, context_chunks: List[Dict]) -> Iterator[str]:
+        """
+        Generate answer using LLM with retrieved context, token by token
+        
+        Args:
+            query: User query
+            context_chunks: Retrieved context chunks
+            
+        Yields:
+            Pieces of the answer as they arrive
+        """
+        # Not a `with span(...)`: the generator may be finished from another context
+        current = Span("completion", {"requests": 1, "stream": True})
+        try:
+            stream = self.client.chat.completions.create(
+                **self._answer_request(query, context_chunks),
+                stream=True,
+                stream_options={"include_usage": True}
+            )
+            for event in stream:
+                if getattr(event, "usage", None) is not None:
+                    current.set(
+                        prompt_tokens=event.usage.prompt_tokens,
+                        completion_tokens=event.usage.completion_tokens
+                    )
+                if event.choices and event.choices[0].delta.content:
+                    if "first_token_ms" not in current.attributes:
+                        current.set(first_token_ms=round((time.perf_counter() - current.start) * 1000, 3))
+                    yield event.choices[0].delta.content
+        except Exception as e:
+            current.error = type(e).__name__
+            raise
+        finally:
+            current.end()
+    
+    def _lookup_answer(self, question_embedding: List[float], chunks: List[Dict]):
+        """Find a cached answer generated from the same chunks for a similar question"""
+        if self.answer_cache is None:
+            return None
+        return self.answer_cache.lookup(question_embedding, [chunk["id"] for chunk in chunks])
+    
+    def _store_answer(
+        self,
+        question: str,
+        question_embedding: List[float],
+        chunks: List[Dict],
+        answer: str,
+        generation: int
+    ):
+        """Cache an answer, unless the collection changed while it was generated"""
+        if self.answer_cache is None or generation != self.corpus_generation:
+            return
+        self.answer_cache.store(
+            question, question_embedding, [chunk["id"] for chunk in chunks], answer, chunks
+        )
     
-    def query(self, question: str) -> Dict[str, any]:
+    def query(self, question: str, sources: Optional[List[str]] = None) -> Dict[str, any]:
         """
         Complete RAG query: retrieve + generate
         
+        The answer is reused from the semantic answer cache when a similar
+        question retrieved exactly the same chunks.
+        
+        Args:
+            question: User question
+            sources: Only search these documents (all documents if None)
+            
+        Returns:
+            Dictionary with answer, retrieved chunks, whether the answer was
+            cached and the completion's token usage (zero when cached)
+        """
+        with span("query") as current:
+            generation = self.corpus_generation
+            question_embedding = self.get_query_embedding(question)
+            
+            # Retrieve relevant chunks
+            chunks = self.retrieve(question, query_embedding=question_embedding, sources=sources)
+            
+            cached = self._lookup_answer(question_embedding, chunks)
+            current.set(cache_hits=int(cached is not None))
+            if cached is not None:
+                return {
+                    "answer": cached["answer"],
+                    "sources": chunks,
+                    "cached": True,
+                    "usage": completion_usage(None)
+                }
+            
+            # Generate answer
+            answer, usage = self._complete_answer(question, chunks)
+            self._store_answer(question, question_embedding, chunks, answer, generation)
+        
+        return {
+            "answer": answer,
+            "sources": chunks,
+            "cached": False,
+            "usage": usage
+        }
+    
+    def query_stream(self, question: str, sources: Optional[List[str]] = None) -> Dict[str, any]:
+        """
+        Streaming RAG query: retrieve, then stream the answer
+        
+        Retrieval runs before this returns, so the sources are available
+        before the first answer token. A cached answer is streamed as a
+        single piece.
+        
         Args:
             question: User question
+            sources: Only search these documents (all documents if None)
+            
+        Returns:
+            Dictionary with retrieved chunks ("sources"), a generator of
+            answer pieces ("answer_stream") and whether the answer was cached
+        """
+        # The span covers retrieval; the streamed completion has its own span
+        with span("query", stream=True) as current:
+            generation = self.corpus_generation
+            question_embedding = self.get_query_embedding(question)
+            chunks = self.retrieve(question, query_embedding=question_embedding, sources=sources)
+            
+            cached = self._lookup_answer(question_embedding, chunks)
+            current.set(cache_hits=int(cached is not None))
+        if cached is not None:
+            return {
+                "sources": chunks,
+                "answer_stream": iter([cached["answer"]]),
+                "cached": True
+            }
+        
+        def answer_stream() -> Iterator[str]:
+            parts = []
+            for piece in self.stream_answer(question, chunks):
+                parts.append(piece)
+                yield piece
+            # Only complete answers are cached
+            self._store_answer(question, question_embedding, chunks, "".join(parts), generation)
+        
+        return {
+            "sources": chunks,
+            "answer_stream": answer_stream(),
+            "cached": False
+        }
+    
+    # Async API
+    #
+    # Same behaviour as the sync methods above, on an AsyncOpenAI client so a
+    # single worker can keep many queries and ingestion batches in flight.
+    # ChromaDB and the embedding cache are synchronous and run in threads.
+    # The async client's connection pool belongs to the event loop that
+    # first uses it: use the async API from one long-lived event loop.
+    
+    @property
+    def async_client(self) -> RateLimitedOpenAI:
+        """Async OpenAI client with a shared, bounded connection pool"""
+        if self._async_client is None:
+            self._async_client = RateLimitedOpenAI(AsyncOpenAI(
+                api_key=OPENAI_API_KEY,
+                max_retries=0,
+                http_client=httpx.AsyncClient(**_http_pool_settings())
+            ))
+        return self._async_client
+    
+    async def _aembed_batch(self, texts: List[str]) -> List[List[float]]:
+        """Embed one batch of texts in a single async API call"""
+        with span("embedding_request", items=len(texts), requests=1) as current:
+            response = await self.async_client.embeddings.create(
+                input=texts,
+                **embedding_request_params()
+            )
+            current.set(prompt_tokens=getattr(getattr(response, "usage", None), "prompt_tokens", 0) or 0)
+        # The API may return items out of order, sort them by input index
+        return [item.embedding for item in sorted(response.data, key=lambda item: item.index)]
+    
+    async def aget_embeddings(self, texts: List[str]) -> List[List[float]]:
+        """
+        Async version of get_embeddings
+        
+        Args:
+            texts: Texts to embed
+            
+        Returns:
+            Embedding vectors, in the same order as texts
+        """
+        if not texts:
+            return []
+        
+        with span("embed", items=len(texts)) as current:
+            embeddings, missing_texts = await asyncio.to_thread(self._lookup_cached_embeddings, texts)
+            current.set(cache_hits=len(texts) - len(missing_texts), cache_misses=len(missing_texts))
+            if missing_texts:
+                batches = self._plan_embedding_batches(missing_texts)
+                semaphore = asyncio.Semaphore(self.embedding_workers)
+                
+                async def embed(batch: List[str]) -> List[List[float]]:
+                    async with semaphore:
+                        return await self._aembed_batch(batch)
+                
+                # gather() preserves the batch order
+                batch_results = await asyncio.gather(*(embed(batch) for batch in batches))
+                new_embeddings = [embedding for batch in batch_results for embedding in batch]
+                await asyncio.to_thread(
+                    self._fill_missing_embeddings, texts, embeddings, missing_texts, new_embeddings
+                )
+        
+        return embeddings
+    
+    async def aadd_documents(self, chunks: Iterable[Dict[str, any]]) -> int:
+        """
+        Async version of add_documents
+        
+        The next group is embedded while the previous one is written to the
+        collection.
+        
+        Args:
+            chunks: List (or any iterable) of document chunks with metadata
+            
+        Returns:
+            Number of chunks added
+        """
+        added = 0
+        pending_write = None
+        
+        try:
+            for group in _iter_groups(chunks, self.index_batch_size):
+                embeddings = await self.aget_embeddings([chunk["text"] for chunk in group])
+                if pending_write is not None:
+                    await pending_write
+                pending_write = asyncio.ensure_future(
+                    asyncio.to_thread(self._write_group, group, embeddings)
+                )
+                added += len(group)
+        finally:
+            # Also when embedding fails: the write in progress is not left unawaited
+            if pending_write is not None:
+                await pending_write
+        
+        return added
+    
+    async def aget_query_embedding(self, query: str) -> List[float]:
+        """
+        Async version of get_query_embedding
+        
+        Args:
+            query: Query text
             
         Returns:
-            Dictionary with answer and retrieved chunks
+            Embedding vector
+        """
+        with span("query_embedding") as current:
+            embedding = self.query_embedding_cache.get(query)
+            current.set(cache_hits=int(embedding is not None))
+            if embedding is None:
+                embedding = (await self.aget_embeddings([query]))[0]
+                self.query_embedding_cache.put(query, embedding)
+        return embedding
+    
+    async def aretrieve(
+        self,
+        query: str,
+        n_results: int = TOP_K_RESULTS,
+        query_embedding: List[float] = None,
+        sources: Optional[List[str]] = None
+    ) -> List[Dict]:
+        """
+        Async version of retrieve
+        
+        Args:
+            query: Search query
+            n_results: Number of results to retrieve
+            query_embedding: Embedding of the query, if already computed
+            sources: Only search these documents (all documents if None)
+            
+        Returns:
+            List of retrieved chunks with metadata
+        """
+        with span("retrieve", n_results=n_results) as current:
+            await asyncio.to_thread(self._check_store_version)
+            cache_key = (query, n_results, _sources_key(sources), self.mmr_lambda, self.corpus_generation)
+            cached = self.retrieval_cache.get(cache_key)
+            current.set(cache_hits=int(cached is not None))
+            if cached is not None:
+                return list(cached)
+            
+            if query_embedding is None:
+                query_embedding = await self.aget_query_embedding(query)
+            
+            # to_thread copies the context, so the search spans keep "retrieve" as parent
+            retrieved_chunks = await asyncio.to_thread(self._search, query, query_embedding, n_results, sources)
+            self.retrieval_cache.put(cache_key, retrieved_chunks)
+            current.set(items=len(retrieved_chunks))
+        return list(retrieved_chunks)
+    
+    async def agenerate_answer(self, query: str, context_chunks: List[Dict]) -> str:
+        """
+        Async version of generate_answer
+        
+        Args:
+            query: User query
+            context_chunks: Retrieved context chunks
+            
+        Returns:
+            Generated answer
+        """
+        return (await self._acomplete_answer(query, context_chunks))[0]
+    
+    async def _acomplete_answer(self, query: str, context_chunks: List[Dict]):
+        """Async version of _complete_answer"""
+        with span("completion", requests=1) as current:
+            response = await self.async_client.chat.completions.create(
+                **self._answer_request(query, context_chunks)
+            )
+            usage = completion_usage(response)
+            current.set(prompt_tokens=usage["prompt_tokens"], completion_tokens=usage["completion_tokens"])
+        
+        return response.choices[0].message.content, usage
+    
+    async def aquery(self, question: str, sources: Optional[List[str]] = None) -> Dict[str, any]:
         """
-        # Retrieve relevant chunks
-        chunks = self.retrieve(question)
+        Async version of query
         
-        # Generate answer
-        answer = self.generate_answer(question, chunks)
+        Args:
+            question: User question
+            sources: Only search these documents (all documents if None)
+            
+        Returns:
+            Dictionary with answer, retrieved chunks, whether the answer was
+            cached and the completion's token usage (zero when cached)
+        """
+        with span("query") as current:
+            generation = self.corpus_generation
+            question_embedding = await self.aget_query_embedding(question)
+            chunks = await self.aretrieve(question, query_embedding=question_embedding, sources=sources)
+            
+            cached = self._lookup_answer(question_embedding, chunks)
+            current.set(cache_hits=int(cached is not None))
+            if cached is not None:
+                return {
+                    "answer": cached["answer"],
+                    "sources": chunks,
+                    "cached": True,
+                    "usage": completion_usage(None)
+                }
+            
+            answer, usage = await self._acomplete_answer(question, chunks)
+            self._store_answer(question, question_embedding, chunks, answer, generation)
         
         return {
             "answer": answer,
-            "sources": chunks
+            "sources": chunks,
+            "cached": False,
+            "usage": usage
         }
     
+    def replace_document(
+        self,
+        source: str,
+        chunks: Iterable[Dict[str, any]],
+        progress: Callable[[int], None] = None
+    ) -> int:
+        """
+        Index a new version of a document in place of the previous one
+        
+        The new chunks are written first, overwriting the previous chunks with
+        the same IDs, then the previous chunks the new version does not have
+        are deleted. If indexing fails or is cancelled, the previous version
+        stays searchable (partly overwritten by the chunks already written);
+        a document indexed for the first time is removed instead.
+        
+        Args:
+            source: Document name (the "source" metadata of the chunks)
+            chunks: Chunks of the new version
+            progress: Passed to add_documents
+            
+        Returns:
+            Number of chunks added
+        """
+        previous_ids = set(self.store.source_ids(source))
+        new_ids = set()
+        
+        def track(chunks: Iterable[Dict]) -> Iterator[Dict]:
+            for chunk in chunks:
+                new_ids.add(_chunk_store_id(chunk["metadata"]))
+                yield chunk
+        
+        try:
+            added = self.add_documents(track(chunks), progress=progress)
+        except BaseException:
+            if not previous_ids:
+                # Do not leave a partially indexed document behind
+                self.delete_document(source)
+            raise
+        
+        stale_ids = sorted(previous_ids - new_ids)
+        if stale_ids:
+            versions = self.store.delete(stale_ids)
+            bm25 = self._bm25
+            if bm25 is not None:
+                bm25.remove(stale_ids)
+            self._mark_corpus_changed(versions)
+        return added
+    
+    def delete_document(self, source: str):
+        """
+        Delete every chunk of a document from the collection
+        
+        Args:
+            source: Document name (the "source" metadata of its chunks)
+        """
+        versions = self.store.delete_source(source)
+        bm25 = self._bm25
+        if bm25 is not None:
+            bm25.remove_source(source)
+        self._mark_corpus_changed(versions)
+    
+    def list_documents(self) -> List[Dict]:
+        """
+        List the documents in the collection
+        
+        Listing scans the collection's metadata, so the result is reused
+        until the store changes (e.g. on every Streamlit rerun).
+        
+        Returns:
+            List of {"source", "chunks"} dictionaries, sorted by source
+        """
+        version = self.store.version()
+        cached = self._documents
+        if cached is None or cached[0] != version:
+            documents = [
+                {"source": source, "chunks": chunks}
+                for source, chunks in sorted(self.store.list_sources().items())
+            ]
+            cached = self._documents = (version, documents)
+        return [dict(document) for document in cached[1]]
+    
+    def _invalidate_corpus(self):
+        """Invalidate the caches derived from the previous state of the collection"""
+        with self._state_lock:
+            self.corpus_generation += 1
+        # Stale entries can no longer be hit (keys carry the generation), free them
+        self.retrieval_cache.clear()
+        if self.answer_cache is not None:
+            self.answer_cache.clear()
+    
+    def _mark_corpus_changed(self, versions: Tuple):
+        """
+        Invalidate everything derived from the previous state of the
+        collection, after a write by this engine
+
+        Args:
+            versions: (before, after) store versions returned by the write
+        """
+        self._invalidate_corpus()
+        # The keyword index was updated along with the write: only writes by
+        # other processes (a different version next time) require a rebuild.
+        # If the store changed since the version seen last, that change is
+        # left for _check_store_version.
+        before, after = versions
+        with self._state_lock:
+            if self._store_version == before:
+                self._store_version = after
+    
+    def _check_store_version(self):
+        """
+        Pick up writes made to the store by other processes (e.g. a CLI ingest
+        into the store this app serves): the caches are invalidated and the
+        keyword index is rebuilt from the store on next use
+        """
+        version = self.store.version()
+        with self._state_lock:
+            if version == self._store_version:
+                return
+            self._store_version = version
+        with self._bm25_lock:
+            self._bm25 = None
+        self._invalidate_corpus()
+    
     def clear_collection(self):
         """Clear all documents from the collection"""
-        try:
-            self.chroma_client.delete_collection(name=COLLECTION_NAME)
-            self.collection = self.chroma_client.create_collection(
-                name=COLLECTION_NAME,
-                metadata={"description": "Regulatory documents for compliance analysis"}
-            )
-        except Exception as e:
-            print(f"Error clearing collection: {e}")
+        bm25 = self._bm25
+        if bm25 is not None:
+            bm25.clear()
+        self._mark_corpus_changed(self.store.clear())
+    
+    def get_cache_stats(self) -> Dict[str, Dict[str, float]]:
+        """Get hit/miss counters of the enabled caches, by cache name"""
+        stats = {}
+        if self.embedding_cache is not None:
+            stats["embeddings"] = self.embedding_cache.stats()
+        stats["query_embeddings"] = self.query_embedding_cache.stats()
+        stats["retrievals"] = self.retrieval_cache.stats()
+        if self.answer_cache is not None:
+            stats["answers"] = self.answer_cache.stats()
+        return stats
     
     def get_document_count(self) -> int:
         """Get number of documents in collection"""
-        try:
-            return self.collection.count()
-        except:
-            return 0
+        return self.store.count()
@@ -0,0 +1,212 @@
+"""
+Startup helpers for RegIntel AI: profiling and background preloading
+
+With STARTUP_PROFILE enabled (REGINTEL_PROFILE_STARTUP=1), every module
+imported after this one is timed, as are initialization steps:
+
+    with startup_step("vector_store"):
+        store = create_vector_store()
+
+Each step is printed when it finishes, with the imports it triggered, and
+report_startup() prints the import time of each package. Import this module
+before the others so that their imports are measured.
+"""
+import importlib
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from typing import List, Dict, Iterator
+from config import STARTUP_PROFILE
+
+# Packages listed in the startup report (the others are summed up in one line)
+REPORT_TOP_PACKAGES = 15
+
+_APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+_started = time.perf_counter()
+_lock = threading.Lock()
+_import_times: Dict[str, float] = {}  # Module name -> own import time (nested imports excluded)
+_steps: List[Dict] = []
+_reported = False
+_local = threading.local()
+
+
+class _TimedLoader:
+    """Wraps a module loader, timing the creation and execution of the module"""
+
+    def __init__(self, loader, name: str):
+        self._loader = loader
+        self._name = name
+
+    def __getattr__(self, attribute):
+        return getattr(self._loader, attribute)
+
+    def _timed(self, call, *args):
+        if not hasattr(_local, "stack"):
+            _local.stack = []
+        # [nested time] of each import in progress on this thread
+        _local.stack.append([0.0])
+        start = time.perf_counter()
+        try:
+            return call(*args)
+        finally:
+            elapsed = time.perf_counter() - start
+            nested = _local.stack.pop()[0]
+            if _local.stack:
+                _local.stack[-1][0] += elapsed
+            with _lock:
+                _import_times[self._name] = _import_times.get(self._name, 0.0) + elapsed - nested
+
+    def create_module(self, spec):
+        return self._timed(self._loader.create_module, spec)
+
+    def exec_module(self, module):
+        try:
+            self._timed(self._loader.exec_module, module)
+        finally:
+            # Leave the module with its real loader
+            if getattr(module, "__loader__", None) is self:
+                module.__loader__ = self._loader
+            if getattr(module, "__spec__", None) is not None and module.__spec__.loader is self:
+                module.__spec__.loader = self._loader
+
+
+class _ImportTimer:
+    """Meta path finder handing out timed loaders for the specs other finders return"""
+
+    def find_spec(self, fullname, path=None, target=None):
+        for finder in sys.meta_path:
+            if finder is self or not hasattr(finder, "find_spec"):
+                continue
+            spec = finder.find_spec(fullname, path, target)
+            if spec is not None:
+                if spec.loader is not None and hasattr(spec.loader, "exec_module"):
+                    spec.loader = _TimedLoader(spec.loader, fullname)
+                return spec
+        return None
+
+
+_import_timer = _ImportTimer()
+
+
+def enable_profiling():
+    """Start timing imports (done on import of this module with STARTUP_PROFILE)"""
+    if _import_timer not in sys.meta_path:
+        sys.meta_path.insert(0, _import_timer)
+
+
+def _package_of(module_name: str) -> str:
+    """Reporting group of a module: the module itself for the app's own, else its top-level package"""
+    module = sys.modules.get(module_name)
+    path = getattr(module, "__file__", None) or ""
+    if os.path.abspath(path).startswith(_APP_DIR + os.sep) and "site-packages" not in path:
+        return module_name
+    return module_name.split(".")[0]
+
+
+@contextmanager
+def startup_step(name: str) -> Iterator[None]:
+    """
+    Time an initialization step (no-op unless STARTUP_PROFILE is enabled)
+
+    Args:
+        name: Step name
+    """
+    if not STARTUP_PROFILE:
+        yield
+        return
+    with _lock:
+        imported_before = dict(_import_times)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        duration = time.perf_counter() - start
+        with _lock:
+            imports = {
+                module: seconds - imported_before.get(module, 0.0)
+                for module, seconds in _import_times.items()
+                if seconds != imported_before.get(module, 0.0)
+            }
+            _steps.append({"step": name, "duration_ms": round(duration * 1000, 1)})
+        import_ms = sum(imports.values()) * 1000
+        print(
+            f"[startup] {name}: {duration * 1000:.0f} ms "
+            f"({len(imports)} modules imported in {import_ms:.0f} ms)"
+        )
+
+
+def import_report() -> List[Dict]:
+    """
+    Import time of each package (or app module), slowest first
+
+    Returns:
+        [{"package", "modules", "import_ms"}] (empty unless profiling)
+    """
+    packages: Dict[str, Dict] = {}
+    with _lock:
+        import_times = dict(_import_times)
+    for module_name, seconds in import_times.items():
+        package = packages.setdefault(_package_of(module_name), {"modules": 0, "seconds": 0.0})
+        package["modules"] += 1
+        package["seconds"] += seconds
+    return [
+        {"package": name, "modules": package["modules"], "import_ms": round(package["seconds"] * 1000, 1)}
+        for name, package in sorted(packages.items(), key=lambda item: -item[1]["seconds"])
+    ]
+
+
+def report_startup(label: str = "ready"):
+    """
+    Print the time since this module was imported and the import time of
+    each package (once per process, no-op unless STARTUP_PROFILE is enabled)
+
+    Args:
+        label: Milestone reached, e.g. "first page rendered"
+    """
+    global _reported
+    if not STARTUP_PROFILE:
+        return
+    with _lock:
+        if _reported:
+            return
+        _reported = True
+
+    packages = import_report()
+    total_ms = sum(package["import_ms"] for package in packages)
+    lines = [
+        f"[startup] {label} after {(time.perf_counter() - _started) * 1000:.0f} ms "
+        f"({total_ms:.0f} ms importing {sum(package['modules'] for package in packages)} modules)"
+    ]
+    for package in packages[:REPORT_TOP_PACKAGES]:
+        lines.append(f"[startup]   {package['import_ms']:8.1f} ms  {package['package']} ({package['modules']} modules)")
+    rest = packages[REPORT_TOP_PACKAGES:]
+    if rest:
+        lines.append(f"[startup]   {sum(package['import_ms'] for package in rest):8.1f} ms  {len(rest)} other packages")
+    print("\n".join(lines))
+
+
+def preload_in_background(module_names: List[str]):
+    """
+    Import modules from a background thread, so that the first request that
+    needs them does not pay for the import (an import in progress is simply
+    waited for by other threads)
+
+    Args:
+        module_names: Modules to import (missing ones are skipped)
+    """
+    def preload():
+        for module_name in module_names:
+            with startup_step(f"preload {module_name}"):
+                try:
+                    importlib.import_module(module_name)
+                except ImportError:
+                    pass
+
+    threading.Thread(target=preload, name="startup-preload", daemon=True).start()
+
+
+if STARTUP_PROFILE:
+    enable_profiling()
@@ -0,0 +1,370 @@
+"""
+Per-stage telemetry for RegIntel AI
+
+Stages are timed with spans:
+
+    with span("embed", items=len(texts)) as current:
+        ...
+        current.set(prompt_tokens=usage.prompt_tokens)
+
+Finished spans are written as JSON log lines, aggregated into Prometheus
+metrics (a text file, and optionally an HTTP /metrics endpoint) and handed
+to any active collect_spans() block, e.g. for a per-answer breakdown.
+"""
+import atexit
+import contextvars
+import json
+import logging
+import logging.handlers
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import List, Dict, Iterable, Iterator, Optional
+from config import (
+    TELEMETRY_ENABLED,
+    TELEMETRY_LOG_PATH,
+    TELEMETRY_LOG_MAX_BYTES,
+    TELEMETRY_LOG_BACKUPS,
+    METRICS_FILE_PATH,
+    METRICS_FILE_INTERVAL
+)
+
+# Numeric span attributes summed into Prometheus counters
+COUNTED_ATTRIBUTES = ("items", "requests", "prompt_tokens", "completion_tokens", "cache_hits", "cache_misses")
+
+# Upper bounds (seconds) of the stage duration histogram buckets
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+_current_span = contextvars.ContextVar("regintel_current_span", default=None)
+_collector = contextvars.ContextVar("regintel_span_collector", default=None)
+
+
+class Span:
+    """One timed stage, with its attributes (counts, tokens, cache hits...)"""
+
+    def __init__(self, name: str, attributes: Dict):
+        parent = _current_span.get()
+        self.name = name
+        self.attributes = dict(attributes)
+        self.parent = parent.name if parent is not None else None
+        self.trace_id = parent.trace_id if parent is not None else uuid.uuid4().hex[:16]
+        self.start = time.perf_counter()
+        self.duration = None
+        self.error = None
+        # Time spent in nested timed iterators (see timed_iter)
+        self.nested_time = 0.0
+
+    def set(self, **attributes):
+        """Set attributes"""
+        self.attributes.update(attributes)
+
+    def add(self, **amounts):
+        """Add to numeric attributes"""
+        for key, amount in amounts.items():
+            self.attributes[key] = self.attributes.get(key, 0) + amount
+
+    def end(self, duration: float = None):
+        """
+        Finish the span and export it
+
+        Args:
+            duration: Seconds to record (time since the start if None)
+        """
+        if self.duration is not None:
+            return
+        self.duration = time.perf_counter() - self.start if duration is None else duration
+        _export(self)
+
+    def to_dict(self) -> Dict:
+        """JSON-serialisable form of the span"""
+        record = {
+            "ts": datetime.now(timezone.utc).isoformat(timespec="milliseconds"),
+            "trace_id": self.trace_id,
+            "span": self.name,
+            "parent": self.parent,
+            "duration_ms": round(self.duration * 1000, 3)
+        }
+        record.update(self.attributes)
+        if self.error:
+            record["error"] = self.error
+        return record
+
+
+@contextmanager
+def span(name: str, **attributes) -> Iterator[Span]:
+    """
+    Time a stage; spans opened inside it record it as their parent
+
+    Args:
+        name: Stage name
+        **attributes: Initial attributes
+
+    Yields:
+        The span, to set more attributes on
+    """
+    current = Span(name, attributes)
+    token = _current_span.set(current)
+    try:
+        yield current
+    except BaseException as e:
+        current.error = type(e).__name__
+        raise
+    finally:
+        _current_span.reset(token)
+        current.end()
+
+
+_timed_iterators = threading.local()
+
+
+def timed_iter(name: str, iterable: Iterable, **attributes) -> Iterator:
+    """
+    Wrap a lazy iterable in a span timing only the production of its items
+
+    Time spent by the consumer between items is excluded, and so is time
+    spent in nested timed iterators (e.g. extraction feeding the chunker),
+    so that each stage reports its own cost. The span ends when the
+    iterator is exhausted or closed, with the number of items produced.
+
+    Args:
+        name: Stage name
+        iterable: Items to produce
+        **attributes: Initial attributes
+
+    Yields:
+        The items of iterable
+    """
+    current = Span(name, attributes)
+    current.set(items=0)
+    if not hasattr(_timed_iterators, "stack"):
+        _timed_iterators.stack = []
+    stack = _timed_iterators.stack
+    busy = 0.0
+    iterator = iter(iterable)
+    try:
+        while True:
+            stack.append(current)
+            start = time.perf_counter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+            finally:
+                elapsed = time.perf_counter() - start
+                stack.pop()
+                busy += elapsed
+                if stack:
+                    stack[-1].nested_time += elapsed
+            current.attributes["items"] += 1
+            yield item
+    except BaseException as e:
+        if not isinstance(e, GeneratorExit):
+            current.error = type(e).__name__
+        raise
+    finally:
+        current.end(duration=max(0.0, busy - current.nested_time))
+
+
+@contextmanager
+def collect_spans() -> Iterator[List[Dict]]:
+    """
+    Collect the spans finished in this block (same thread or task)
+
+    Yields:
+        List filled with span records as they finish
+    """
+    spans = []
+    token = _collector.set(spans)
+    try:
+        yield spans
+    finally:
+        _collector.reset(token)
+
+
+class MetricsRegistry:
+    """Stage metrics aggregated from spans, rendered in Prometheus text format"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._durations: Dict[str, Dict] = {}
+        self._counters: Dict[tuple, float] = {}
+        self._errors: Dict[str, int] = {}
+
+    def has_data(self) -> bool:
+        """Whether any span was observed"""
+        return bool(self._durations)
+
+    def observe(self, finished: Span):
+        """Add a finished span to the metrics"""
+        with self._lock:
+            histogram = self._durations.setdefault(
+                finished.name, {"buckets": [0] * len(DURATION_BUCKETS), "count": 0, "sum": 0.0}
+            )
+            for idx, bound in enumerate(DURATION_BUCKETS):
+                if finished.duration <= bound:
+                    histogram["buckets"][idx] += 1
+            histogram["count"] += 1
+            histogram["sum"] += finished.duration
+
+            for attribute in COUNTED_ATTRIBUTES:
+                value = finished.attributes.get(attribute)
+                if isinstance(value, (int, float)) and not isinstance(value, bool):
+                    key = (attribute, finished.name)
+                    self._counters[key] = self._counters.get(key, 0) + value
+            if finished.error:
+                self._errors[finished.name] = self._errors.get(finished.name, 0) + 1
+
+    def render(self) -> str:
+        """Metrics in Prometheus text exposition format"""
+        with self._lock:
+            lines = [
+                "# HELP regintel_stage_duration_seconds Wall time of each stage",
+                "# TYPE regintel_stage_duration_seconds histogram"
+            ]
+            for stage, histogram in sorted(self._durations.items()):
+                for bound, count in zip(DURATION_BUCKETS, histogram["buckets"]):
+                    lines.append(f'regintel_stage_duration_seconds_bucket{{stage="{stage}",le="{bound}"}} {count}')
+                lines.append(f'regintel_stage_duration_seconds_bucket{{stage="{stage}",le="+Inf"}} {histogram["count"]}')
+                lines.append(f'regintel_stage_duration_seconds_sum{{stage="{stage}"}} {histogram["sum"]:.6f}')
+                lines.append(f'regintel_stage_duration_seconds_count{{stage="{stage}"}} {histogram["count"]}')
+
+            for attribute in COUNTED_ATTRIBUTES:
+                entries = sorted((stage, value) for (name, stage), value in self._counters.items() if name == attribute)
+                if not entries:
+                    continue
+                metric = f"regintel_stage_{attribute}_total"
+                lines.append(f"# HELP {metric} {attribute.replace('_', ' ').capitalize()} counted by each stage")
+                lines.append(f"# TYPE {metric} counter")
+                lines.extend(f'{metric}{{stage="{stage}"}} {value:g}' for stage, value in entries)
+
+            if self._errors:
+                lines.append("# HELP regintel_stage_errors_total Stages that raised an exception")
+                lines.append("# TYPE regintel_stage_errors_total counter")
+                lines.extend(
+                    f'regintel_stage_errors_total{{stage="{stage}"}} {count}'
+                    for stage, count in sorted(self._errors.items())
+                )
+            return "\n".join(lines) + "\n"
+
+
+metrics = MetricsRegistry()
+
+# Process that owns the metrics files: forked workers (e.g. extraction
+# processes) inherit the registry, and must not overwrite its files
+_owner_pid = os.getpid()
+
+_logger = logging.getLogger("regintel.spans")
+_setup_lock = threading.Lock()
+_metrics_file_written = 0.0
+_metrics_server = None
+
+
+def _get_logger() -> logging.Logger:
+    """Span logger, writing one JSON object per line (rotated by size)"""
+    if not _logger.handlers:
+        with _setup_lock:
+            if not _logger.handlers:
+                if TELEMETRY_LOG_PATH:
+                    os.makedirs(os.path.dirname(TELEMETRY_LOG_PATH) or ".", exist_ok=True)
+                    handler = logging.handlers.RotatingFileHandler(
+                        TELEMETRY_LOG_PATH,
+                        maxBytes=TELEMETRY_LOG_MAX_BYTES,
+                        backupCount=TELEMETRY_LOG_BACKUPS,
+                        encoding="utf-8"
+                    )
+                else:
+                    handler = logging.StreamHandler()
+                handler.setFormatter(logging.Formatter("%(message)s"))
+                _logger.addHandler(handler)
+                _logger.setLevel(logging.INFO)
+                _logger.propagate = False
+    return _logger
+
+
+def write_metrics_file(path: str = METRICS_FILE_PATH):
+    """Write the current metrics to a Prometheus text file (atomically)"""
+    if not path:
+        return
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(metrics.render())
+    os.replace(tmp_path, path)
+
+
+def _maybe_write_metrics_file():
+    global _metrics_file_written
+    now = time.monotonic()
+    with _setup_lock:
+        if now - _metrics_file_written < METRICS_FILE_INTERVAL:
+            return
+        _metrics_file_written = now
+    try:
+        write_metrics_file()
+    except OSError as e:
+        print(f"Error writing metrics file: {str(e)}")
+
+
+def _export(finished: Span):
+    collector = _collector.get()
+    if collector is not None:
+        collector.append(finished.to_dict())
+    if not TELEMETRY_ENABLED:
+        return
+    metrics.observe(finished)
+    _get_logger().info(json.dumps(finished.to_dict(), ensure_ascii=False, default=str))
+    if METRICS_FILE_PATH and os.getpid() == _owner_pid:
+        _maybe_write_metrics_file()
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = metrics.render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_metrics_server(port: int, host: str = "0.0.0.0") -> Optional[ThreadingHTTPServer]:
+    """
+    Serve the metrics at http://<host>:<port>/metrics from a background thread
+    (once per process; later calls return the running server)
+
+    Args:
+        port: TCP port
+        host: Interface to listen on
+
+    Returns:
+        The HTTP server, or None if the port could not be bound
+    """
+    global _metrics_server
+    with _setup_lock:
+        if _metrics_server is None:
+            try:
+                _metrics_server = ThreadingHTTPServer((host, port), _MetricsHandler)
+            except OSError as e:
+                print(f"Error starting metrics endpoint on port {port}: {str(e)}")
+                return None
+            threading.Thread(target=_metrics_server.serve_forever, name="metrics-server", daemon=True).start()
+        return _metrics_server
+
+
+@atexit.register
+def _flush_metrics():
+    if TELEMETRY_ENABLED and METRICS_FILE_PATH and metrics.has_data() and os.getpid() == _owner_pid:
+        try:
+            write_metrics_file()
+        except OSError:
+            pass
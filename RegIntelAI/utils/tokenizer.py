@@ -0,0 +1,129 @@
+"""
+Token counting utilities for RegIntel AI
+"""
+from typing import List
+from config import EMBEDDING_MODEL
+
+_encoding = None
+
+
+def get_encoding():
+    """
+    Get the tiktoken encoding used by the OpenAI models (loaded once)
+
+    Returns:
+        tiktoken Encoding, or None if tiktoken is unavailable
+    """
+    global _encoding
+    if _encoding is None:
+        try:
+            import tiktoken
+            try:
+                _encoding = tiktoken.encoding_for_model(EMBEDDING_MODEL)
+            except KeyError:
+                _encoding = tiktoken.get_encoding("cl100k_base")
+        except Exception:
+            # tiktoken missing or its BPE files cannot be downloaded
+            _encoding = False
+    return _encoding or None
+
+
+def count_tokens(text: str) -> int:
+    """
+    Count tokens in text
+
+    Args:
+        text: Text to measure
+
+    Returns:
+        Number of tokens (approximated as 4 characters per token without tiktoken)
+    """
+    encoding = get_encoding()
+    if encoding is None:
+        return (len(text) + 3) // 4
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def truncate_tokens(text: str, max_tokens: int) -> str:
+    """
+    Truncate text to at most max_tokens tokens
+
+    Args:
+        text: Text to truncate
+        max_tokens: Token limit
+
+    Returns:
+        Truncated text
+    """
+    encoding = get_encoding()
+    if encoding is None:
+        return text[:max_tokens * 4]
+    tokens = encoding.encode(text, disallowed_special=())
+    if len(tokens) <= max_tokens:
+        return text
+    return encoding.decode(tokens[:max_tokens])
+
+
+def split_tokens(text: str, max_tokens: int) -> List[str]:
+    """
+    Cut text into consecutive pieces of at most max_tokens tokens
+
+    Args:
+        text: Text to cut
+        max_tokens: Token limit per piece
+
+    Returns:
+        Pieces, which join back to the original text
+    """
+    encoding = get_encoding()
+    if encoding is None:
+        size = max_tokens * 4
+        return [text[start:start + size] for start in range(0, len(text), size)]
+    tokens = encoding.encode(text, disallowed_special=())
+    pieces = [
+        encoding.decode(tokens[start:start + max_tokens])
+        for start in range(0, len(tokens), max_tokens)
+    ]
+    # Token boundaries can split multi-byte characters, fall back to characters then
+    if "".join(pieces) != text:
+        size = max(1, len(text) * max_tokens // max(len(tokens), 1))
+        return [text[start:start + size] for start in range(0, len(text), size)]
+    return pieces
+
+
+def tail_tokens(text: str, max_tokens: int) -> str:
+    """
+    Get the end of text, at most max_tokens tokens long
+
+    Args:
+        text: Text to take the tail of
+        max_tokens: Token limit
+
+    Returns:
+        Trailing text
+    """
+    if max_tokens <= 0:
+        return ""
+    encoding = get_encoding()
+    if encoding is None:
+        return text[-max_tokens * 4:]
+    tokens = encoding.encode(text, disallowed_special=())
+    if len(tokens) <= max_tokens:
+        return text
+    return encoding.decode(tokens[-max_tokens:])
+
+
+def count_tokens_batch(texts: List[str]) -> List[int]:
+    """
+    Count tokens for several texts at once
+
+    Args:
+        texts: Texts to measure
+
+    Returns:
+        Token count for each text, in order
+    """
+    encoding = get_encoding()
+    if encoding is None:
+        return [(len(text) + 3) // 4 for text in texts]
+    return [len(tokens) for tokens in encoding.encode_batch(texts, disallowed_special=())]
@@ -0,0 +1,750 @@
+"""
+Vector store backends for RegIntel AI
+"""
+import json
+import os
+import threading
+import uuid
+from collections import Counter
+from contextlib import contextmanager
+from typing import List, Dict, Callable, Iterator, Optional, Tuple
+import numpy as np
+try:
+    import fcntl
+except ImportError:  # Windows: writers are only serialised within a process
+    fcntl = None
+from config import (
+    VECTOR_STORE_BACKEND,
+    CHROMA_DB_DIR,
+    COLLECTION_NAME,
+    NUMPY_STORE_DIR,
+    NUMPY_STORE_DTYPE,
+    NUMPY_STORE_QUANTIZATION,
+    NUMPY_RESCORE_CANDIDATES
+)
+
+# Number of set bits in each byte value, for Hamming distances
+_POPCOUNT = np.array([bin(value).count("1") for value in range(256)], dtype=np.uint8)
+
+
+@contextmanager
+def _write_lock(lock: threading.RLock, lock_path: str) -> Iterator[None]:
+    """Hold a store for writing, against other threads and other processes"""
+    with lock:
+        if fcntl is None:
+            yield
+            return
+        with open(lock_path, 'a') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+class VectorStore:
+    """
+    Interface of the vector stores behind RAGEngine
+
+    Results are dictionaries with "id", "text", "metadata", for queries
+    "distance" (lower is closer) and, when include_embeddings is set,
+    "embedding". Writes return the store versions (see version()) just
+    before and just after them, so a writer can tell its own writes from
+    those of other processes.
+    """
+
+    def upsert(
+        self,
+        ids: List[str],
+        documents: List[str],
+        metadatas: List[Dict],
+        embeddings: List[List[float]]
+    ) -> Tuple:
+        """Insert chunks, replacing existing chunks with the same IDs"""
+        raise NotImplementedError
+
+    def query(
+        self,
+        embedding: List[float],
+        n_results: int,
+        include_embeddings: bool = False,
+        sources: Optional[List[str]] = None
+    ) -> List[Dict]:
+        """Get the n_results chunks closest to an embedding, closest first (only from sources if given)"""
+        raise NotImplementedError
+
+    def get(self, ids: List[str], include_embeddings: bool = False) -> List[Dict]:
+        """Get chunks by ID (unknown IDs are skipped)"""
+        raise NotImplementedError
+
+    def iter_pages(self, page_size: int) -> Iterator[Tuple[List[str], List[str], List[Dict]]]:
+        """Iterate over every chunk as (ids, documents, metadatas) pages"""
+        raise NotImplementedError
+
+    def source_ids(self, source: str) -> List[str]:
+        """IDs of every chunk of a document"""
+        raise NotImplementedError
+
+    def delete(self, ids: List[str]) -> Tuple:
+        """Delete chunks by ID (unknown IDs are ignored)"""
+        raise NotImplementedError
+
+    def delete_source(self, source: str) -> Tuple:
+        """Delete every chunk of a document"""
+        raise NotImplementedError
+
+    def list_sources(self) -> Dict[str, int]:
+        """Number of chunks of each document, by source"""
+        raise NotImplementedError
+
+    def count(self) -> int:
+        """Number of chunks in the store"""
+        raise NotImplementedError
+
+    def clear(self) -> Tuple:
+        """Delete every chunk"""
+        raise NotImplementedError
+
+    def version(self):
+        """Token that changes whenever a chunk is written or deleted, by any process"""
+        raise NotImplementedError
+
+
+class ChromaVectorStore(VectorStore):
+    """
+    ChromaDB persistent collection
+
+    Every write also rewrites a marker file next to the database, so that
+    processes sharing it (the app, CLI ingests) notice each other's writes.
+    Writes hold an exclusive lock on a lock file next to it.
+    """
+
+    def __init__(self, path: str = CHROMA_DB_DIR, collection_name: str = COLLECTION_NAME):
+        # Imported here so that the NumPy backend never pays for chromadb
+        import chromadb
+        from chromadb.config import Settings
+
+        self.collection_name = collection_name
+        self._marker_path = os.path.join(path, f"{collection_name}.version")
+        self._lock_path = os.path.join(path, f"{collection_name}.lock")
+        self._lock = threading.RLock()
+        self.chroma_client = chromadb.PersistentClient(
+            path=path,
+            settings=Settings(anonymized_telemetry=False)
+        )
+
+        # Get or create collection
+        try:
+            self.collection = self.chroma_client.get_collection(name=collection_name)
+        except:
+            self.collection = self._create_collection()
+
+    def _create_collection(self):
+        return self.chroma_client.create_collection(
+            name=self.collection_name,
+            metadata={"description": "Regulatory documents for compliance analysis"}
+        )
+
+    def _write(self, apply: Callable[[], None]) -> Tuple:
+        """Apply a write under the write lock, giving the store a new version (see version())"""
+        with _write_lock(self._lock, self._lock_path):
+            before = self.version()
+            try:
+                apply()
+            finally:
+                # Also after a failed write, which may have changed part of the collection
+                with open(self._marker_path, 'w', encoding='utf-8') as f:
+                    f.write(uuid.uuid4().hex)
+            return before, self.version()
+
+    def upsert(self, ids, documents, metadatas, embeddings):
+        return self._write(lambda: self.collection.upsert(
+            documents=documents,
+            metadatas=metadatas,
+            ids=ids,
+            embeddings=embeddings
+        ))
+
+    @staticmethod
+    def _source_filter(sources: Optional[List[str]]) -> Optional[Dict]:
+        """Metadata filter matching chunks of the given sources"""
+        if sources is None:
+            return None
+        if len(sources) == 1:
+            return {"source": sources[0]}
+        return {"source": {"$in": list(sources)}}
+
+    def query(self, embedding, n_results, include_embeddings=False, sources=None):
+        if sources is not None and not sources:
+            return []
+        include = ["documents", "metadatas", "distances"]
+        if include_embeddings:
+            include.append("embeddings")
+        results = self.collection.query(
+            query_embeddings=[embedding],
+            n_results=n_results,
+            where=self._source_filter(sources),
+            include=include
+        )
+
+        # Format results
+        chunks = []
+        if results["documents"] and len(results["documents"]) > 0:
+            for idx in range(len(results["documents"][0])):
+                chunks.append({
+                    "id": results["ids"][0][idx],
+                    "text": results["documents"][0][idx],
+                    "metadata": results["metadatas"][0][idx],
+                    "distance": results["distances"][0][idx] if "distances" in results else None
+                })
+                if include_embeddings:
+                    chunks[-1]["embedding"] = results["embeddings"][0][idx]
+        return chunks
+
+    def get(self, ids, include_embeddings=False):
+        include = ["documents", "metadatas"]
+        if include_embeddings:
+            include.append("embeddings")
+        results = self.collection.get(ids=ids, include=include)
+        chunks = [
+            {"id": doc_id, "text": document, "metadata": metadata}
+            for doc_id, document, metadata in zip(results["ids"], results["documents"], results["metadatas"])
+        ]
+        if include_embeddings:
+            for chunk, embedding in zip(chunks, results["embeddings"]):
+                chunk["embedding"] = embedding
+        return chunks
+
+    def iter_pages(self, page_size):
+        offset = 0
+        while True:
+            page = self.collection.get(
+                include=["documents", "metadatas"],
+                limit=page_size,
+                offset=offset
+            )
+            if not page["ids"]:
+                return
+            yield page["ids"], page["documents"], page["metadatas"]
+            offset += len(page["ids"])
+
+    def source_ids(self, source):
+        return self.collection.get(where=self._source_filter([source]), include=[])["ids"]
+
+    def delete(self, ids):
+        if not ids:
+            version = self.version()
+            return version, version
+        return self._write(lambda: self.collection.delete(ids=list(ids)))
+
+    def delete_source(self, source):
+        return self._write(lambda: self.collection.delete(where=self._source_filter([source])))
+
+    def list_sources(self):
+        counts = Counter()
+        offset = 0
+        while True:
+            page = self.collection.get(include=["metadatas"], limit=5000, offset=offset)
+            if not page["ids"]:
+                return dict(counts)
+            counts.update(metadata.get("source", "") for metadata in page["metadatas"])
+            offset += len(page["ids"])
+
+    def count(self):
+        try:
+            return self.collection.count()
+        except:
+            return 0
+
+    def _delete_all(self):
+        # Deleted in place rather than by dropping the collection, which would
+        # leave other processes with a handle on a collection that no longer exists
+        while True:
+            ids = self.collection.get(include=[], limit=5000)["ids"]
+            if not ids:
+                return
+            self.collection.delete(ids=ids)
+
+    def clear(self):
+        try:
+            return self._write(self._delete_all)
+        except Exception as e:
+            print(f"Error clearing collection: {e}")
+            # Unknown previous version: the collection may be partly cleared
+            return None, self.version()
+
+    def version(self):
+        try:
+            with open(self._marker_path, 'r', encoding='utf-8') as f:
+                marker = f.read()
+        except FileNotFoundError:
+            marker = None
+        return self.count(), marker
+
+
+class NumpyVectorStore(VectorStore):
+    """
+    Append-only, memory-mapped matrix of normalised vectors
+
+    Files in the store directory:
+    - vectors.bin: raw rows of float32 or float16 values, memory-mapped
+      read-only so several processes share pages through the OS cache
+    - documents.jsonl: {"id", "text", "metadata"} lines, read back by
+      byte offset so texts are not kept in RAM
+    - records.jsonl: small append-only log of {"op": "add", "id", "row",
+      "source", "offset"} and {"op": "delete", "id"} records, replayed on
+      open; a record is only written once its vector and document are.
+      The log starts with a {"op": "generation", "id"} line, new after
+      each clear()
+    - codes.bin / scales.bin: compact copies of the vectors when
+      quantization is enabled (int8 codes with a float32 scale per row, or
+      sign bits packed 8 per byte)
+    - store.json: dimension, dtype and quantization
+    - write.lock: locked (flock) by the process writing to the store
+
+    Upserts and deletes only append; clear() removes the files. Writes hold
+    an exclusive lock on write.lock, so several processes (e.g. the app and
+    a CLI ingest) can write to the same store. Search is
+    exact by default: cosine similarity against every live row, in blocks,
+    with the distance reported as 1 - similarity. With quantization, the
+    codes are scanned instead and only the best candidates are read back
+    from vectors.bin and rescored at full precision, so the full vectors
+    stay on disk. Records appended by another process are picked up on the
+    next call.
+    """
+
+    # Bytes of float32 scores computed per block during search
+    QUERY_BLOCK_BYTES = 64 * 1024 * 1024
+
+    def __init__(
+        self,
+        directory: str = NUMPY_STORE_DIR,
+        dtype: str = NUMPY_STORE_DTYPE,
+        quantization: str = NUMPY_STORE_QUANTIZATION,
+        rescore_candidates: int = NUMPY_RESCORE_CANDIDATES
+    ):
+        if quantization not in ("none", "int8", "binary"):
+            raise Exception(f"Unknown quantization: {quantization}")
+        self.directory = directory
+        self._default_dtype = np.dtype(dtype)
+        self._default_quantization = quantization
+        self.dtype = self._default_dtype
+        self.quantization = quantization
+        self.rescore_candidates = rescore_candidates
+        self._vectors_path = os.path.join(directory, "vectors.bin")
+        self._codes_path = os.path.join(directory, "codes.bin")
+        self._scales_path = os.path.join(directory, "scales.bin")
+        self._documents_path = os.path.join(directory, "documents.jsonl")
+        self._records_path = os.path.join(directory, "records.jsonl")
+        self._info_path = os.path.join(directory, "store.json")
+        self._lock_path = os.path.join(directory, "write.lock")
+        self._lock = threading.RLock()
+        os.makedirs(directory, exist_ok=True)
+        self._reset_state()
+        self._replay_records()
+
+    def _reset_state(self):
+        self.dim = None
+        self._matrix = None
+        self._codes = None
+        self._scales = None
+        self._n_rows = 0
+        self._alive = np.zeros(0, dtype=bool)
+        self._row_ids: List[str] = []
+        self._row_offsets: List[int] = []
+        self._row_sources: List[str] = []
+        self._id_rows: Dict[str, int] = {}
+        self._source_rows: Dict[str, set] = {}
+        self._records_offset = 0
+        self._generation = None
+
+    def _load_info(self):
+        self.dtype = self._default_dtype
+        self.quantization = self._default_quantization
+        if os.path.exists(self._info_path):
+            with open(self._info_path, 'r', encoding='utf-8') as f:
+                info = json.load(f)
+            self.dim = info["dim"]
+            # The file format is fixed by the first write
+            self.dtype = np.dtype(info["dtype"])
+            self.quantization = info.get("quantization", "none")
+
+    def _replay_records(self):
+        """Apply records appended since the last replay (by this or another process)"""
+        try:
+            f = open(self._records_path, 'rb')
+        except FileNotFoundError:
+            if self._generation is not None:
+                # Cleared by another process
+                self._reset_state()
+            return
+
+        with f:
+            # The first line identifies the log: another one means the store
+            # was cleared and rewritten since the last replay
+            header = f.readline()
+            if not header.endswith(b"\n"):
+                return
+            if header != self._generation:
+                self._reset_state()
+                self._generation = header
+                self._load_info()
+                # Logs written before generations were recorded start with a record
+                if json.loads(header).get("op") == "generation":
+                    self._records_offset = len(header)
+            f.seek(self._records_offset)
+            data = f.read()
+        # A partially written last record waits for its writer to finish it
+        data = data[:data.rfind(b"\n") + 1]
+        if not data:
+            return
+        # Parsing the new records as one JSON array is much faster than line by line
+        records = json.loads(b"[" + data[:-1].replace(b"\n", b",") + b"]")
+        self._records_offset += len(data)
+        self._apply_records(records)
+        self._remap()
+
+    def _apply_records(self, records: List[Dict]):
+        n_rows = max((record["row"] + 1 for record in records if record["op"] == "add"), default=0)
+        if n_rows > self._n_rows:
+            grow = n_rows - self._n_rows
+            self._row_ids.extend([""] * grow)
+            self._row_offsets.extend([-1] * grow)
+            self._row_sources.extend([""] * grow)
+            self._n_rows = n_rows
+
+        id_rows = self._id_rows
+        source_rows = self._source_rows
+        for record in records:
+            # Both ops drop the previous row of the ID
+            previous = id_rows.pop(record["id"], None)
+            if previous is not None:
+                rows = source_rows[self._row_sources[previous]]
+                rows.discard(previous)
+                if not rows:
+                    del source_rows[self._row_sources[previous]]
+            if record["op"] == "add":
+                row = record["row"]
+                id_rows[record["id"]] = row
+                self._row_ids[row] = record["id"]
+                self._row_offsets[row] = record["offset"]
+                self._row_sources[row] = record["source"]
+                source_rows.setdefault(record["source"], set()).add(row)
+
+        # The live rows are exactly the latest row of each ID
+        self._alive = np.zeros(self._n_rows, dtype=bool)
+        self._alive[np.fromiter(id_rows.values(), dtype=np.int64, count=len(id_rows))] = True
+
+    def _remap(self):
+        """Memory-map the rows written so far"""
+        if self._n_rows == 0 or self.dim is None:
+            self._matrix = self._codes = self._scales = None
+            return
+        self._matrix = np.memmap(
+            self._vectors_path, dtype=self.dtype, mode='r', shape=(self._n_rows, self.dim)
+        )
+        if self.quantization == "int8":
+            self._codes = np.memmap(self._codes_path, dtype=np.int8, mode='r', shape=(self._n_rows, self.dim))
+            self._scales = np.memmap(self._scales_path, dtype=np.float32, mode='r', shape=(self._n_rows,))
+        elif self.quantization == "binary":
+            self._codes = np.memmap(
+                self._codes_path, dtype=np.uint8, mode='r', shape=(self._n_rows, (self.dim + 7) // 8)
+            )
+
+    @staticmethod
+    def _append_rows(path: str, n_rows: int, rows: np.ndarray):
+        """Drop rows left over by an interrupted write, then append rows"""
+        row_bytes = rows[0].nbytes if rows.ndim > 1 else rows.itemsize
+        with open(path, 'ab') as f:
+            f.truncate(n_rows * row_bytes)
+            f.write(rows.tobytes())
+
+    def _append_records(self, records: List[Dict]):
+        with open(self._records_path, 'ab') as f:
+            if f.tell() == 0:
+                # A new log starts with its generation (see _replay_records)
+                records = [{"op": "generation", "id": uuid.uuid4().hex}] + records
+            f.write(b"".join(
+                json.dumps(record, ensure_ascii=False).encode('utf-8') + b"\n" for record in records
+            ))
+        self._replay_records()
+
+    def upsert(self, ids, documents, metadatas, embeddings):
+        vectors = np.asarray(embeddings, dtype=np.float32)
+        if vectors.ndim != 2 or len(vectors) == 0:
+            version = self.version()
+            return version, version
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        vectors = vectors / np.where(norms == 0, 1, norms)
+
+        with _write_lock(self._lock, self._lock_path):
+            # Rows and records appended by other writers decide where ours go
+            self._replay_records()
+            before = self._generation, self._records_offset
+            if self.dim is None:
+                self.dim = vectors.shape[1]
+                with open(self._info_path, 'w', encoding='utf-8') as f:
+                    json.dump({"dim": self.dim, "dtype": self.dtype.name, "quantization": self.quantization}, f)
+            elif vectors.shape[1] != self.dim:
+                raise Exception(f"Embedding dimension {vectors.shape[1]} does not match the index ({self.dim})")
+
+            self._append_rows(self._vectors_path, self._n_rows, vectors.astype(self.dtype))
+            if self.quantization == "int8":
+                scales = np.abs(vectors).max(axis=1) / 127
+                scales[scales == 0] = 1
+                codes = np.rint(vectors / scales[:, np.newaxis]).astype(np.int8)
+                self._append_rows(self._codes_path, self._n_rows, codes)
+                self._append_rows(self._scales_path, self._n_rows, scales.astype(np.float32))
+            elif self.quantization == "binary":
+                self._append_rows(self._codes_path, self._n_rows, np.packbits(vectors > 0, axis=1))
+
+            lines = [
+                json.dumps({"id": doc_id, "text": document, "metadata": metadata}, ensure_ascii=False).encode('utf-8') + b"\n"
+                for doc_id, document, metadata in zip(ids, documents, metadatas)
+            ]
+            with open(self._documents_path, 'ab') as f:
+                offset = f.tell()
+                f.write(b"".join(lines))
+
+            records = []
+            for row, (doc_id, metadata, line) in enumerate(zip(ids, metadatas, lines), start=self._n_rows):
+                records.append({
+                    "op": "add", "id": doc_id, "row": row, "source": metadata.get("source", ""), "offset": offset
+                })
+                offset += len(line)
+            self._append_records(records)
+            return before, (self._generation, self._records_offset)
+
+    def _read_records(self, rows: List[int]) -> List[Dict]:
+        """Read the documents of rows from the sidecar file"""
+        records = []
+        with open(self._documents_path, 'rb') as f:
+            for row in rows:
+                f.seek(self._row_offsets[row])
+                records.append(json.loads(f.readline()))
+        return records
+
+    def query(self, embedding, n_results, include_embeddings=False, sources=None):
+        query = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(query)
+        if norm:
+            query = query / norm
+
+        with self._lock:
+            self._replay_records()
+            if self._matrix is None or n_results <= 0:
+                return []
+
+            rows = None
+            if sources is not None:
+                # Only the rows of the selected documents are scanned
+                rows = [row for source in set(sources) for row in self._source_rows.get(source, ())]
+                if not rows:
+                    return []
+                rows = np.sort(np.asarray(rows, dtype=np.int64))
+
+            if self.quantization == "none":
+                best_rows, best_scores = self._top_rows(query, n_results, rows)
+            else:
+                # First pass over the compact codes, then rescore at full precision
+                candidates, _ = self._top_rows(query, n_results * max(self.rescore_candidates, 1), rows)
+                candidates = np.sort(candidates)
+                best_rows = candidates
+                best_scores = np.asarray(self._matrix[candidates], dtype=np.float32) @ query
+
+            order = np.argsort(-best_scores)[:n_results]
+            best_rows, best_scores = best_rows[order], best_scores[order]
+
+            records = self._read_records(best_rows.tolist())
+            embeddings = self._read_embeddings(best_rows) if include_embeddings else None
+
+        chunks = [
+            {
+                "id": record["id"],
+                "text": record["text"],
+                "metadata": record["metadata"],
+                "distance": float(1.0 - score)
+            }
+            for record, score in zip(records, best_scores)
+        ]
+        if include_embeddings:
+            for chunk, embedding in zip(chunks, embeddings):
+                chunk["embedding"] = embedding
+        return chunks
+
+    def _read_embeddings(self, rows) -> np.ndarray:
+        """Full-precision (normalised) vectors of rows"""
+        rows = np.asarray(rows, dtype=np.int64)
+        if len(rows) == 0:
+            return np.zeros((0, self.dim or 0), dtype=np.float32)
+        return np.asarray(self._matrix[rows], dtype=np.float32)
+
+    def _block_scores(self, index, query: np.ndarray, query_bits: np.ndarray) -> np.ndarray:
+        """Similarity of rows (a slice or row numbers) to the query, approximate when quantized"""
+        if self.quantization == "int8":
+            return (self._codes[index].astype(np.float32) @ query) * self._scales[index]
+        if self.quantization == "binary":
+            # Hamming distance between sign bits, mapped to [-1, 1]
+            distances = _POPCOUNT[self._codes[index] ^ query_bits].sum(axis=1, dtype=np.int32)
+            return 1.0 - 2.0 * distances.astype(np.float32) / self.dim
+        return np.asarray(self._matrix[index], dtype=np.float32) @ query
+
+    def _top_rows(self, query: np.ndarray, k: int, rows: np.ndarray = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Blocked top-k by (possibly approximate) similarity, unordered
+
+        Scans every live row, or only rows (sorted live row numbers) if given.
+        """
+        query_bits = np.packbits(query > 0) if self.quantization == "binary" else None
+        block_rows = max(1, self.QUERY_BLOCK_BYTES // (4 * self.dim))
+        n_rows = self._n_rows if rows is None else len(rows)
+        best_rows = np.zeros(0, dtype=np.int64)
+        best_scores = np.zeros(0, dtype=np.float32)
+        for start in range(0, n_rows, block_rows):
+            stop = min(start + block_rows, n_rows)
+            if rows is None:
+                block = np.arange(start, stop)
+                scores = self._block_scores(slice(start, stop), query, query_bits)
+                scores[~self._alive[start:stop]] = -np.inf
+            else:
+                block = rows[start:stop]
+                scores = self._block_scores(block, query, query_bits)
+
+            # Keep the block's top k, then merge with the best so far
+            block_k = min(k, len(scores))
+            top = np.argpartition(-scores, block_k - 1)[:block_k]
+            best_rows = np.concatenate([best_rows, block[top]])
+            best_scores = np.concatenate([best_scores, scores[top]])
+            if len(best_rows) > k:
+                keep = np.argpartition(-best_scores, k - 1)[:k]
+                best_rows, best_scores = best_rows[keep], best_scores[keep]
+
+        live = np.isfinite(best_scores)
+        return best_rows[live], best_scores[live]
+
+    def storage_stats(self) -> Dict[str, int]:
+        """
+        Get the size of the index
+
+        Returns:
+            Dictionary with live chunks, dimension, and the bytes of full
+            vectors (on disk, read for rescoring) and of the codes scanned per query
+        """
+        with self._lock:
+            self._replay_records()
+            dim = self.dim or 0
+            vector_bytes = self._n_rows * dim * self.dtype.itemsize
+            if self.quantization == "int8":
+                code_bytes = self._n_rows * (dim + 4)
+            elif self.quantization == "binary":
+                code_bytes = self._n_rows * ((dim + 7) // 8)
+            else:
+                code_bytes = vector_bytes
+            return {
+                "chunks": len(self._id_rows),
+                "dimensions": dim,
+                "vector_bytes": vector_bytes,
+                "scanned_bytes": code_bytes
+            }
+
+    def get(self, ids, include_embeddings=False):
+        with self._lock:
+            self._replay_records()
+            rows = [self._id_rows[doc_id] for doc_id in ids if doc_id in self._id_rows]
+            records = self._read_records(rows)
+            embeddings = self._read_embeddings(rows) if include_embeddings else None
+        chunks = [
+            {"id": record["id"], "text": record["text"], "metadata": record["metadata"]}
+            for record in records
+        ]
+        if include_embeddings:
+            for chunk, embedding in zip(chunks, embeddings):
+                chunk["embedding"] = embedding
+        return chunks
+
+    def iter_pages(self, page_size):
+        with self._lock:
+            self._replay_records()
+            rows = np.flatnonzero(self._alive[:self._n_rows]).tolist()
+        for start in range(0, len(rows), page_size):
+            with self._lock:
+                records = self._read_records(rows[start:start + page_size])
+            yield (
+                [record["id"] for record in records],
+                [record["text"] for record in records],
+                [record["metadata"] for record in records]
+            )
+
+    def source_ids(self, source):
+        with self._lock:
+            self._replay_records()
+            return [self._row_ids[row] for row in sorted(self._source_rows.get(source, ()))]
+
+    def delete(self, ids):
+        with _write_lock(self._lock, self._lock_path):
+            self._replay_records()
+            before = self._generation, self._records_offset
+            ids = [doc_id for doc_id in ids if doc_id in self._id_rows]
+            if ids:
+                self._append_records([{"op": "delete", "id": doc_id} for doc_id in ids])
+            return before, (self._generation, self._records_offset)
+
+    def delete_source(self, source):
+        with _write_lock(self._lock, self._lock_path):
+            self._replay_records()
+            before = self._generation, self._records_offset
+            ids = [self._row_ids[row] for row in sorted(self._source_rows.get(source, ()))]
+            if ids:
+                self._append_records([{"op": "delete", "id": doc_id} for doc_id in ids])
+            return before, (self._generation, self._records_offset)
+
+    def list_sources(self):
+        with self._lock:
+            self._replay_records()
+            return {source: len(rows) for source, rows in self._source_rows.items()}
+
+    def version(self):
+        # Every write appends to the records log (clear() replaces it)
+        with self._lock:
+            self._replay_records()
+            return self._generation, self._records_offset
+
+    def count(self):
+        with self._lock:
+            self._replay_records()
+            return len(self._id_rows)
+
+    def clear(self):
+        with _write_lock(self._lock, self._lock_path):
+            self._replay_records()
+            before = self._generation, self._records_offset
+            # Other processes notice the records log is gone or has a new generation
+            self._matrix = None
+            self._codes = self._scales = None
+            for path in (
+                self._records_path, self._documents_path, self._vectors_path,
+                self._codes_path, self._scales_path, self._info_path
+            ):
+                if os.path.exists(path):
+                    os.remove(path)
+            self._reset_state()
+            self._load_info()
+            return before, (self._generation, self._records_offset)
+
+
+def create_vector_store(backend: str = VECTOR_STORE_BACKEND) -> VectorStore:
+    """
+    Create the configured vector store
+
+    Args:
+        backend: "chroma" or "numpy"
+
+    Returns:
+        Vector store instance
+    """
+    if backend == "chroma":
+        return ChromaVectorStore()
+    elif backend == "numpy":
+        return NumpyVectorStore()
+    else:
+        raise Exception(f"Unknown vector store backend: {backend}")